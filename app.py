@@ -1,80 +1,1986 @@
-from flask import Flask, request, jsonify, send_from_directory, send_file
+import time
+BOOT_STARTED = time.perf_counter()
+
+from flask import Flask, request, jsonify, Response, abort, send_file, g
 from flask_cors import CORS
 import requests
+import atexit
 import base64
+import binascii
+import cProfile
 import io
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import mm
-from reportlab.lib.utils import ImageReader
-from PIL import Image
 import json
-from datetime import datetime
-from notion_client import Client
+import pstats
+import gzip
+import hashlib
+import re
+import select
+import shutil
+import socket
+import sqlite3
+import tempfile
+import threading
+import tracemalloc
+import unicodedata
+import uuid
+import zlib
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+from datetime import datetime, timedelta, timezone
+
+try:
+    import brotli
+except ImportError:  # Optional: brotli variants are skipped without it
+    brotli = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: database bootstrap falls back to in-process locking
+    fcntl = None
+
+try:
+    import resource
+except ImportError:  # Windows: memory reports omit the RSS high-water mark
+    resource = None
+
+# Startup timing report: where import-time boot goes, plus deferred loads
+BOOT_TIMINGS = []
+LAZY_LOAD_TIMINGS = {}
+_boot_mark = BOOT_STARTED
 
-app = Flask(__name__, static_folder='.', static_url_path='')
+def record_boot_phase(name):
+    """Record the time spent since the previous boot phase"""
+    global _boot_mark
+    now = time.perf_counter()
+    BOOT_TIMINGS.append({'phase': name, 'ms': round((now - _boot_mark) * 1000, 2)})
+    _boot_mark = now
+
+def record_lazy_load(name, started):
+    """Record how long a deferred initialization took on first use"""
+    LAZY_LOAD_TIMINGS[name] = {
+        'ms': round((time.perf_counter() - started) * 1000, 2),
+        'at_s': round(time.perf_counter() - BOOT_STARTED, 3)
+    }
+
+record_boot_phase('imports')
+
+# Static files are served by the asset pipeline below, never from the repo root
+app = Flask(__name__, static_folder=None)
 CORS(app)
 
 # For Vercel deployment
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+record_boot_phase('flask app')
 
 # Telegram configuration - Use environment variables only for security
 import os
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+TELEGRAM_POOL_SIZE = int(os.getenv('TELEGRAM_POOL_SIZE', '10'))
+TELEGRAM_TIMEOUT = float(os.getenv('TELEGRAM_TIMEOUT', '30'))
+
+def new_telegram_session():
+    """Keep-alive connections to the Bot API, shared by all request threads"""
+    session = requests.Session()
+    session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=TELEGRAM_POOL_SIZE))
+    return session
+
+telegram_session = new_telegram_session()
+
+# Hostel branding for generated PDFs
+HOSTEL_NAME = os.getenv('HOSTEL_NAME', 'Navadaya Girls Hostal')
+HOSTEL_CONTACT = os.getenv('HOSTEL_CONTACT', 'admission@university.edu')
+PDF_BRAND_COLOR = os.getenv('PDF_BRAND_COLOR', '#334d99')
 
 # Notion configuration
 NOTION_INTEGRATION_SECRET = os.getenv('NOTION_INTEGRATION_SECRET')
 NOTION_DATABASE_ID = os.getenv('NOTION_DATABASE_ID')
+NOTION_TIMEOUT = float(os.getenv('NOTION_TIMEOUT', '20'))
 
-# Global variable to store the actual database ID once created
+# Global variable to store the actual database ID once created. The ID is
+# shared with other worker processes on this host through DATABASE_ID_FILE.
 ACTUAL_DATABASE_ID = None
-DATABASE_ID_FILE = 'notion_database_id.txt'
+DATABASE_VERIFIED_AT = 0.0
+DATABASE_ID_FILE = os.getenv('DATABASE_ID_FILE', 'notion_database_id.txt')
+DATABASE_ID_LOCK_FILE = DATABASE_ID_FILE + '.lock'
+DATABASE_VERIFY_TTL = float(os.getenv('DATABASE_VERIFY_TTL', '3600'))
+_database_bootstrap_lock = threading.Lock()
 
-def load_stored_database_id():
-    """Load database ID from file if it exists"""
-    global ACTUAL_DATABASE_ID
+@contextmanager
+def database_bootstrap_lock():
+    """Serialize database bootstrap across threads and worker processes on this host"""
+    with _database_bootstrap_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(DATABASE_ID_LOCK_FILE, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def read_database_record():
+    """Return (database_id, verified_at) from DATABASE_ID_FILE.
+
+    Accepts the JSON record written by save_database_id() as well as the
+    legacy plain-text ID (treated as never verified).
+    """
     try:
-        if os.path.exists(DATABASE_ID_FILE):
-            with open(DATABASE_ID_FILE, 'r') as f:
-                stored_id = f.read().strip()
-                if stored_id and notion_client:
-                    # Verify the stored ID still works
-                    notion_client.databases.retrieve(database_id=stored_id)
-                    ACTUAL_DATABASE_ID = stored_id
-                    print(f"Loaded existing database ID: {stored_id[:8]}...")
-                    return True
-    except Exception as e:
-        print(f"Failed to load stored database ID: {e}")
-        # Remove invalid file
-        if os.path.exists(DATABASE_ID_FILE):
-            os.remove(DATABASE_ID_FILE)
+        with open(DATABASE_ID_FILE, 'r') as f:
+            content = f.read().strip()
+    except OSError:
+        return None, 0.0
+    if not content:
+        return None, 0.0
+    if content.startswith('{'):
+        try:
+            record = json.loads(content)
+            return record.get('database_id'), float(record.get('verified_at', 0))
+        except (ValueError, TypeError):
+            return None, 0.0
+    return content, 0.0
+
+def load_stored_database_id():
+    """Load database ID from file if it exists.
+
+    No network I/O happens here; get_or_create_database() verifies the ID
+    against Notion on first use.
+    """
+    global ACTUAL_DATABASE_ID, DATABASE_VERIFIED_AT
+    stored_id, verified_at = read_database_record()
+    if stored_id:
+        ACTUAL_DATABASE_ID = stored_id
+        DATABASE_VERIFIED_AT = verified_at
+        print(f"Loaded stored database ID: {stored_id[:8]}...")
+        return True
     return False
 
-def save_database_id(database_id):
-    """Save database ID to file"""
+def save_database_id(database_id, verified_at=None):
+    """Atomically save the database ID so other workers never see a partial file"""
+    global ACTUAL_DATABASE_ID, DATABASE_VERIFIED_AT
+    verified_at = time.time() if verified_at is None else verified_at
+    ACTUAL_DATABASE_ID = database_id
+    DATABASE_VERIFIED_AT = verified_at
     try:
-        with open(DATABASE_ID_FILE, 'w') as f:
-            f.write(database_id)
+        tmp_path = f"{DATABASE_ID_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'database_id': database_id, 'verified_at': verified_at}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, DATABASE_ID_FILE)
         print(f"Saved database ID: {database_id[:8]}...")
     except Exception as e:
         print(f"Failed to save database ID: {e}")
 
-# Initialize Notion client
+def forget_database_id():
+    """Drop the stored database ID after Notion reports it no longer exists"""
+    global ACTUAL_DATABASE_ID, DATABASE_VERIFIED_AT
+    ACTUAL_DATABASE_ID = None
+    DATABASE_VERIFIED_AT = 0.0
+    if os.path.exists(DATABASE_ID_FILE):
+        os.remove(DATABASE_ID_FILE)
+
+def is_not_found_error(error):
+    """True when a Notion error means the object is definitely gone"""
+    return getattr(error, 'code', None) == 'object_not_found' or getattr(error, 'status', None) == 404
+
+class LazyNotionClient:
+    """Notion client proxy that builds the real client on first use.
+
+    Importing notion_client (and httpx behind it) and constructing the
+    client are deferred until the first API call instead of module import.
+    """
+
+    def __init__(self, auth):
+        self._auth = auth
+        self._client = None
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self._auth)
+
+    def get(self):
+        """Return the underlying notion_client.Client, creating it if needed"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    started = time.perf_counter()
+                    import httpx
+                    from notion_client import Client
+                    http = httpx.Client(event_hooks={'request': [apply_deadline_timeout]})
+                    self._client = Client(client=http, auth=self._auth, timeout_ms=int(NOTION_TIMEOUT * 1000))
+                    record_lazy_load('notion_client', started)
+                    print("Notion client initialized successfully")
+        return self._client
+
+    def reset(self):
+        """Drop the underlying client so the next call builds a fresh one"""
+        with self._lock:
+            self._client = None
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+def apply_deadline_timeout(request):
+    """httpx request hook: cut a Notion call's timeout to the request's remaining budget"""
+    timeout = request.extensions.get('timeout', {})
+    budget = current_deadline().timeout(NOTION_TIMEOUT)
+    request.extensions['timeout'] = {phase: budget if value is None else min(value, budget)
+                                     for phase, value in timeout.items()}
+
+# Initialize Notion client (lazily - no network or heavy imports at import time)
 notion_client = None
 if NOTION_INTEGRATION_SECRET:
+    notion_client = LazyNotionClient(NOTION_INTEGRATION_SECRET)
+    if load_stored_database_id():
+        print("Using stored database, will verify on first use")
+    else:
+        print("No existing database found, will create on first use")
+else:
+    print("Notion integration secret not found")
+record_boot_phase('notion config')
+
+# Application schema: the single mapping between form fields, admin API keys
+# and Notion properties. Encoders and decoders are compiled from it at startup.
+NOTION_TEXT_LIMIT = 2000
+
+def _title_case(value):
+    return str(value).title()
+
+APPLICATION_SCHEMA = [
+    {'notion': 'Application ID', 'type': 'rich_text', 'form': None, 'admin': 'application_id', 'editable': False},
+    {'notion': 'Student Name', 'type': 'title', 'form': 'fullName', 'admin': 'student_name'},
+    {'notion': 'Email', 'type': 'email', 'form': 'email', 'admin': 'email'},
+    {'notion': 'Phone', 'type': 'phone_number', 'form': 'phone', 'admin': 'phone'},
+    {'notion': 'Date of Birth', 'type': 'date', 'form': 'dateOfBirth', 'admin': 'date_of_birth'},
+    {'notion': 'Gender', 'type': 'select', 'form': 'gender', 'admin': 'gender', 'normalize': _title_case,
+     'options': [('Male', 'blue'), ('Female', 'pink'), ('Other', 'gray')]},
+    {'notion': 'Address', 'type': 'rich_text', 'form': 'address', 'admin': 'address'},
+    {'notion': 'Guardian Name', 'type': 'rich_text', 'form': 'guardianName', 'admin': 'guardian_name'},
+    {'notion': 'Guardian Phone', 'type': 'phone_number', 'form': 'guardianPhone', 'admin': 'guardian_phone'},
+    {'notion': 'Relation', 'type': 'select', 'form': 'relation', 'admin': 'relation', 'normalize': _title_case,
+     'options': [('Father', 'blue'), ('Mother', 'pink'), ('Guardian', 'green'), ('Other', 'gray')]},
+    {'notion': 'Room Number', 'type': 'rich_text', 'form': 'roomNumber', 'admin': 'room_number'},
+    {'notion': 'Admission Date', 'type': 'date', 'form': 'admissionDate', 'admin': 'admission_date'},
+    {'notion': 'Stay Duration', 'type': 'rich_text', 'form': 'stayDuration', 'admin': 'stay_duration'},
+    {'notion': 'Emergency Contact', 'type': 'phone_number', 'form': 'emergencyContact', 'admin': 'emergency_contact'},
+    {'notion': 'Status', 'type': 'select', 'form': None, 'admin': 'status', 'default': 'Pending Review',
+     'options': [('Pending Review', 'yellow'), ('Approved', 'green'), ('Rejected', 'red')]},
+    {'notion': 'Submission Date', 'type': 'date', 'form': None, 'admin': 'submission_date', 'editable': False},
+]
+
+def _text_segments(value):
+    """Split text into Notion rich text segments (2000 characters each)"""
+    value = str(value)
+    return [
+        {'text': {'content': value[i:i + NOTION_TEXT_LIMIT]}}
+        for i in range(0, len(value), NOTION_TEXT_LIMIT)
+    ] or [{'text': {'content': ''}}]
+
+def _compile_encoder(field):
+    """Build the value -> Notion property encoder for one schema field"""
+    kind = field['type']
+    normalize = field.get('normalize')
+    if kind in ('title', 'rich_text'):
+        encode = lambda value: {kind: _text_segments(value)}
+    elif kind in ('email', 'phone_number'):
+        encode = lambda value: {kind: str(value)}
+    elif kind == 'date':
+        encode = lambda value: {'date': {'start': value}}
+    elif kind == 'select':
+        encode = lambda value: {'select': {'name': value}}
+    else:
+        raise ValueError(f"Unsupported schema type: {kind}")
+    if normalize:
+        return lambda value: encode(normalize(value))
+    return encode
+
+def _join_text(items):
+    """Join multi-segment Notion rich text"""
+    return ''.join(item.get('plain_text') or item.get('text', {}).get('content', '') for item in items)
+
+def _compile_decoder(field):
+    """Build the Notion property -> value decoder for one schema field"""
+    kind = field['type']
+    default = field.get('default', '')
+    if kind in ('title', 'rich_text'):
+        def decode(prop):
+            items = prop.get(kind) if prop else None
+            if not items:
+                return default
+            if len(items) == 1:
+                item = items[0]
+                return item.get('plain_text') or item.get('text', {}).get('content', '') or default
+            return _join_text(items) or default
+    elif kind in ('email', 'phone_number'):
+        def decode(prop):
+            value = prop.get(kind) if prop else None
+            return value or default
+    elif kind in ('date', 'select'):
+        key = 'start' if kind == 'date' else 'name'
+        def decode(prop):
+            value = prop.get(kind) if prop else None
+            return (value.get(key) or default) if value else default
+    else:
+        raise ValueError(f"Unsupported schema type: {kind}")
+    return decode
+
+def _compile_batch_decoder(fields, keys, include_id):
+    """Build a function that decodes a batch of pages in one pass over (key, property, decoder) triples"""
+    columns = [(key, field['notion'], _compile_decoder(field)) for field, key in zip(fields, keys)]
+
+    def decode_batch(pages):
+        records = []
+        append = records.append
+        for page in pages:
+            get = (page.get('properties') or {}).get
+            record = {'id': page['id']} if include_id else {}
+            for key, name, decode in columns:
+                record[key] = decode(get(name))
+            append(record)
+        return records
+    return decode_batch
+
+def compile_application_schema(schema):
+    """Compile the declarative schema into encoder/decoder tables"""
+    database_properties = {}
+    form_encoders = []
+    admin_encoders = []
+    field_encoders = {}
+    field_decoders = {}
+    for field in schema:
+        name = field['notion']
+        if field['type'] == 'select':
+            database_properties[name] = {'select': {'options': [
+                {'name': option, 'color': color} for option, color in field.get('options', [])
+            ]}}
+        else:
+            database_properties[name] = {field['type']: {}}
+        encode = _compile_encoder(field)
+        if field.get('form'):
+            form_encoders.append((field['form'], name, encode))
+        if field.get('editable', True):
+            admin_encoders.append((field['admin'], name, encode))
+        field_encoders[name] = encode
+        field_decoders[name] = _compile_decoder(field)
+    return {
+        'database_properties': database_properties,
+        'form_encoders': tuple(form_encoders),
+        'admin_encoders': tuple(admin_encoders),
+        'decode_admin': _compile_batch_decoder(schema, [field['admin'] for field in schema], include_id=True),
+        'decode_export': _compile_batch_decoder(schema, [field['notion'] for field in schema], include_id=False),
+        'field_encoders': field_encoders,
+        'field_decoders': field_decoders
+    }
+
+COMPILED_SCHEMA = compile_application_schema(APPLICATION_SCHEMA)
+FIELD_DECODERS = COMPILED_SCHEMA['field_decoders']
+FIELD_ENCODERS = COMPILED_SCHEMA['field_encoders']
+
+def encode_properties(data, encoders):
+    """Encode every truthy value in data into Notion properties"""
+    properties = {}
+    for key, name, encode in encoders:
+        value = data.get(key)
+        if value:
+            properties[name] = encode(value)
+    return properties
+
+def decode_application_page(page):
+    """Decode a Notion page into the admin application record"""
+    return COMPILED_SCHEMA['decode_admin']((page,))[0]
+
+record_boot_phase('schema compile')
+
+# Application record cache configuration
+APPLICATION_CACHE_SIZE = int(os.getenv('APPLICATION_CACHE_SIZE', '512'))
+APPLICATION_CACHE_TTL = float(os.getenv('APPLICATION_CACHE_TTL', '300'))
+
+def normalize_page_id(page_id):
+    """Normalize a Notion page ID so dashed and undashed forms share a key"""
+    return str(page_id).replace('-', '').lower()
+
+# last_edited_time has minute resolution; allow the minute itself plus clock skew
+EDIT_TIME_SETTLE_SECONDS = 120
+
+def edit_time_settled(edited):
+    """True once no later edit can share this (minute-rounded) last_edited_time"""
+    try:
+        moment = datetime.fromisoformat(str(edited).replace('Z', '+00:00'))
+    except ValueError:
+        return False
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp() < time.time() - EDIT_TIME_SETTLE_SECONDS
+
+class ApplicationCache:
+    """Bounded LRU/TTL cache of decoded application records keyed by page ID.
+
+    Entries remember the page's ``last_edited_time`` so that pages seen again
+    (list queries, single reads, write responses) are only re-decoded when
+    they changed. Notion rounds that time to the minute, so a page edited
+    within the last couple of minutes is always re-decoded: a second edit in
+    the same minute would carry the same timestamp. Reads served to admins
+    always go through ``put_page`` with a page fresh from Notion, so edits
+    made in Notion or flushed by another worker are never hidden; ``get``
+    is only a local lookup for checks that tolerate a recent snapshot.
+    """
+
+    def __init__(self, max_size=512, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, page_id):
+        """Return a copy of the cached record, or None if missing or expired (not revalidated)"""
+        key = normalize_page_id(page_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry['stored_at'] > self.ttl:
+                return None
+            self._entries.move_to_end(key)
+            return dict(entry['record'])
+
+    def put_page(self, page):
+        """Store a raw Notion page, re-decoding unless it is unchanged since caching"""
+        if not page or page.get('archived') or page.get('in_trash'):
+            if page and page.get('id'):
+                self.invalidate(page['id'])
+            return None
+        key = normalize_page_id(page['id'])
+        edited = page.get('last_edited_time')
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and edited and entry['last_edited_time'] == edited and edit_time_settled(edited):
+                entry['stored_at'] = time.monotonic()
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry['record'])
+            self.misses += 1
+        record = decode_application_page(page)
+        with self._lock:
+            current = self._entries.get(key)
+            # Never let an older snapshot overwrite a newer write-through
+            if current is not None and edited and current['last_edited_time'] and current['last_edited_time'] > edited:
+                return dict(current['record'])
+            self._entries[key] = {
+                'record': record,
+                'last_edited_time': edited,
+                'stored_at': time.monotonic()
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return dict(record)
+
+    def patch(self, page_id, fields):
+        """Apply decoded field changes to a cached record in place, if cached"""
+        with self._lock:
+            entry = self._entries.get(normalize_page_id(page_id))
+            if entry is not None:
+                entry['record'].update(fields)
+
+    def invalidate(self, page_id):
+        """Drop a single record from the cache"""
+        with self._lock:
+            self._entries.pop(normalize_page_id(page_id), None)
+
+    def clear(self):
+        """Drop every cached record"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return cache size and hit/miss counters"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+application_cache = ApplicationCache(max_size=APPLICATION_CACHE_SIZE, ttl=APPLICATION_CACHE_TTL)
+
+# Search index configuration
+SEARCH_INDEX_MAX_AGE = float(os.getenv('SEARCH_INDEX_MAX_AGE', '900'))
+SEARCH_MAX_PER_PAGE = 200
+SEARCH_PREFIX_EXPANSION = 200
+SEARCH_FUZZY_THRESHOLD = 0.3
+SEARCH_PHONE_MIN_DIGITS = 4
+
+_SEARCH_TOKEN_PATTERN = re.compile(r'[^\W_]+')
+
+# Token fields and their weights; exact-key fields are matched on the whole query
+SEARCH_TEXT_FIELDS = (('student_name', 3.0), ('guardian_name', 1.0), ('status', 0.5))
+
+def normalize_search_text(value):
+    """Casefold and strip accents so 'José' matches 'jose'"""
+    value = unicodedata.normalize('NFKD', str(value or '')).casefold()
+    return ''.join(ch for ch in value if not unicodedata.combining(ch))
+
+def search_tokens(value):
+    return _SEARCH_TOKEN_PATTERN.findall(normalize_search_text(value))
+
+def normalize_email(value):
+    return str(value or '').strip().lower()
+
+def normalize_phone(value):
+    """Digits only, keeping the national number (last 10 digits)"""
+    digits = re.sub(r'\D', '', str(value or ''))
+    return digits[-10:]
+
+def normalize_phone_e164(value):
+    """E.164 form ('+919876543210'); bare national numbers get DEFAULT_PHONE_COUNTRY_CODE"""
+    raw = str(value or '').strip()
+    digits = re.sub(r'\D', '', raw)
+    if raw.startswith('+'):
+        return f"+{digits}" if digits else ''
+    if digits.startswith('00'):
+        return f"+{digits[2:]}"
+    digits = digits.lstrip('0')
+    if len(digits) < 7:
+        return ''
+    if len(digits) <= 10:
+        return f"+{DEFAULT_PHONE_COUNTRY_CODE}{digits}"
+    return f"+{digits}"
+
+def normalize_room(value):
+    """'Room 204', 'rm-204' and '204' all normalize to '204'"""
+    room = re.sub(r'[\s\-#]+', '', str(value or '')).upper()
+    for prefix in ('ROOMNO', 'ROOM', 'RM'):
+        if room.startswith(prefix) and len(room) > len(prefix):
+            return room[len(prefix):]
+    return room
+
+def _trigrams(token):
+    padded = f"${token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class SortedKeys:
+    """Dict of key -> doc IDs with lazily sorted keys for prefix scans"""
+
+    def __init__(self):
+        self.postings = {}
+        self._sorted = []
+        self._dirty = False
+
+    def add(self, key, doc_id):
+        docs = self.postings.get(key)
+        if docs is None:
+            docs = self.postings[key] = set()
+            self._dirty = True
+        docs.add(doc_id)
+
+    def discard(self, key, doc_id):
+        docs = self.postings.get(key)
+        if docs is not None:
+            docs.discard(doc_id)
+            if not docs:
+                del self.postings[key]
+                self._dirty = True
+                return True
+        return False
+
+    def prefixed(self, prefix, limit=SEARCH_PREFIX_EXPANSION):
+        """Yield keys starting with prefix (excluding the exact key)"""
+        if self._dirty:
+            self._sorted = sorted(self.postings)
+            self._dirty = False
+        keys = self._sorted
+        index = bisect_left(keys, prefix)
+        count = 0
+        while index < len(keys) and keys[index].startswith(prefix) and count < limit:
+            if keys[index] != prefix:
+                yield keys[index]
+                count += 1
+            index += 1
+
+class SearchIndex:
+    """In-process inverted index over decoded application records.
+
+    Name-like fields are tokenized for exact, prefix and trigram-fuzzy
+    matching; email, phone (national digits; any run of four or more digits
+    is searchable), room and application ID are matched on normalized keys.
+    Updated incrementally via publish_application()/retract_application(),
+    and brought up to date with other workers and Notion before each query
+    by sync_search_index().
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+        self._touched = {}
+        self.built_at = 0.0
+        self.synced_at = 0.0
+
+    def _reset(self):
+        self.records = {}
+        self._doc_keys = {}
+        self.tokens = SortedKeys()
+        self.token_weights = {}
+        self.trigrams = defaultdict(set)
+        self.emails = SortedKeys()
+        self.phones = SortedKeys()
+        self.phone_suffixes = SortedKeys()
+        self.rooms = SortedKeys()
+        self.application_ids = SortedKeys()
+
+    def _keys_for(self, record):
+        tokens = {}
+        for field, weight in SEARCH_TEXT_FIELDS:
+            for token in search_tokens(record.get(field)):
+                tokens[token] = max(tokens.get(token, 0.0), weight)
+        phones = {normalize_phone(record.get(field)) for field in ('phone', 'guardian_phone', 'emergency_contact')} - {''}
+        return {
+            'tokens': tokens,
+            'emails': {normalize_email(record.get('email'))} - {''},
+            'phones': phones,
+            # A prefix of some suffix is a substring, so partial numbers match wherever they fall
+            'phone_suffixes': {phone[i:] for phone in phones for i in range(len(phone) - SEARCH_PHONE_MIN_DIGITS + 1)},
+            'rooms': {normalize_room(record.get('room_number'))} - {''},
+            'application_ids': {str(record.get('application_id') or '').upper()} - {''}
+        }
+
+    def upsert(self, record):
+        """Add or replace one record"""
+        with self._lock:
+            self._touched[normalize_page_id(record['id'])] = time.time()
+            self._upsert(record)
+
+    def _upsert(self, record):
+        doc_id = normalize_page_id(record['id'])
+        with self._lock:
+            if self.records.get(doc_id) == record:
+                return
+            self._remove(doc_id)
+            keys = self._keys_for(record)
+            for token, weight in keys['tokens'].items():
+                if token not in self.tokens.postings:
+                    for trigram in _trigrams(token):
+                        self.trigrams[trigram].add(token)
+                self.tokens.add(token, doc_id)
+                self.token_weights[(token, doc_id)] = weight
+            for name in ('emails', 'phones', 'phone_suffixes', 'rooms', 'application_ids'):
+                index = getattr(self, name)
+                for key in keys[name]:
+                    index.add(key, doc_id)
+            self.records[doc_id] = dict(record)
+            self._doc_keys[doc_id] = keys
+
+    def get(self, page_id):
+        """Return a copy of the indexed record, or None"""
+        with self._lock:
+            record = self.records.get(normalize_page_id(page_id))
+            return dict(record) if record is not None else None
+
+    def remove(self, page_id):
+        """Drop one record"""
+        doc_id = normalize_page_id(page_id)
+        with self._lock:
+            self._touched[doc_id] = time.time()
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        keys = self._doc_keys.pop(doc_id, None)
+        if keys is None:
+            return
+        self.records.pop(doc_id, None)
+        for token in keys['tokens']:
+            self.token_weights.pop((token, doc_id), None)
+            if self.tokens.discard(token, doc_id):
+                for trigram in _trigrams(token):
+                    bucket = self.trigrams.get(trigram)
+                    if bucket is not None:
+                        bucket.discard(token)
+                        if not bucket:
+                            del self.trigrams[trigram]
+        for name in ('emails', 'phones', 'phone_suffixes', 'rooms', 'application_ids'):
+            index = getattr(self, name)
+            for key in keys[name]:
+                index.discard(key, doc_id)
+
+    def rebuild(self, records, started=None):
+        """Replace the whole index with a fresh scan.
+
+        Records published or retracted since ``started`` (when the scan
+        began) are newer than the scan's copies and are kept instead.
+        """
+        with self._lock:
+            newer = {doc_id: self.records.get(doc_id) for doc_id, at in self._touched.items()
+                     if started is not None and at >= started}
+            self._reset()
+            self._touched = {}
+            for record in records:
+                if normalize_page_id(record['id']) not in newer:
+                    self._upsert(record)
+            for record in newer.values():
+                if record is not None:
+                    self._upsert(record)
+            self.built_at = time.time()
+            self.synced_at = self.built_at if started is None else started
+
+    def is_stale(self):
+        return not self.built_at or time.time() - self.built_at > SEARCH_INDEX_MAX_AGE
+
+    def _match_term(self, term):
+        """Return {doc_id: score} for one query token (exact, prefix, fuzzy)"""
+        scores = {}
+        weights = self.token_weights
+
+        def credit(token, factor):
+            for doc_id in self.tokens.postings.get(token, ()):
+                score = weights[(token, doc_id)] * factor
+                if score > scores.get(doc_id, 0.0):
+                    scores[doc_id] = score
+
+        credit(term, 3.0)
+        for token in self.tokens.prefixed(term):
+            credit(token, 2.0)
+        if len(term) >= 3:
+            term_grams = _trigrams(term)
+            shared = defaultdict(int)
+            for trigram in term_grams:
+                for token in self.trigrams.get(trigram, ()):
+                    shared[token] += 1
+            for token, common in shared.items():
+                if token == term or token.startswith(term):
+                    continue
+                similarity = common / (len(term_grams) + len(token) - common)
+                if similarity >= SEARCH_FUZZY_THRESHOLD:
+                    credit(token, similarity)
+        return scores
+
+    def _match_keys(self, query):
+        """Whole-query matches on email, phone, room and application ID"""
+        scores = defaultdict(float)
+        email = normalize_email(query)
+        if email:
+            for doc_id in self.emails.postings.get(email, ()):
+                scores[doc_id] += 10.0
+            if len(email) >= 3:
+                for key in self.emails.prefixed(email):
+                    for doc_id in self.emails.postings[key]:
+                        scores[doc_id] += 4.0
+        digits = re.sub(r'\D', '', query)
+        if len(digits) >= SEARCH_PHONE_MIN_DIGITS and len(digits) * 2 >= len(re.sub(r'\s', '', query)):
+            national = normalize_phone(digits)
+            exact = self.phones.postings.get(national, set())
+            for doc_id in exact:
+                scores[doc_id] += 10.0
+            partial = set(self.phone_suffixes.postings.get(national, ()))
+            for key in self.phone_suffixes.prefixed(national):
+                partial.update(self.phone_suffixes.postings[key])
+            for doc_id in partial - exact:
+                scores[doc_id] += 6.0
+        for doc_id in self.rooms.postings.get(normalize_room(query), ()):
+            scores[doc_id] += 8.0
+        application_id = query.strip().upper()
+        for doc_id in self.application_ids.postings.get(application_id, ()):
+            scores[doc_id] += 10.0
+        if len(application_id) >= 4:
+            for key in self.application_ids.prefixed(application_id):
+                for doc_id in self.application_ids.postings[key]:
+                    scores[doc_id] += 3.0
+        return scores
+
+    def search(self, query, status=None, page=1, per_page=20):
+        """Return (ranked records for the page, total matches)"""
+        with self._lock:
+            scores = self._match_keys(query)
+            terms = search_tokens(query)
+            if terms:
+                # Every term must match some token (AND), scores add up
+                combined = None
+                for term in terms:
+                    term_scores = self._match_term(term)
+                    if combined is None:
+                        combined = term_scores
+                    else:
+                        combined = {doc_id: score + term_scores[doc_id] for doc_id, score in combined.items() if doc_id in term_scores}
+                    if not combined:
+                        break
+                for doc_id, score in (combined or {}).items():
+                    scores[doc_id] += score
+            ranked = [
+                (score, self.records[doc_id])
+                for doc_id, score in scores.items()
+                if not status or self.records[doc_id].get('status') == status
+            ]
+        ranked.sort(key=lambda item: item[1].get('submission_date') or '', reverse=True)
+        ranked.sort(key=lambda item: item[0], reverse=True)
+        start = (page - 1) * per_page
+        results = []
+        for score, record in ranked[start:start + per_page]:
+            result = dict(record)
+            result['score'] = round(score, 3)
+            results.append(result)
+        return results, len(ranked)
+
+search_index = SearchIndex()
+
+# Room occupancy configuration
+ROOM_CAPACITY = int(os.getenv('ROOM_CAPACITY', '1'))
+ROOM_CAPACITIES = {normalize_room(room): int(capacity) for room, capacity in json.loads(os.getenv('ROOM_CAPACITIES') or '{}').items()}
+ROOM_INDEX_MAX_AGE = float(os.getenv('ROOM_INDEX_MAX_AGE', '900'))
+OCCUPYING_STATUS = 'Approved'
+
+class RoomOccupancyIndex:
+    """Room -> occupants map for allocation conflict checks.
+
+    Only approved applications occupy a bed; pending ones are listed so
+    admins can see demand. Kept in SQLite (ANALYTICS_DB) beside the
+    duplicate index, so every worker sees every assignment and a restart
+    does not need a full Notion scan before the first check. Approvals go
+    through ``reserve``, which checks the room and takes the bed in one
+    BEGIN IMMEDIATE transaction, so two workers cannot both fill the last
+    bed. A removed application leaves a tombstone (room NULL), so a
+    rebuild from an older scan does not bring it back.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._connection = None
+        self._pid = None
+        self._known = {}
+
+    def _db(self):
+        # One connection per process; reopened after a fork
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS room_assignments (id TEXT PRIMARY KEY, room TEXT, status TEXT, '
+                'occupant TEXT, updated_at REAL NOT NULL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS room_assignments_room ON room_assignments (room, status)')
+            connection.execute('CREATE TABLE IF NOT EXISTS room_meta (key TEXT PRIMARY KEY, value REAL)')
+            self._connection = connection
+            self._pid = os.getpid()
+            self._known = {}
+        return self._connection
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            db = self._db()
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                yield db
+                db.execute('COMMIT')
+            except Exception:
+                db.execute('ROLLBACK')
+                raise
+
+    def capacity(self, room):
+        return ROOM_CAPACITIES.get(room, ROOM_CAPACITY)
+
+    @staticmethod
+    def _entry_of(record):
+        """(room, occupant) for a record; room is None when it has none"""
+        occupant = {
+            'id': record['id'],
+            'student_name': record.get('student_name', ''),
+            'application_id': record.get('application_id', ''),
+            'status': record.get('status') or 'Pending Review'
+        }
+        return normalize_room(record.get('room_number')) or None, occupant
+
+    @staticmethod
+    def _write(db, doc_id, entry, updated_at):
+        room, occupant = entry if entry is not None else (None, None)
+        db.execute(
+            'INSERT OR REPLACE INTO room_assignments (id, room, status, occupant, updated_at) VALUES (?, ?, ?, ?, ?)',
+            (doc_id, room, occupant and occupant['status'], occupant and json.dumps(occupant), updated_at)
+        )
+
+    def upsert(self, record):
+        """Place (or move) one application in the occupancy map"""
+        doc_id = normalize_page_id(record['id'])
+        entry = self._entry_of(record)
+        if doc_id in self._known and self._known[doc_id] == entry:
+            return
+        try:
+            with self._transaction() as db:
+                self._write(db, doc_id, entry, time.time())
+            self._known[doc_id] = entry
+        except sqlite3.Error as e:
+            print(f"Failed to update room occupancy: {e}")
+
+    def remove(self, page_id):
+        doc_id = normalize_page_id(page_id)
+        try:
+            with self._transaction() as db:
+                self._write(db, doc_id, None, time.time())
+            self._known[doc_id] = None
+        except sqlite3.Error as e:
+            print(f"Failed to update room occupancy: {e}")
+
+    def rebuild(self, records, started=None):
+        """Replace the map with a fresh scan, keeping changes any worker published since ``started``"""
+        started = time.time() if started is None else started
+        with self._transaction() as db:
+            newer = {row[0] for row in db.execute('SELECT id FROM room_assignments WHERE updated_at >= ?', (started,))}
+            db.execute('DELETE FROM room_assignments WHERE updated_at < ?', (started,))
+            known = {}
+            for record in records:
+                doc_id = normalize_page_id(record['id'])
+                if doc_id not in newer:
+                    entry = self._entry_of(record)
+                    self._write(db, doc_id, entry, started)
+                    known[doc_id] = entry
+            db.execute("INSERT OR REPLACE INTO room_meta (key, value) VALUES ('built_at', ?)", (time.time(),))
+        self._known = known
+
+    @property
+    def built_at(self):
+        """When any worker last rebuilt the map (0 if never)"""
+        try:
+            with self._lock:
+                row = self._db().execute("SELECT value FROM room_meta WHERE key = 'built_at'").fetchone()
+        except sqlite3.Error:
+            return 0.0
+        return row[0] if row else 0.0
+
+    def is_stale(self):
+        built_at = self.built_at
+        return not built_at or time.time() - built_at > ROOM_INDEX_MAX_AGE
+
+    def _assignment(self, page_id):
+        with self._lock:
+            return self._db().execute(
+                'SELECT room, status, occupant FROM room_assignments WHERE id = ?', (normalize_page_id(page_id),)
+            ).fetchone()
+
+    def room_of(self, page_id):
+        """Return the normalized room currently recorded for an application"""
+        row = self._assignment(page_id)
+        return (row[0] or '') if row else ''
+
+    def status_of(self, page_id):
+        """Return the status recorded for an application, if it is indexed"""
+        row = self._assignment(page_id)
+        return row[1] if row else None
+
+    @staticmethod
+    def _approved_in(db, room, exclude):
+        return [json.loads(row[0]) for row in db.execute(
+            'SELECT occupant FROM room_assignments WHERE room = ? AND status = ? AND id != ?',
+            (room, OCCUPYING_STATUS, exclude or '')
+        )]
+
+    def conflict(self, room_number, page_id=None):
+        """Return conflict details if approving page_id into room_number would overbook it"""
+        room = normalize_room(room_number)
+        if not room:
+            return None
+        with self._lock:
+            occupants = self._approved_in(self._db(), room, normalize_page_id(page_id) if page_id else None)
+        capacity = self.capacity(room)
+        if len(occupants) < capacity:
+            return None
+        return {'room': room, 'capacity': capacity, 'occupants': occupants}
+
+    def reserve(self, page_id, room_number=None):
+        """Approve page_id into room_number (or its recorded room) unless that overbooks it.
+
+        Returns the conflict, or None once the bed is held. The check and the
+        write share one transaction, so concurrent approvals on any worker
+        are serialized.
+        """
+        doc_id = normalize_page_id(page_id)
+        with self._transaction() as db:
+            row = db.execute('SELECT room, occupant FROM room_assignments WHERE id = ?', (doc_id,)).fetchone()
+            room = normalize_room(room_number) or (row[0] if row else None)
+            if not room:
+                return None
+            occupants = self._approved_in(db, room, doc_id)
+            capacity = self.capacity(room)
+            if len(occupants) >= capacity:
+                return {'room': room, 'capacity': capacity, 'occupants': occupants}
+            occupant = json.loads(row[1]) if row and row[1] else {'id': page_id, 'student_name': '', 'application_id': ''}
+            self._write(db, doc_id, (room, dict(occupant, status=OCCUPYING_STATUS)), time.time())
+        self._known.pop(doc_id, None)
+        return None
+
+    def summary(self, room_number=None):
+        """Occupancy per room (or for one room)"""
+        by_room = defaultdict(list)
+        with self._lock:
+            if room_number:
+                room = normalize_room(room_number)
+                by_room[room] = []
+                rows = self._db().execute('SELECT room, occupant FROM room_assignments WHERE room = ?', (room,))
+            else:
+                rows = self._db().execute('SELECT room, occupant FROM room_assignments WHERE room IS NOT NULL')
+            for room, occupant in rows:
+                by_room[room].append(json.loads(occupant))
+        result = []
+        for room in sorted(by_room):
+            occupants = by_room[room]
+            approved = [occupant for occupant in occupants if occupant['status'] == OCCUPYING_STATUS]
+            capacity = self.capacity(room)
+            result.append({
+                'room': room,
+                'capacity': capacity,
+                'occupied': len(approved),
+                'available': max(capacity - len(approved), 0),
+                'overbooked': len(approved) > capacity,
+                'occupants': approved,
+                'pending': [occupant for occupant in occupants if occupant['status'] != OCCUPYING_STATUS]
+            })
+        return result
+
+# Duplicate-applicant detection at submit time
+DUPLICATE_POLICY = os.getenv('DUPLICATE_POLICY', 'flag').lower()
+DUPLICATE_INDEX_MAX_AGE = float(os.getenv('DUPLICATE_INDEX_MAX_AGE', '900'))
+DEFAULT_PHONE_COUNTRY_CODE = os.getenv('DEFAULT_PHONE_COUNTRY_CODE', '91')
+# A rejected applicant may apply again, so rejected records are not indexed
+DUPLICATE_IGNORED_STATUSES = {'Rejected'}
+
+def applicant_keys(email, phone, name, date_of_birth):
+    """Hash keys identifying an applicant: email, E.164 phone, and name + date of birth"""
+    keys = set()
+    email = normalize_email(email)
+    if email:
+        keys.add(('email', email))
+    phone = normalize_phone_e164(phone)
+    if phone:
+        keys.add(('phone', phone))
+    name = ' '.join(search_tokens(name))
+    date_of_birth = str(date_of_birth or '')[:10]
+    if name and date_of_birth:
+        keys.add(('name_dob', f"{name}|{date_of_birth}"))
+    return keys
+
+class DuplicateApplicantIndex:
+    """Applicant key -> applications map for duplicate checks at submit.
+
+    Kept in SQLite (ANALYTICS_DB) beside the stats rollups, so every worker
+    sees the applications any of them has published and one rebuild serves
+    them all; a check is an indexed lookup and never queries Notion. A
+    removed application leaves a tombstone, so a rebuild from a scan that
+    started before the removal does not bring it back. An in-memory mirror
+    skips writes for unchanged records.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._connection = None
+        self._pid = None
+        self._known = {}
+
+    def _db(self):
+        # One connection per process; reopened after a fork
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS duplicate_applicants (id TEXT PRIMARY KEY, summary TEXT, '
+                'updated_at REAL NOT NULL)'
+            )
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS duplicate_keys (kind TEXT NOT NULL, value TEXT NOT NULL, '
+                'id TEXT NOT NULL, PRIMARY KEY (kind, value, id)) WITHOUT ROWID'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS duplicate_keys_id ON duplicate_keys (id)')
+            connection.execute('CREATE TABLE IF NOT EXISTS duplicate_meta (key TEXT PRIMARY KEY, value REAL)')
+            self._connection = connection
+            self._pid = os.getpid()
+            self._known = {}
+        return self._connection
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            db = self._db()
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                yield db
+                db.execute('COMMIT')
+            except Exception:
+                db.execute('ROLLBACK')
+                raise
+
+    @staticmethod
+    def _entry_of(record):
+        """(keys, summary) for an indexed record, or None for one that is not indexed"""
+        if record.get('status') in DUPLICATE_IGNORED_STATUSES:
+            return None
+        keys = applicant_keys(record.get('email'), record.get('phone'),
+                              record.get('student_name'), record.get('date_of_birth'))
+        summary = {
+            'id': record['id'],
+            'application_id': record.get('application_id', ''),
+            'student_name': record.get('student_name', ''),
+            'status': record.get('status') or 'Pending Review',
+            'submission_date': record.get('submission_date', '')
+        }
+        return sorted(keys), summary
+
+    @staticmethod
+    def _write(db, doc_id, entry, updated_at):
+        db.execute('DELETE FROM duplicate_keys WHERE id = ?', (doc_id,))
+        if entry is None:
+            summary = None
+        else:
+            keys, summary = entry
+            db.executemany('INSERT OR IGNORE INTO duplicate_keys (kind, value, id) VALUES (?, ?, ?)',
+                           [(kind, value, doc_id) for kind, value in keys])
+            summary = json.dumps(summary)
+        db.execute('INSERT OR REPLACE INTO duplicate_applicants (id, summary, updated_at) VALUES (?, ?, ?)',
+                   (doc_id, summary, updated_at))
+
+    def upsert(self, record):
+        doc_id = normalize_page_id(record['id'])
+        entry = self._entry_of(record)
+        if doc_id in self._known and self._known[doc_id] == entry:
+            return
+        try:
+            with self._transaction() as db:
+                self._write(db, doc_id, entry, time.time())
+            self._known[doc_id] = entry
+        except sqlite3.Error as e:
+            print(f"Failed to update duplicate index: {e}")
+
+    def remove(self, page_id):
+        doc_id = normalize_page_id(page_id)
+        try:
+            with self._transaction() as db:
+                self._write(db, doc_id, None, time.time())
+            self._known[doc_id] = None
+        except sqlite3.Error as e:
+            print(f"Failed to update duplicate index: {e}")
+
+    def rebuild(self, records, started=None):
+        """Replace the map with a fresh scan, keeping changes any worker published since ``started``"""
+        started = time.time() if started is None else started
+        with self._transaction() as db:
+            newer = {row[0] for row in db.execute('SELECT id FROM duplicate_applicants WHERE updated_at >= ?', (started,))}
+            db.execute('DELETE FROM duplicate_keys WHERE id NOT IN '
+                       '(SELECT id FROM duplicate_applicants WHERE updated_at >= ?)', (started,))
+            db.execute('DELETE FROM duplicate_applicants WHERE updated_at < ?', (started,))
+            known = {}
+            for record in records:
+                doc_id = normalize_page_id(record['id'])
+                if doc_id not in newer:
+                    entry = self._entry_of(record)
+                    if entry is not None:
+                        self._write(db, doc_id, entry, started)
+                    known[doc_id] = entry
+            db.execute("INSERT OR REPLACE INTO duplicate_meta (key, value) VALUES ('built_at', ?)", (time.time(),))
+        self._known = known
+
+    @property
+    def built_at(self):
+        """When any worker last rebuilt the index (0 if never)"""
+        try:
+            with self._lock:
+                row = self._db().execute("SELECT value FROM duplicate_meta WHERE key = 'built_at'").fetchone()
+        except sqlite3.Error:
+            return 0.0
+        return row[0] if row else 0.0
+
+    def is_stale(self):
+        built_at = self.built_at
+        return not built_at or time.time() - built_at > DUPLICATE_INDEX_MAX_AGE
+
+    def matches(self, form_data):
+        """Earlier applications sharing a key with a submission, oldest first"""
+        keys = applicant_keys(form_data.get('email'), form_data.get('phone'),
+                              form_data.get('fullName'), form_data.get('dateOfBirth'))
+        found = {}
+        try:
+            with self._lock:
+                db = self._db()
+                for kind, value in keys:
+                    for doc_id, summary in db.execute(
+                        'SELECT a.id, a.summary FROM duplicate_keys k JOIN duplicate_applicants a ON a.id = k.id '
+                        'WHERE k.kind = ? AND k.value = ? AND a.summary IS NOT NULL',
+                        (kind, value)
+                    ):
+                        match = found.setdefault(doc_id, dict(json.loads(summary), matched_on=[]))
+                        match['matched_on'].append(kind)
+        except sqlite3.Error as e:
+            print(f"Duplicate check skipped: {e}")
+            return []
+        for match in found.values():
+            match['matched_on'].sort()
+        return sorted(found.values(), key=lambda match: match['submission_date'] or '')
+
+def duplicate_message(matches):
+    earlier = matches[0]
+    return (f"Possible duplicate of {earlier['application_id'] or earlier['id']} "
+            f"({earlier['student_name']}, matched on {', '.join(earlier['matched_on'])})")
+
+# Time-series rollups for dashboard charts
+ANALYTICS_DB = os.getenv('ANALYTICS_DB', 'analytics.db')
+ANALYTICS_MAX_AGE = float(os.getenv('ANALYTICS_MAX_AGE', '3600'))
+ANALYTICS_MAX_BUCKETS = 1000
+ROLLUP_GRANULARITIES = ('hour', 'day', 'week')
+# Bucket for applications without a submission date (never inside a chart range)
+ROLLUP_UNDATED = 'undated'
+# Tombstones outlive rebuilds for a day so per-process search indexes can pick up removals
+ROLLUP_TOMBSTONE_RETENTION = 86400
+ROLLUP_DIMENSIONS = (('gender', 'gender'), ('relation', 'relation'), ('stay_duration', 'stay_duration'))
+
+def parse_record_datetime(value):
+    """Parse a Notion date/datetime string into a naive datetime (None if invalid).
+
+    Submission dates are written as naive local time and Notion echoes them
+    back as UTC, so aware values are converted to UTC and made naive again.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def bucket_start(moment, granularity):
+    """Start of the hour/day/ISO week containing moment"""
+    if granularity == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == 'week':
+        day -= timedelta(days=day.weekday())
+    return day
+
+def bucket_key(moment, granularity):
+    start = bucket_start(moment, granularity)
+    return start.strftime('%Y-%m-%dT%H:00') if granularity == 'hour' else start.strftime('%Y-%m-%d')
+
+class StatsRollup:
+    """Submission and status-transition counters bucketed by hour, day and week.
+
+    Kept in SQLite (ANALYTICS_DB) so counts survive restarts and several
+    workers can update them: each application's last seen state is stored,
+    and counters only move when a conditional insert/update of that state
+    succeeds, so a change is counted once however many workers observe it.
+    Submissions (with gender/relation/stay-duration breakdowns) are counted
+    in the bucket of their submission date (or the ``undated`` bucket when
+    it is missing); status changes in the bucket of when they were observed.
+    Each state row records when it last changed, and a removed application
+    leaves a tombstone, so a rebuild never overwrites a change any worker
+    made after its scan began. An in-memory mirror skips unchanged records.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._connection = None
+        self._pid = None
+        self._known = {}
+
+    def _db(self):
+        # One connection per process; reopened after a fork
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS rollups (granularity TEXT NOT NULL, bucket TEXT NOT NULL, '
+                'metric TEXT NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (granularity, bucket, metric)) WITHOUT ROWID'
+            )
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS rollup_state (id TEXT PRIMARY KEY, submitted TEXT NOT NULL, '
+                'status TEXT NOT NULL, dimensions TEXT NOT NULL)'
+            )
+            columns = {row[1] for row in connection.execute('PRAGMA table_info(rollup_state)')}
+            if 'updated_at' not in columns:
+                connection.execute('ALTER TABLE rollup_state ADD COLUMN updated_at REAL NOT NULL DEFAULT 0')
+                connection.execute('ALTER TABLE rollup_state ADD COLUMN removed INTEGER NOT NULL DEFAULT 0')
+            connection.execute('CREATE TABLE IF NOT EXISTS rollup_meta (key TEXT PRIMARY KEY, value REAL)')
+            self._connection = connection
+            self._pid = os.getpid()
+            self._known = {}
+        return self._connection
+
+    @staticmethod
+    def _state_of(record):
+        submitted = parse_record_datetime(record.get('submission_date'))
+        dimensions = json.dumps([record.get(key) or 'Unknown' for _, key in ROLLUP_DIMENSIONS])
+        return submitted.isoformat() if submitted else '', record.get('status') or 'Pending Review', dimensions
+
+    @staticmethod
+    def _submission_metrics(submitted, dimensions):
+        metrics = ['submissions']
+        metrics += [f"{name}:{value}" for (name, _), value in zip(ROLLUP_DIMENSIONS, json.loads(dimensions))]
+        return (datetime.fromisoformat(submitted) if submitted else None), metrics
+
+    def _add(self, db, moment, metrics, delta):
+        for granularity in ROLLUP_GRANULARITIES:
+            bucket = bucket_key(moment, granularity) if moment is not None else ROLLUP_UNDATED
+            db.executemany(
+                'INSERT INTO rollups (granularity, bucket, metric, count) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (granularity, bucket, metric) DO UPDATE SET count = count + excluded.count',
+                [(granularity, bucket, metric, delta) for metric in metrics]
+            )
+
+    def _apply(self, db, doc_id, state, now, updated_at):
+        submitted, status, dimensions = state
+        row = db.execute('SELECT submitted, status, dimensions, removed FROM rollup_state WHERE id = ?', (doc_id,)).fetchone()
+        if row is None or row[3]:
+            db.execute('INSERT OR REPLACE INTO rollup_state (id, submitted, status, dimensions, updated_at, removed) '
+                       'VALUES (?, ?, ?, ?, ?, 0)', (doc_id, submitted, status, dimensions, updated_at))
+            moment, metrics = self._submission_metrics(submitted, dimensions)
+            self._add(db, moment, metrics + [f"entered:{status}"], 1)
+            return
+        if tuple(row[:3]) == state:
+            return
+        if (row[0], row[2]) != (submitted, dimensions):
+            moment, metrics = self._submission_metrics(row[0], row[2])
+            self._add(db, moment, metrics, -1)
+            moment, metrics = self._submission_metrics(submitted, dimensions)
+            self._add(db, moment, metrics, 1)
+        if row[1] != status:
+            self._add(db, now, [f"entered:{status}", f"transition:{row[1]}>{status}"], 1)
+        db.execute('UPDATE rollup_state SET submitted = ?, status = ?, dimensions = ?, updated_at = ? WHERE id = ?',
+                   (submitted, status, dimensions, updated_at, doc_id))
+
+    def _remove(self, db, doc_id, updated_at):
+        row = db.execute('SELECT submitted, dimensions, removed FROM rollup_state WHERE id = ?', (doc_id,)).fetchone()
+        if row is not None and not row[2]:
+            moment, metrics = self._submission_metrics(row[0], row[1])
+            self._add(db, moment, metrics, -1)
+        # The tombstone keeps a rebuild from an older scan from counting it again
+        db.execute('INSERT OR REPLACE INTO rollup_state (id, submitted, status, dimensions, updated_at, removed) '
+                   "VALUES (?, '', '', '[]', ?, 1)", (doc_id, updated_at))
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            db = self._db()
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                yield db
+                db.execute('COMMIT')
+            except Exception:
+                db.execute('ROLLBACK')
+                raise
+
+    def upsert(self, record):
+        doc_id = normalize_page_id(record['id'])
+        state = self._state_of(record)
+        if self._known.get(doc_id) == state:
+            return
+        try:
+            with self._transaction() as db:
+                self._apply(db, doc_id, state, datetime.now(), time.time())
+            self._known[doc_id] = state
+        except sqlite3.Error as e:
+            print(f"Failed to update analytics rollups: {e}")
+
+    def remove(self, page_id):
+        doc_id = normalize_page_id(page_id)
+        try:
+            with self._transaction() as db:
+                self._remove(db, doc_id, time.time())
+            self._known.pop(doc_id, None)
+        except sqlite3.Error as e:
+            print(f"Failed to update analytics rollups: {e}")
+
+    def rebuild(self, records, started=None):
+        """Reconcile with a full scan: new/changed records are counted, vanished ones removed.
+
+        Records any worker published or retracted since ``started`` (when the
+        scan began) are already newer than the scan and are left alone.
+        """
+        now = datetime.now()
+        started = time.time() if started is None else started
+        states = {normalize_page_id(record['id']): self._state_of(record) for record in records}
+        with self._transaction() as db:
+            newer = {row[0] for row in db.execute('SELECT id FROM rollup_state WHERE updated_at >= ?', (started,))}
+            for doc_id, state in states.items():
+                if doc_id not in newer:
+                    self._apply(db, doc_id, state, now, started)
+            for (doc_id,) in db.execute('SELECT id FROM rollup_state WHERE removed = 0 AND updated_at < ?', (started,)).fetchall():
+                if doc_id not in states:
+                    self._remove(db, doc_id, started)
+            db.execute('DELETE FROM rollup_state WHERE removed = 1 AND updated_at < ?', (started - ROLLUP_TOMBSTONE_RETENTION,))
+            db.execute("INSERT OR REPLACE INTO rollup_meta (key, value) VALUES ('built_at', ?)", (time.time(),))
+        self._known = {doc_id: state for doc_id, state in states.items() if doc_id not in newer}
+
+    def removed_since(self, since):
+        """IDs of applications any worker retracted at or after ``since``"""
+        with self._lock:
+            return [row[0] for row in self._db().execute(
+                'SELECT id FROM rollup_state WHERE removed = 1 AND updated_at >= ?', (since,)
+            )]
+
+    @property
+    def built_at(self):
+        """When any worker last reconciled the rollups (0 if never)"""
+        try:
+            with self._lock:
+                row = self._db().execute("SELECT value FROM rollup_meta WHERE key = 'built_at'").fetchone()
+        except sqlite3.Error:
+            return 0.0
+        return row[0] if row else 0.0
+
+    def is_stale(self):
+        built_at = self.built_at
+        return not built_at or time.time() - built_at > ANALYTICS_MAX_AGE
+
+    def series(self, granularity, start, end, prefixes=None):
+        """Buckets from start to end (inclusive) with every metric, zero-filled"""
+        first = bucket_start(start, granularity)
+        step = {'hour': timedelta(hours=1), 'day': timedelta(days=1), 'week': timedelta(weeks=1)}[granularity]
+        keys = []
+        moment = first
+        while moment <= end:
+            keys.append(bucket_key(moment, granularity))
+            moment += step
+        if len(keys) > ANALYTICS_MAX_BUCKETS:
+            raise ValueError(f"Range covers more than {ANALYTICS_MAX_BUCKETS} {granularity} buckets")
+        buckets = {key: {} for key in keys}
+        if keys:
+            with self._lock:
+                rows = self._db().execute(
+                    'SELECT bucket, metric, count FROM rollups WHERE granularity = ? AND bucket BETWEEN ? AND ?',
+                    (granularity, keys[0], keys[-1])
+                ).fetchall()
+            for bucket, metric, count in rows:
+                if count and bucket in buckets and (not prefixes or metric.split(':', 1)[0] in prefixes):
+                    buckets[bucket][metric] = count
+        return [{'bucket': key, 'metrics': buckets[key]} for key in keys]
+
+stats_rollup = StatsRollup(ANALYTICS_DB)
+duplicate_index = DuplicateApplicantIndex(ANALYTICS_DB)
+room_index = RoomOccupancyIndex(ANALYTICS_DB)
+
+# Indexes derived from application records, kept current by publish/retract
+DERIVED_INDEXES = (search_index, room_index, stats_rollup, duplicate_index)
+_index_build_lock = threading.Lock()
+# Submissions start a background rebuild once an index is stale, at most every INDEX_REFRESH_RETRY seconds
+INDEX_REFRESH_RETRY = 60
+_index_refresh = None
+_index_refresh_at = float('-inf')
+_index_refresh_lock = threading.Lock()
+
+def publish_application(page):
+    """Apply a page returned by Notion to the record cache and derived indexes.
+
+    Updates still waiting in the write-behind queue are laid over the page
+    first, so a stale read never undoes an acknowledged admin change.
+    """
+    page = notion_write_queue.overlay_page(page)
+    record = application_cache.put_page(page)
+    for index in DERIVED_INDEXES:
+        if record is None:
+            index.remove(page['id'])
+        else:
+            index.upsert(record)
+    return record
+
+def retract_application(page_id):
+    """Remove an archived application from the record cache and derived indexes"""
+    application_cache.invalidate(page_id)
+    for index in DERIVED_INDEXES:
+        index.remove(page_id)
+
+def query_database_pages(database_id, **query):
+    """Query every page of a Notion database, following pagination cursors"""
+    query = {key: value for key, value in query.items() if value is not None}
+    pages = []
+    cursor = None
+    while True:
+        if cursor:
+            query['start_cursor'] = cursor
+        response = notion_client.databases.query(database_id=database_id, page_size=100, **query)
+        pages.extend(response['results'])
+        if not response.get('has_more'):
+            return notion_write_queue.overlay_pages(pages)
+        cursor = response.get('next_cursor')
+
+def stale_indexes():
+    """Derived indexes that are missing or past their maximum age"""
+    return [index for index in DERIVED_INDEXES if index.is_stale()]
+
+def ensure_application_indexes():
+    """Rebuild derived indexes from one full Notion scan if any is missing or stale"""
+    if not stale_indexes():
+        return {'success': True}
+    with _index_build_lock:
+        stale = stale_indexes()
+        if not stale:
+            return {'success': True}
+        db_result = get_or_create_database()
+        if not db_result['success']:
+            return db_result
+        started = time.time()
+        pages = query_database_pages(db_result['database_id'])
+        rebuild_application_indexes(stale, pages, started)
+    return {'success': True}
+
+def sync_search_index():
+    """Apply changes made since the last sync, in Notion or by any worker, to this process's search index.
+
+    Asks Notion for pages edited since then (the window overlaps by
+    EDIT_TIME_SETTLE_SECONDS, as last_edited_time is rounded to the minute),
+    drops applications any worker retracted (the rollup tombstones), and
+    lays patches still in the write-behind queue over indexed records.
+    """
+    started = time.time()
+    db_result = get_or_create_database()
+    if not db_result['success']:
+        return db_result
+    since = datetime.fromtimestamp(search_index.synced_at - EDIT_TIME_SETTLE_SECONDS, timezone.utc)
+    pages = query_database_pages(db_result['database_id'], filter={
+        'timestamp': 'last_edited_time',
+        'last_edited_time': {'on_or_after': since.isoformat()}
+    })
+    for page in pages:
+        publish_application(page)
+    for doc_id in stats_rollup.removed_since(search_index.synced_at):
+        search_index.remove(doc_id)
+    for patch in notion_write_queue.pending_patches().values():
+        if patch['archived']:
+            search_index.remove(patch['page_id'])
+            continue
+        base = search_index.get(patch['page_id'])
+        if base is not None:
+            search_index.upsert({**base, **notion_write_queue.decoded_fields(patch['properties'])})
+    search_index.synced_at = started
+    return {'success': True}
+
+def rebuild_application_indexes(indexes, pages, started):
+    """Rebuild the given derived indexes from one full scan of application pages, begun at ``started``"""
+    records = COMPILED_SCHEMA['decode_admin'](pages)
+    for index in indexes:
+        index.rebuild(records, started)
+    print(f"Application indexes rebuilt from {len(pages)} applications")
+
+def refresh_application_indexes_async():
+    """Rebuild stale derived indexes on a background thread, so submissions never wait for the scan"""
+    global _index_refresh, _index_refresh_at
+    with _index_refresh_lock:
+        if (_index_refresh is not None and _index_refresh.is_alive()) or time.monotonic() < _index_refresh_at + INDEX_REFRESH_RETRY:
+            return
+        if not notion_client or not stale_indexes():
+            return
+        _index_refresh_at = time.monotonic()
+        def run():
+            try:
+                result = ensure_application_indexes()
+                if not result['success']:
+                    print(f"Index refresh failed: {result['error']}")
+            except Exception as e:
+                print(f"Index refresh failed: {e}")
+        _index_refresh = threading.Thread(target=run, name='index-refresh', daemon=True)
+        _index_refresh.start()
+
+def reserve_room(page_id, room_number=None):
+    """Hold a bed for approving page_id (into room_number, or its current room); returns the conflict if the room is full"""
     try:
-        notion_client = Client(auth=NOTION_INTEGRATION_SECRET)
-        print("Notion client initialized successfully")
-        # Try to load existing database ID
-        if load_stored_database_id():
-            print("Using existing database")
+        index_result = ensure_application_indexes()
+        if not index_result['success']:
+            print(f"Room check skipped: {index_result['error']}")
+            return None
+    except Exception as e:
+        print(f"Room check skipped: {e}")
+        return None
+    return room_index.reserve(page_id, room_number)
+
+def room_conflict_message(conflict):
+    return f"Room {conflict['room']} is full ({len(conflict['occupants'])}/{conflict['capacity']} approved)"
+
+# SQLite file holding submissions bound for Notion and queued admin edits
+SUBMISSION_JOURNAL = os.getenv('SUBMISSION_JOURNAL', 'submissions.db')
+
+# Write-behind queue for admin edits: updates are acknowledged at once, merged
+# per page over a short window and flushed to Notion in the background
+NOTION_WRITE_BEHIND = os.getenv('NOTION_WRITE_BEHIND', '1') == '1'
+WRITE_BEHIND_WINDOW = float(os.getenv('WRITE_BEHIND_WINDOW', '2'))
+NOTION_WRITE_RATE = float(os.getenv('NOTION_WRITE_RATE', '3'))
+WRITE_BEHIND_MAX_ATTEMPTS = 5
+
+SCHEMA_ADMIN_KEYS = {field['notion']: field['admin'] for field in APPLICATION_SCHEMA}
+
+def is_retryable_error(error):
+    """Rate limits, server errors and network failures are worth retrying"""
+    status = getattr(error, 'status', None)
+    return status is None or status == 429 or status >= 500
+
+class NotionWriteQueue:
+    """Durable, coalescing write-behind queue for Notion page updates.
+
+    ``submit`` merges a property patch (and/or archive flag) into the page's
+    row in SQLite and applies it to the record cache and derived indexes
+    right away. Rows are written with synchronous=FULL and shared by every
+    worker process, so an acknowledged edit survives a crash and is laid
+    over pages read back from Notion by any worker (read-your-writes). A
+    background thread claims rows once their window has passed and sends
+    them, at most ``rate`` calls per second across all workers (the next
+    free call slot is kept in the same database); rows claimed by a process
+    that died are reclaimed after JOURNAL_CLAIM_TIMEOUT.
+    """
+
+    def __init__(self, path, window=2.0, rate=3.0):
+        self.path = path
+        self.window = window
+        self.min_interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.RLock()
+        self._connection = None
+        self._pid = None
+        self._wake = threading.Event()
+        self._worker = None
+        self.submitted = 0
+        self.flushed = 0
+        self.failed = 0
+
+    def _db(self):
+        # One connection per process; reopened after a fork
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=FULL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS page_writes (page_key TEXT PRIMARY KEY, page_id TEXT NOT NULL, '
+                'properties TEXT NOT NULL, archived INTEGER, due REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, '
+                'version INTEGER NOT NULL DEFAULT 0, claimed_at REAL, updated_at REAL NOT NULL)'
+            )
+            connection.execute('CREATE TABLE IF NOT EXISTS page_write_meta (key TEXT PRIMARY KEY, value REAL)')
+            self._connection = connection
+            self._pid = os.getpid()
+            self._worker = None
+        return self._connection
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            db = self._db()
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                yield db
+                db.execute('COMMIT')
+            except Exception:
+                db.execute('ROLLBACK')
+                raise
+
+    @staticmethod
+    def _patch_of(row):
+        return {
+            'page_id': row['page_id'],
+            'properties': json.loads(row['properties']),
+            'archived': None if row['archived'] is None else bool(row['archived'])
+        }
+
+    @staticmethod
+    def decoded_fields(properties):
+        return {SCHEMA_ADMIN_KEYS[name]: FIELD_DECODERS[name](value)
+                for name, value in (properties or {}).items() if name in SCHEMA_ADMIN_KEYS}
+
+    def submit(self, page_id, properties=None, archived=None):
+        key = normalize_page_id(page_id)
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute('SELECT * FROM page_writes WHERE page_key = ?', (key,)).fetchone()
+            if row is None:
+                merged, flag, due = {}, None, now + self.window
+            else:
+                merged, flag = json.loads(row['properties']), row['archived']
+                # Changes made while the row is being sent get a window of their own
+                due = now + self.window if row['claimed_at'] is not None else row['due']
+            merged.update(properties or {})
+            if archived is not None:
+                flag = int(archived)
+            db.execute(
+                'INSERT INTO page_writes (page_key, page_id, properties, archived, due, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (page_key) DO UPDATE SET properties = excluded.properties, '
+                'archived = excluded.archived, due = excluded.due, version = version + 1, updated_at = excluded.updated_at',
+                (key, page_id, json.dumps(merged), flag, due, now)
+            )
+            self.submitted += 1
+        self.start()
+        self._apply_locally(page_id, properties, archived)
+
+    def _apply_locally(self, page_id, properties, archived):
+        if archived:
+            retract_application(page_id)
+            return
+        fields = self.decoded_fields(properties)
+        application_cache.patch(page_id, fields)
+        base = application_cache.get(page_id) or search_index.get(page_id)
+        if base is not None:
+            record = {**base, **fields}
+            for index in DERIVED_INDEXES:
+                index.upsert(record)
+
+    def pending(self, page_id):
+        """The queued patch for a page ({'page_id', 'properties', 'archived'}), or None"""
+        with self._lock:
+            row = self._db().execute('SELECT * FROM page_writes WHERE page_key = ?', (normalize_page_id(page_id),)).fetchone()
+        return self._patch_of(row) if row is not None else None
+
+    @staticmethod
+    def _overlay(page, patch):
+        page = dict(page, properties={**(page.get('properties') or {}), **patch['properties']})
+        if patch['archived'] is not None:
+            page['archived'] = patch['archived']
+        return page
+
+    def overlay_page(self, page):
+        """Return ``page`` with queued changes applied (unchanged if none)"""
+        if not page or not page.get('id'):
+            return page
+        patch = self.pending(page['id'])
+        return page if patch is None else self._overlay(page, patch)
+
+    def pending_patches(self):
+        """Every queued patch, keyed by normalized page ID"""
+        with self._lock:
+            return {row['page_key']: self._patch_of(row) for row in self._db().execute('SELECT * FROM page_writes')}
+
+    def overlay_pages(self, pages):
+        """Apply queued changes to query results, dropping pages queued for archiving"""
+        patches = self.pending_patches()
+        if not patches:
+            return pages
+        overlaid = []
+        for page in pages:
+            patch = patches.get(normalize_page_id(page['id']))
+            if patch is not None:
+                page = self._overlay(page, patch)
+            if not page.get('archived'):
+                overlaid.append(page)
+        return overlaid
+
+    def start(self):
+        """Start the sender thread if it is not running"""
+        with self._lock:
+            self._db()
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='notion-write-behind', daemon=True)
+                self._worker.start()
+        self._wake.set()
+
+    def resume(self):
+        """Start sending updates left queued by a previous run or another worker"""
+        if self.backlog():
+            print("Write-behind queue has pending updates, starting sender")
+            self.start()
+
+    def backlog(self):
+        """(queued, being sent) row counts"""
+        with self._lock:
+            row = self._db().execute('SELECT COUNT(*), COUNT(claimed_at) FROM page_writes').fetchone()
+        return row[0] - row[1], row[1]
+
+    def _claim_due(self):
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute(
+                'SELECT * FROM page_writes WHERE (claimed_at IS NULL AND due <= ?) OR claimed_at < ? ORDER BY due LIMIT 1',
+                (now, now - JOURNAL_CLAIM_TIMEOUT)
+            ).fetchone()
+            if row is not None:
+                db.execute('UPDATE page_writes SET claimed_at = ? WHERE page_key = ?', (now, row['page_key']))
+        return dict(row) if row is not None else None
+
+    def _next_due_in(self):
+        with self._lock:
+            row = self._db().execute('SELECT MIN(due) FROM page_writes WHERE claimed_at IS NULL').fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                entry = self._claim_due()
+                if entry is not None:
+                    self._flush(entry)
+                    continue
+                wait = self._next_due_in()
+            except Exception as e:
+                print(f"Write-behind queue error: {e}")
+                wait = 30
+            # Poll even when idle, to pick up rows another worker left behind
+            self._wake.wait(60 if wait is None else min(wait, 60))
+
+    def _wait_for_slot(self):
+        """Take the next Notion call slot shared by every worker, sleeping until it comes"""
+        if not self.min_interval:
+            return
+        with self._transaction() as db:
+            row = db.execute("SELECT value FROM page_write_meta WHERE key = 'next_call'").fetchone()
+            now = time.time()
+            slot = max(now, row[0] if row else 0.0)
+            db.execute("INSERT OR REPLACE INTO page_write_meta (key, value) VALUES ('next_call', ?)",
+                       (slot + self.min_interval,))
+        if slot > now:
+            time.sleep(slot - now)
+
+    def _flush(self, entry):
+        self._wait_for_slot()
+        patch = self._patch_of(entry)
+        update = {'page_id': patch['page_id']}
+        if patch['properties']:
+            update['properties'] = patch['properties']
+        if patch['archived'] is not None:
+            update['archived'] = patch['archived']
+        try:
+            page = notion_client.pages.update(**update)
+        except Exception as e:
+            self._flush_failed(entry, e)
+            return
+        with self._transaction() as db:
+            sent = db.execute(
+                'DELETE FROM page_writes WHERE page_key = ? AND version = ?', (entry['page_key'], entry['version'])
+            ).rowcount
+            if not sent:
+                # Edited while in flight: the merged row goes again once its new window passes
+                db.execute('UPDATE page_writes SET claimed_at = NULL, attempts = 0 WHERE page_key = ?', (entry['page_key'],))
+            self.flushed += 1
+        if patch['archived']:
+            retract_application(patch['page_id'])
         else:
-            print("No existing database found, will create on first use")
+            publish_application(page)
+
+    def _flush_failed(self, entry, error):
+        attempts = entry['attempts'] + 1
+        page_id = entry['page_id']
+        if is_retryable_error(error) and attempts < WRITE_BEHIND_MAX_ATTEMPTS:
+            retry_after = getattr(error, 'headers', None) or {}
+            delay = float(retry_after.get('retry-after') or 2 ** attempts)
+            # Anything queued meanwhile is already merged into the row and goes with the retry
+            with self._transaction() as db:
+                db.execute(
+                    'UPDATE page_writes SET attempts = ?, due = ?, claimed_at = NULL, updated_at = ? WHERE page_key = ?',
+                    (attempts, time.time() + delay, time.time(), entry['page_key'])
+                )
+            print(f"Notion update for {page_id} failed, retrying in {delay:.1f}s: {error}")
+            return
+        with self._transaction() as db:
+            db.execute('DELETE FROM page_writes WHERE page_key = ?', (entry['page_key'],))
+            self.failed += 1
+        print(f"Dropping Notion update for {page_id} after {attempts} attempts: {error}")
+        # Re-read the page so local state stops showing the rejected change
+        application_cache.invalidate(page_id)
+        try:
+            publish_application(notion_client.pages.retrieve(page_id=page_id))
+        except Exception as e:
+            print(f"Could not refresh {page_id}: {e}")
+            retract_application(page_id)
+
+    def drain(self, timeout=10):
+        """Send everything queued now (used at shutdown); what is left is sent after restart"""
+        deadline = time.monotonic() + timeout
+        if not any(self.backlog()):
+            return True
+        with self._transaction() as db:
+            db.execute('UPDATE page_writes SET due = 0 WHERE claimed_at IS NULL')
+        self.start()
+        while time.monotonic() < deadline:
+            if not any(self.backlog()):
+                return True
+            time.sleep(0.05)
+        return False
+
+    def stats(self):
+        queued, sending = self.backlog()
+        return {
+            'pending': queued,
+            'inflight': sending,
+            'submitted': self.submitted,
+            'flushed': self.flushed,
+            'failed': self.failed,
+            'window_seconds': self.window
+        }
+
+notion_write_queue = NotionWriteQueue(SUBMISSION_JOURNAL, window=WRITE_BEHIND_WINDOW, rate=NOTION_WRITE_RATE)
+atexit.register(notion_write_queue.drain)
+
+def update_notion_page(page_id, properties=None, archived=None):
+    """Update a Notion page through the write-behind queue (or directly when disabled)"""
+    if NOTION_WRITE_BEHIND:
+        notion_write_queue.submit(page_id, properties, archived)
+        return
+    update = {'page_id': page_id}
+    if properties:
+        update['properties'] = properties
+    if archived is not None:
+        update['archived'] = archived
+    page = notion_client.pages.update(**update)
+    if archived:
+        retract_application(page_id)
+    else:
+        publish_application(page)
+
+def invalid_property(name, value):
+    """Why an encoded admin property would be rejected by Notion, or None"""
+    field = SCHEMA_FIELDS.get(name)
+    if field is None or field.get('editable') is False:
+        return f"{name} cannot be edited"
+    kind = field['type']
+    content = value.get(kind) if isinstance(value, dict) else None
+    if kind == 'select':
+        options = [option for option, _ in field['options']]
+        if (content or {}).get('name') not in options:
+            return f"{name} must be one of: {', '.join(options)}"
+    elif kind == 'date':
+        try:
+            datetime.strptime((content or {}).get('start'), '%Y-%m-%d')
+        except (TypeError, ValueError):
+            return f"{name} must be a date (YYYY-MM-DD)"
+    elif kind == 'title' and not _join_text(content or []).strip():
+        return f"{name} cannot be empty"
+    return None
+
+def retrieve_application_page(page_id):
+    """Fetch a page from Notion if it is a live application in this database, else None"""
+    if not _PAGE_KEY_PATTERN.fullmatch(normalize_page_id(page_id)):
+        return None
+    try:
+        page = notion_client.pages.retrieve(page_id=page_id)
     except Exception as e:
-        print(f"Failed to initialize Notion client: {e}")
-else:
-    print("Notion integration secret not found")
+        if getattr(e, 'status', None) in (400, 404):
+            return None
+        raise
+    db_result = get_or_create_database()
+    parent = (page.get('parent') or {}).get('database_id')
+    if (page.get('archived') or page.get('in_trash') or not db_result['success']
+            or not parent or normalize_page_id(parent) != normalize_page_id(db_result['database_id'])):
+        return None
+    return page
+
+def page_update_problem(page_id, properties=None):
+    """Why an admin update to page_id cannot be accepted, as (message, status), or None.
+
+    Checked before the update is acknowledged, since the write-behind queue
+    only reaches Notion afterwards: the values must fit the schema and the
+    page must be a live application in this database.
+    """
+    for name, value in (properties or {}).items():
+        problem = invalid_property(name, value)
+        if problem:
+            return problem, 400
+    not_found = ('Application not found', 404)
+    queued = notion_write_queue.pending(page_id)
+    if queued is not None and queued['archived']:
+        return not_found
+    if application_cache.get(page_id) is not None or search_index.get(page_id) is not None:
+        return None
+    page = retrieve_application_page(page_id)
+    if page is None:
+        return not_found
+    publish_application(page)
+    return None
 
 def send_telegram_message(message):
     """Send a text message to Telegram"""
@@ -88,27 +1994,90 @@ def send_telegram_message(message):
             'text': message,
             'parse_mode': 'HTML'
         }
-        response = requests.post(url, data=data, timeout=30)
+        response = telegram_session.post(url, data=data, timeout=current_deadline().timeout(TELEGRAM_TIMEOUT))
         return response.json()
     except Exception as e:
         print(f"Error sending Telegram message: {e}")
         raise
 
+class MultipartFileStream:
+    """multipart/form-data body that streams one file object.
+
+    It exposes read() and a length, so requests sends it with a
+    Content-Length and reads it in blocks instead of building the whole
+    body in memory.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, fields, file_field, filename, fileobj, content_type):
+        self.boundary = uuid.uuid4().hex
+        head = io.BytesIO()
+        for name, value in fields.items():
+            head.write(f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'.encode('utf-8'))
+            head.write(str(value).encode('utf-8') + b'\r\n')
+        safe_filename = filename.replace('"', '').replace('\r', '').replace('\n', '')
+        head.write((
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{safe_filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        ).encode('utf-8'))
+        tail = f'\r\n--{self.boundary}--\r\n'.encode('utf-8')
+        fileobj.seek(0, os.SEEK_END)
+        file_size = fileobj.tell()
+        fileobj.seek(0)
+        self._length = head.tell() + file_size + len(tail)
+        head.seek(0)
+        self._parts = [head, fileobj, io.BytesIO(tail)]
+
+    @property
+    def content_type(self):
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        chunks = []
+        while self._parts and (size < 0 or size > 0):
+            chunk = self._parts[0].read(size)
+            if not chunk:
+                self._parts.pop(0)
+                continue
+            chunks.append(chunk)
+            if size > 0:
+                size -= len(chunk)
+        return b''.join(chunks)
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
 def send_telegram_document(file_data, filename, caption=''):
-    """Send a PDF document to Telegram"""
+    """Send a PDF document to Telegram.
+
+    ``file_data`` may be bytes or a seekable file object; file objects are
+    streamed from disk rather than loaded into memory.
+    """
     if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
         raise ValueError("Telegram credentials not configured. Please set TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID environment variables.")
     
     try:
         url = f'https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendDocument'
-        files = {
-            'document': (filename, file_data, 'application/pdf')
-        }
         data = {
             'chat_id': TELEGRAM_CHAT_ID,
             'caption': caption
         }
-        response = requests.post(url, files=files, data=data, timeout=30)
+        if hasattr(file_data, 'read'):
+            body = MultipartFileStream(data, 'document', filename, file_data, 'application/pdf')
+            response = telegram_session.post(url, data=body, headers={'Content-Type': body.content_type}, timeout=current_deadline().timeout(TELEGRAM_TIMEOUT))
+        else:
+            files = {
+                'document': (filename, file_data, 'application/pdf')
+            }
+            response = telegram_session.post(url, files=files, data=data, timeout=current_deadline().timeout(TELEGRAM_TIMEOUT))
         return response.json()
     except Exception as e:
         print(f"Error sending Telegram document: {e}")
@@ -120,50 +2089,8 @@ def create_notion_database():
         return {'success': False, 'error': 'Notion client not initialized'}
     
     try:
-        # Create database properties
-        properties = {
-            "Student Name": {"title": {}},
-            "Application ID": {"rich_text": {}},
-            "Email": {"email": {}},
-            "Phone": {"phone_number": {}},
-            "Date of Birth": {"date": {}},
-            "Gender": {
-                "select": {
-                    "options": [
-                        {"name": "Male", "color": "blue"},
-                        {"name": "Female", "color": "pink"},
-                        {"name": "Other", "color": "gray"}
-                    ]
-                }
-            },
-            "Address": {"rich_text": {}},
-            "Guardian Name": {"rich_text": {}},
-            "Guardian Phone": {"phone_number": {}},
-            "Relation": {
-                "select": {
-                    "options": [
-                        {"name": "Father", "color": "blue"},
-                        {"name": "Mother", "color": "pink"},
-                        {"name": "Guardian", "color": "green"},
-                        {"name": "Other", "color": "gray"}
-                    ]
-                }
-            },
-            "Room Number": {"rich_text": {}},
-            "Admission Date": {"date": {}},
-            "Stay Duration": {"rich_text": {}},
-            "Emergency Contact": {"phone_number": {}},
-            "Status": {
-                "select": {
-                    "options": [
-                        {"name": "Pending Review", "color": "yellow"},
-                        {"name": "Approved", "color": "green"},
-                        {"name": "Rejected", "color": "red"}
-                    ]
-                }
-            },
-            "Submission Date": {"date": {}}
-        }
+        # Create database properties from the application schema
+        properties = COMPILED_SCHEMA['database_properties']
         
         # Create database
         database = notion_client.databases.create(
@@ -189,153 +2116,1106 @@ def create_notion_database():
         return {'success': False, 'error': str(e)}
 
 def get_or_create_database():
-    """Get existing database ID or create new one if needed"""
-    global ACTUAL_DATABASE_ID
+    """Get existing database ID or create new one if needed.
+
+    Single-flight: a recently verified ID is returned without calling Notion.
+    Otherwise one thread/worker per host resolves it under the bootstrap lock
+    while the others wait, then reuse the result it saved to DATABASE_ID_FILE.
+    """
+    if ACTUAL_DATABASE_ID and time.time() - DATABASE_VERIFIED_AT < DATABASE_VERIFY_TTL:
+        return {'success': True, 'database_id': ACTUAL_DATABASE_ID}
     
-    # If we already have a working database ID, use it
-    if ACTUAL_DATABASE_ID:
+    with database_bootstrap_lock():
+        # Another thread or worker may have resolved it while we waited
+        stored_id, verified_at = read_database_record()
+        if stored_id and time.time() - verified_at < DATABASE_VERIFY_TTL:
+            load_stored_database_id()
+            return {'success': True, 'database_id': stored_id}
+        
+        # Re-verify a known ID; only a definite "not found" discards it
+        candidate = stored_id or ACTUAL_DATABASE_ID
+        if candidate:
+            try:
+                notion_client.databases.retrieve(database_id=candidate)
+                save_database_id(candidate)
+                return {'success': True, 'database_id': candidate}
+            except Exception as e:
+                if not is_not_found_error(e):
+                    print(f"Could not verify database ID, keeping it: {e}")
+                    return {'success': True, 'database_id': candidate}
+                forget_database_id()
+        
+        # Try to use the provided ID as database first
         try:
-            notion_client.databases.retrieve(database_id=ACTUAL_DATABASE_ID)
-            return {'success': True, 'database_id': ACTUAL_DATABASE_ID}
-        except:
-            # If stored ID doesn't work, reset it
-            ACTUAL_DATABASE_ID = None
-            if os.path.exists(DATABASE_ID_FILE):
-                os.remove(DATABASE_ID_FILE)
-    
-    # Try to use the provided ID as database first
-    try:
-        notion_client.databases.retrieve(database_id=NOTION_DATABASE_ID)
-        ACTUAL_DATABASE_ID = NOTION_DATABASE_ID
-        save_database_id(ACTUAL_DATABASE_ID)
-        return {'success': True, 'database_id': NOTION_DATABASE_ID}
-    except Exception as db_error:
-        # If it's not a database, create one using the page ID
-        if "is a page, not a database" in str(db_error):
-            print("Creating database in the provided page...")
-            create_result = create_notion_database()
-            if create_result['success']:
-                ACTUAL_DATABASE_ID = create_result['database_id']
-                save_database_id(ACTUAL_DATABASE_ID)
-                print(f"Database created with ID: {ACTUAL_DATABASE_ID}")
-                return {'success': True, 'database_id': ACTUAL_DATABASE_ID}
+            notion_client.databases.retrieve(database_id=NOTION_DATABASE_ID)
+            save_database_id(NOTION_DATABASE_ID)
+            return {'success': True, 'database_id': NOTION_DATABASE_ID}
+        except Exception as db_error:
+            # If it's not a database, create one using the page ID
+            if "is a page, not a database" in str(db_error):
+                print("Creating database in the provided page...")
+                create_result = create_notion_database()
+                if create_result['success']:
+                    save_database_id(create_result['database_id'])
+                    print(f"Database created with ID: {ACTUAL_DATABASE_ID}")
+                    return {'success': True, 'database_id': ACTUAL_DATABASE_ID}
+                else:
+                    return {'success': False, 'error': f'Failed to create database: {create_result["error"]}'}
             else:
-                return {'success': False, 'error': f'Failed to create database: {create_result["error"]}'}
-        else:
-            return {'success': False, 'error': str(db_error)}
+                return {'success': False, 'error': str(db_error)}
+
+def build_submission_properties(form_data):
+    """Generate an application ID and the Notion properties for a new submission"""
+    app_id = f"HA-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    
+    properties = encode_properties(form_data, COMPILED_SCHEMA['form_encoders'])
+    properties["Student Name"] = FIELD_ENCODERS["Student Name"](form_data.get('fullName') or 'N/A')
+    properties["Application ID"] = FIELD_ENCODERS["Application ID"](app_id)
+    
+    # Always add status and submission date
+    properties["Status"] = FIELD_ENCODERS["Status"]("Pending Review")
+    properties["Submission Date"] = FIELD_ENCODERS["Submission Date"](datetime.now().isoformat())
+    return app_id, properties
+
+# Submission journal: every accepted submission is written to a local SQLite
+# journal before Notion is called, and replayed from there if Notion fails
+JOURNAL_MAX_BACKOFF = float(os.getenv('JOURNAL_MAX_BACKOFF', '300'))
+JOURNAL_RETENTION_DAYS = float(os.getenv('JOURNAL_RETENTION_DAYS', '7'))
+JOURNAL_CLAIM_TIMEOUT = 300
+
+class SubmissionJournal:
+    """Durable journal of submissions bound for Notion, with a background replayer.
+
+    Entries move pending -> sending -> done (or failed when Notion rejects the
+    data outright). Writes use synchronous=FULL, so an acknowledged submission
+    survives a crash. While Notion is failing, new submissions skip the inline
+    call and go straight to the replayer, so submit latency stays flat.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.outage_until = 0.0
+        self._wake = threading.Event()
+        self._replayer = None
+        self._replayer_lock = threading.Lock()
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        try:
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA synchronous=FULL')
+            if not self._initialized:
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS submissions ('
+                    'id INTEGER PRIMARY KEY AUTOINCREMENT, application_id TEXT NOT NULL, '
+                    'properties TEXT NOT NULL, state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, '
+                    'next_attempt REAL NOT NULL DEFAULT 0, claimed_at REAL, last_error TEXT, '
+                    'notion_page_id TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)'
+                )
+                connection.execute('CREATE INDEX IF NOT EXISTS submissions_state ON submissions (state, next_attempt)')
+                self._initialized = True
+            yield connection
+        finally:
+            connection.close()
+
+    def append(self, application_id, properties, claim=True):
+        """Durably record a submission; claimed entries are being sent inline"""
+        now = time.time()
+        with self._connect() as db:
+            cursor = db.execute(
+                'INSERT INTO submissions (application_id, properties, state, claimed_at, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (application_id, json.dumps(properties), 'sending' if claim else 'pending', now if claim else None, now, now)
+            )
+            return cursor.lastrowid
+
+    def complete(self, entry_id, page_id):
+        with self._connect() as db:
+            db.execute(
+                "UPDATE submissions SET state = 'done', notion_page_id = ?, last_error = NULL, updated_at = ? WHERE id = ?",
+                (page_id, time.time(), entry_id)
+            )
+        self.outage_until = 0.0
+
+    def defer(self, entry_id, error):
+        """Record a failed send: retry with backoff, or park it as failed"""
+        retryable = is_retryable_error(error)
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute('SELECT attempts FROM submissions WHERE id = ?', (entry_id,)).fetchone()
+            attempts = (row['attempts'] if row else 0) + 1
+            delay = min(JOURNAL_MAX_BACKOFF, 2 ** attempts)
+            db.execute(
+                'UPDATE submissions SET state = ?, attempts = ?, next_attempt = ?, claimed_at = NULL, '
+                'last_error = ?, updated_at = ? WHERE id = ?',
+                ('pending' if retryable else 'failed', attempts, now + delay, str(error)[:500], now, entry_id)
+            )
+        if retryable:
+            self.outage_until = time.monotonic() + delay
+            self.start()
+        return retryable
+
+    def has_backlog(self):
+        with self._connect() as db:
+            return db.execute("SELECT 1 FROM submissions WHERE state = 'pending' LIMIT 1").fetchone() is not None
+
+    def in_outage(self):
+        """True while Notion is known to be failing or older submissions are still queued"""
+        return time.monotonic() < self.outage_until or self.has_backlog()
+
+    def _claim_due(self):
+        now = time.time()
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                row = db.execute(
+                    "SELECT * FROM submissions WHERE (state = 'pending' AND next_attempt <= ?) "
+                    "OR (state = 'sending' AND claimed_at < ?) ORDER BY id LIMIT 1",
+                    (now, now - JOURNAL_CLAIM_TIMEOUT)
+                ).fetchone()
+                if row is not None:
+                    db.execute("UPDATE submissions SET state = 'sending', claimed_at = ? WHERE id = ?", (now, row['id']))
+                db.execute('COMMIT')
+            except Exception:
+                db.execute('ROLLBACK')
+                raise
+        return dict(row) if row is not None else None
+
+    def _next_due_in(self):
+        with self._connect() as db:
+            row = db.execute("SELECT MIN(next_attempt) FROM submissions WHERE state = 'pending'").fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def _prune(self):
+        with self._connect() as db:
+            db.execute(
+                "DELETE FROM submissions WHERE state = 'done' AND updated_at < ?",
+                (time.time() - JOURNAL_RETENTION_DAYS * 86400,)
+            )
+        sweep_journal_thumbnails()
+
+    def state_of(self, entry_id):
+        """(state, notion_page_id) of an entry, or None once it has been pruned"""
+        with self._connect() as db:
+            row = db.execute('SELECT state, notion_page_id FROM submissions WHERE id = ?', (entry_id,)).fetchone()
+        return (row['state'], row['notion_page_id']) if row is not None else None
+
+    def start(self):
+        """Start the replayer thread if it is not running"""
+        with self._replayer_lock:
+            if self._replayer is None or not self._replayer.is_alive():
+                self._replayer = threading.Thread(target=self._run, name='submission-replayer', daemon=True)
+                self._replayer.start()
+        self._wake.set()
+
+    def resume(self):
+        """Start replaying entries left over from a previous run"""
+        if self.has_backlog():
+            print("Submission journal has pending entries, starting replayer")
+            self.start()
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                entry = self._claim_due()
+                if entry is not None:
+                    self._replay(entry)
+                    continue
+                self._prune()
+                wait = self._next_due_in()
+            except Exception as e:
+                print(f"Submission replayer error: {e}")
+                wait = 30
+            self._wake.wait(60 if wait is None else min(wait, 60))
+
+    def _replay(self, entry):
+        try:
+            db_result = get_or_create_database()
+            if not db_result['success']:
+                raise RuntimeError(db_result['error'])
+            database_id = db_result['database_id']
+            page = None
+            properties = json.loads(entry['properties'])
+            if entry['attempts']:
+                # An earlier attempt may have reached Notion before failing.
+                # Application IDs are only unique to the second, so match the content too.
+                fingerprint = submission_fingerprint({'id': None, 'properties': properties})
+                existing = notion_client.databases.query(
+                    database_id=database_id,
+                    filter={"property": "Application ID", "rich_text": {"equals": entry['application_id']}},
+                    page_size=10
+                )['results']
+                page = next((candidate for candidate in existing if submission_fingerprint(candidate) == fingerprint), None)
+            if page is None:
+                page = notion_client.pages.create(
+                    parent={"database_id": database_id},
+                    properties=properties
+                )
+        except Exception as e:
+            retried = self.defer(entry['id'], e)
+            print(f"Replay of {entry['application_id']} failed ({'will retry' if retried else 'parked as failed'}): {e}")
+            return
+        self.complete(entry['id'], page['id'])
+        publish_application(page)
+        adopt_journal_thumbnails(entry['id'], page['id'])
+        print(f"Replayed submission {entry['application_id']} to Notion")
+
+    def retry(self, entry_id):
+        """Requeue a failed entry for immediate replay"""
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE submissions SET state = 'pending', next_attempt = 0, updated_at = ? WHERE id = ? AND state = 'failed'",
+                (time.time(), entry_id)
+            )
+        if cursor.rowcount:
+            self.start()
+        return bool(cursor.rowcount)
+
+    def backlog(self, limit=50):
+        """Counts by state plus the oldest entries that are not done"""
+        with self._connect() as db:
+            counts = {row['state']: row['count'] for row in db.execute(
+                'SELECT state, COUNT(*) AS count FROM submissions GROUP BY state'
+            )}
+            rows = db.execute(
+                "SELECT id, application_id, state, attempts, next_attempt, last_error, created_at "
+                "FROM submissions WHERE state != 'done' ORDER BY id LIMIT ?",
+                (limit,)
+            ).fetchall()
+        now = time.time()
+        entries = [{
+            'id': row['id'],
+            'application_id': row['application_id'],
+            'state': row['state'],
+            'attempts': row['attempts'],
+            'last_error': row['last_error'],
+            'age_seconds': round(now - row['created_at'], 1),
+            'next_attempt_in': round(max(0.0, row['next_attempt'] - now), 1) if row['state'] == 'pending' else None
+        } for row in rows]
+        return {
+            'counts': {state: counts.get(state, 0) for state in ('pending', 'sending', 'done', 'failed')},
+            'oldest_pending_seconds': max((entry['age_seconds'] for entry in entries if entry['state'] == 'pending'), default=0),
+            'notion_outage': time.monotonic() < self.outage_until,
+            'entries': entries
+        }
+
+submission_journal = SubmissionJournal(SUBMISSION_JOURNAL)
+
+def submission_fingerprint(page):
+    """Applicant-entered fields of a page, for recognising an already-created submission"""
+    record = decode_application_page(page)
+    return {key: value for key, value in record.items() if key not in ('id', 'status', 'submission_date')}
 
 def save_to_notion_database(form_data):
-    """Save form data to Notion database"""
+    """Save form data to Notion database.
+
+    The submission is journaled first. If Notion fails (or is already known
+    to be failing) it is reported as queued and the replayer delivers it.
+    """
     if not notion_client or not NOTION_DATABASE_ID:
         return {'success': False, 'error': 'Notion not configured'}
     
+    # Prepare properties for Notion page
+    app_id, properties = build_submission_properties(form_data)
+    
+    try:
+        # Outage, or too little budget left for the call: leave it to the replayer
+        if submission_journal.in_outage() or not current_deadline().allows():
+            entry_id = submission_journal.append(app_id, properties, claim=False)
+            submission_journal.start()
+            return {'success': True, 'queued': True, 'application_id': app_id, 'journal_entry': entry_id}
+        entry_id = submission_journal.append(app_id, properties)
+    except Exception as e:
+        print(f"Submission journal unavailable, saving without it: {e}")
+        entry_id = None
+    
     try:
-        # Generate application ID
-        app_id = f"HA-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        
         # Get or create the database
         db_result = get_or_create_database()
         if not db_result['success']:
-            return db_result
+            raise RuntimeError(db_result['error'])
         
         database_id = db_result['database_id']
         
-        # Prepare properties for Notion page
-        properties = {
-            "Student Name": {
-                "title": [
-                    {
-                        "text": {
-                            "content": form_data.get('fullName', 'N/A')
-                        }
-                    }
-                ]
-            },
-            "Application ID": {
-                "rich_text": [
-                    {
-                        "text": {
-                            "content": app_id
-                        }
-                    }
-                ]
-            }
-        }
-        
-        # Add other properties safely
-        if form_data.get('email'):
-            properties["Email"] = {"email": form_data.get('email')}
-        
-        if form_data.get('phone'):
-            properties["Phone"] = {"phone_number": form_data.get('phone')}
-        
-        if form_data.get('dateOfBirth'):
-            properties["Date of Birth"] = {"date": {"start": form_data.get('dateOfBirth')}}
-        
-        if form_data.get('gender'):
-            properties["Gender"] = {"select": {"name": form_data.get('gender').title()}}
-        
-        if form_data.get('address'):
-            properties["Address"] = {"rich_text": [{"text": {"content": form_data.get('address')}}]}
-        
-        if form_data.get('guardianName'):
-            properties["Guardian Name"] = {"rich_text": [{"text": {"content": form_data.get('guardianName')}}]}
-        
-        if form_data.get('guardianPhone'):
-            properties["Guardian Phone"] = {"phone_number": form_data.get('guardianPhone')}
-        
-        if form_data.get('relation'):
-            properties["Relation"] = {"select": {"name": form_data.get('relation').title()}}
-        
-        if form_data.get('roomNumber'):
-            properties["Room Number"] = {"rich_text": [{"text": {"content": form_data.get('roomNumber')}}]}
-        
-        if form_data.get('admissionDate'):
-            properties["Admission Date"] = {"date": {"start": form_data.get('admissionDate')}}
-        
-        if form_data.get('stayDuration'):
-            properties["Stay Duration"] = {"rich_text": [{"text": {"content": form_data.get('stayDuration')}}]}
-        
-        if form_data.get('emergencyContact'):
-            properties["Emergency Contact"] = {"phone_number": form_data.get('emergencyContact')}
-        
-        # Always add status and submission date
-        properties["Status"] = {"select": {"name": "Pending Review"}}
-        properties["Submission Date"] = {"date": {"start": datetime.now().isoformat()}}
-        
         # Create page in Notion database
         result = notion_client.pages.create(
             parent={"database_id": database_id},
             properties=properties
         )
-        
-        return {
-            'success': True, 
-            'notion_page_id': result['id'],
-            'application_id': app_id,
-            'database_id': database_id
-        }
-        
     except Exception as e:
         print(f"Error saving to Notion: {e}")
+        if entry_id is not None and submission_journal.defer(entry_id, e):
+            return {'success': True, 'queued': True, 'application_id': app_id, 'journal_entry': entry_id, 'error': str(e)}
         return {'success': False, 'error': str(e)}
+    
+    if entry_id is not None:
+        submission_journal.complete(entry_id, result['id'])
+    publish_application(result)
+    
+    return {
+        'success': True, 
+        'notion_page_id': result['id'],
+        'application_id': app_id,
+        'database_id': database_id
+    }
+
+# Streaming PDF mode: render into a spooled temp file and upload from it
+PDF_STREAMING = os.getenv('PDF_STREAMING', '1') == '1'
+PDF_SPOOL_MAX_MEMORY = int(os.getenv('PDF_SPOOL_MAX_MEMORY', str(4 * 1024 * 1024)))
+
+_pdf_modules = None
+_pdf_modules_lock = threading.Lock()
+
+def load_image_module():
+    """Import PIL on first use rather than at startup"""
+    started = time.perf_counter()
+    from PIL import Image
+    if 'imaging' not in LAZY_LOAD_TIMINGS:
+        record_lazy_load('imaging', started)
+    return Image
+
+def load_pdf_modules():
+    """Import ReportLab and PIL on first render rather than at startup"""
+    global _pdf_modules
+    if _pdf_modules is None:
+        with _pdf_modules_lock:
+            if _pdf_modules is None:
+                started = time.perf_counter()
+                from reportlab.lib.pagesizes import A4
+                from reportlab.pdfgen import canvas
+                from reportlab.lib.utils import ImageReader
+                Image = load_image_module()
+                _pdf_modules = (A4, canvas, ImageReader, Image)
+                record_lazy_load('pdf_modules', started)
+    return _pdf_modules
+
+def decode_data_url(data_url):
+    """Return the raw bytes of a base64 data URL (or of a pre-uploaded attachment)"""
+    if data_url.startswith(UPLOAD_REF_PREFIX):
+        return upload_store.read_prepared(data_url[len(UPLOAD_REF_PREFIX):])
+    return base64.b64decode(data_url.split(',', 1)[1])
+
+def collect_attachments(form_data):
+    """List (kind, data_url) for the photo, each ID proof and the signature"""
+    attachments = []
+    if form_data.get('studentPhoto'):
+        attachments.append(('photo', form_data['studentPhoto']))
+    id_proofs = form_data.get('idProofs') or []
+    if not isinstance(id_proofs, list):
+        id_proofs = [id_proofs]
+    attachments.extend(('id_proof', proof) for proof in id_proofs if proof)
+    if form_data.get('signature'):
+        attachments.append(('signature', form_data['signature']))
+    return attachments
+
+# Submission validation: the rules of js/validation.js, compiled once and run
+# before any Notion, PDF or Telegram work so a bad payload costs one 422
+SUBMISSION_VALIDATION = os.getenv('SUBMISSION_VALIDATION', '1') == '1'
+MAX_ATTACHMENT_BYTES = int(os.getenv('MAX_ATTACHMENT_BYTES', str(8 * 1024 * 1024)))
+MAX_IMAGE_PIXELS = int(os.getenv('MAX_IMAGE_PIXELS', '40000000'))
+MIN_IMAGE_EDGE = 32
+MAX_ID_PROOFS = 5
+ATTACHMENT_FORMATS = {'image/jpeg': 'JPEG', 'image/jpg': 'JPEG', 'image/png': 'PNG', 'image/webp': 'WEBP'}
+_DATA_URL_PATTERN = re.compile(r'data:([\w.+-]+/[\w.+-]+);base64,')
+
+_NAME_RULE = {'min': 2, 'max': 100, 'pattern': r"[a-zA-Z\s'-]+",
+              'message': 'Please enter a valid name (letters, spaces, hyphens, apostrophes only)'}
+_PHONE_RULE = {'min': 10, 'max': 15,
+               'pattern': r'[\+]?[(]?[\+]?\d{0,3}[)]?[-\s\.]?\d{1,4}[-\s\.]?\d{1,4}[-\s\.]?\d{1,4}[-\s\.]?\d{1,9}',
+               'message': 'Please enter a valid phone number'}
+
+def _parse_form_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+def check_date_of_birth(value):
+    born = _parse_form_date(value)
+    if born is None:
+        return 'Please enter a valid date'
+    today = datetime.now().date()
+    if born > today:
+        return 'Date of birth cannot be in the future'
+    age = today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+    if age < 16:
+        return 'Must be at least 16 years old'
+    if age > 35:
+        return 'Must be under 35 years old'
+    return None
+
+def check_admission_date(value):
+    admission = _parse_form_date(value)
+    if admission is None:
+        return 'Please enter a valid date'
+    # A day of slack either way for applicants in other time zones
+    today = datetime.now().date()
+    if admission < today - timedelta(days=1):
+        return 'Admission date cannot be in the past'
+    if admission > today + timedelta(days=366):
+        return 'Admission date cannot be more than one year in the future'
+    return None
+
+SUBMISSION_RULES = [
+    dict(_NAME_RULE, field='fullName', required=True),
+    {'field': 'email', 'required': True, 'max': 255, 'pattern': r'[^\s@]+@[^\s@]+\.[^\s@]+',
+     'message': 'Please enter a valid email address'},
+    dict(_PHONE_RULE, field='phone', required=True),
+    {'field': 'address', 'required': True, 'min': 10, 'max': 500},
+    {'field': 'dateOfBirth', 'required': True, 'check': check_date_of_birth},
+    {'field': 'gender', 'required': True, 'choices': ('male', 'female', 'other')},
+    dict(_NAME_RULE, field='guardianName', required=True),
+    {'field': 'relation', 'required': True, 'choices': ('father', 'mother', 'guardian', 'other')},
+    dict(_PHONE_RULE, field='guardianPhone', required=True),
+    dict(_PHONE_RULE, field='emergencyContact', required=False),
+    {'field': 'roomNumber', 'required': True, 'max': 50},
+    {'field': 'admissionDate', 'required': True, 'check': check_admission_date},
+    {'field': 'stayDuration', 'required': True, 'max': 100},
+    {'field': 'studentPhoto', 'required': True, 'attachment': True},
+    {'field': 'idProofs', 'required': True, 'attachment': True, 'many': MAX_ID_PROOFS},
+    {'field': 'signature', 'required': True, 'attachment': True},
+]
+
+def inspect_data_url(data_url):
+    """Check an image data URL from its header bytes only; return an error message or None.
+
+    The decoded size is computed from the base64 length before decoding, and
+    PIL reads just the image header, so no pixels are decoded here.
+    """
+    if not isinstance(data_url, str):
+        return 'Expected an image data URL'
+    if data_url.startswith(UPLOAD_REF_PREFIX):
+        # Validated when the upload completed; only its state is checked here
+        return upload_store.reference_error(data_url[len(UPLOAD_REF_PREFIX):])
+    match = _DATA_URL_PATTERN.match(data_url, 0, 256)
+    if not match:
+        return 'Expected a base64 image data URL'
+    mime = match.group(1).lower()
+    if mime not in ATTACHMENT_FORMATS:
+        return f"Unsupported file type {mime}; use a JPEG, PNG or WebP image"
+    encoded = len(data_url) - match.end()
+    size = encoded * 3 // 4 - (len(data_url) - len(data_url.rstrip('=')))
+    if size > MAX_ATTACHMENT_BYTES:
+        return f"File is too large ({size / 1048576:.1f} MB, limit {MAX_ATTACHMENT_BYTES / 1048576:.0f} MB)"
+    try:
+        raw = base64.b64decode(data_url[match.end():], validate=True)
+    except (binascii.Error, ValueError):
+        return 'File data is not valid base64'
+    return inspect_image_bytes(raw)
+
+def inspect_image_bytes(raw):
+    """Check decoded attachment bytes from the image header; return an error message or None"""
+    Image = load_image_module()
+    try:
+        image = Image.open(io.BytesIO(raw))
+    except Image.DecompressionBombError:
+        return 'Image dimensions are too large'
+    except Exception:
+        return 'File is not a readable image'
+    # Browsers label files by extension, so a mislabelled JPEG/PNG is accepted as long as it is one
+    if image.format not in ATTACHMENT_FORMATS.values():
+        return f"File content ({image.format}) is not a JPEG, PNG or WebP image"
+    width, height = image.size
+    if min(width, height) < MIN_IMAGE_EDGE:
+        return f"Image is too small ({width}x{height})"
+    if width * height > MAX_IMAGE_PIXELS:
+        return f"Image dimensions are too large ({width}x{height})"
+    # Truncated uploads: a JPEG ends with an EOI marker, a PNG with its IEND chunk
+    if image.format == 'JPEG' and not raw.rstrip(b'\x00').endswith(b'\xff\xd9'):
+        return 'Image file is truncated'
+    if image.format == 'PNG' and b'IEND' not in raw[-12:]:
+        return 'Image file is truncated'
+    return None
+
+def _compile_rule(rule):
+    """Build the check for one rule: (form_data, errors) -> None"""
+    field = rule['field']
+    required = rule.get('required', False)
+    min_length, max_length = rule.get('min'), rule.get('max')
+    pattern = re.compile(rule['pattern']) if 'pattern' in rule else None
+    message = rule.get('message', 'Please enter a valid format')
+    choices = rule.get('choices')
+    check = rule.get('check')
+
+    if rule.get('attachment'):
+        many = rule.get('many')
+
+        def check_attachment(form_data, errors):
+            value = form_data.get(field)
+            values = value if isinstance(value, list) and many else [value]
+            values = [item for item in values if item]
+            if not values:
+                if required:
+                    errors.append({'field': field, 'message': 'This file is required'})
+                return
+            if many and len(values) > many:
+                errors.append({'field': field, 'message': f"At most {many} files are allowed"})
+                return
+            for index, item in enumerate(values):
+                error = inspect_data_url(item)
+                if error:
+                    errors.append({'field': f"{field}[{index}]" if many else field, 'message': error})
+        return check_attachment
+
+    def check_text(form_data, errors):
+        value = form_data.get(field)
+        if value is None or value == '':
+            if required:
+                errors.append({'field': field, 'message': 'This field is required'})
+            return
+        if not isinstance(value, str):
+            errors.append({'field': field, 'message': 'Expected text'})
+            return
+        value = value.strip()
+        if not value:
+            if required:
+                errors.append({'field': field, 'message': 'This field is required'})
+            return
+        if min_length and len(value) < min_length:
+            error = f"Must be at least {min_length} characters long"
+        elif max_length and len(value) > max_length:
+            error = f"Must not exceed {max_length} characters"
+        elif pattern and not pattern.fullmatch(value):
+            error = message
+        elif choices and value.lower() not in choices:
+            error = 'Please select a valid option'
+        else:
+            error = check(value) if check else None
+        if error:
+            errors.append({'field': field, 'message': error})
+    return check_text
+
+def compile_submission_validator(rules):
+    """Compile the rule table into one function returning a list of field errors"""
+    text_checks = tuple(_compile_rule(rule) for rule in rules if not rule.get('attachment'))
+    attachment_checks = tuple(_compile_rule(rule) for rule in rules if rule.get('attachment'))
+
+    def validate(form_data):
+        errors = []
+        for check in text_checks:
+            check(form_data, errors)
+        # Attachments cost a base64 decode each, so they are only inspected once the fields pass
+        if not errors:
+            for check in attachment_checks:
+                check(form_data, errors)
+        return errors
+    return validate
+
+validate_submission = compile_submission_validator(SUBMISSION_RULES)
+
+def validation_failure(errors):
+    """Body of the 422 response for a rejected submission"""
+    return {
+        'success': False,
+        'error': f"Invalid submission: {errors[0]['field']}: {errors[0]['message']}",
+        'errors': errors
+    }
+
+def validated_submission(view):
+    """Reject malformed submissions with 422 before they take (or queue for) a submit slot"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        form_data = request.get_json(silent=True)
+        if SUBMISSION_VALIDATION and isinstance(form_data, dict):
+            errors = validate_submission(form_data)
+            if errors:
+                return jsonify(validation_failure(errors)), 422
+        return view(*args, **kwargs)
+    return wrapper
+
+# Byte-budgeted PDFs: with PDF_TARGET_BYTES set (0 disables) page streams are
+# compressed and each photo/ID proof is re-encoded as JPEG, searching quality
+# and then resolution until it fits its share of the budget. Resolution never
+# drops below the per-kind DPI floor, so an ID proof stays legible even when
+# that means going over budget.
+PDF_TARGET_BYTES = int(os.getenv('PDF_TARGET_BYTES', '0'))
+PDF_MAX_DPI = int(os.getenv('PDF_MAX_DPI', '200'))
+PDF_MIN_ID_DPI = int(os.getenv('PDF_MIN_ID_DPI', '150'))
+PDF_MIN_PHOTO_DPI = int(os.getenv('PDF_MIN_PHOTO_DPI', '72'))
+PDF_MIN_JPEG_QUALITY = int(os.getenv('PDF_MIN_JPEG_QUALITY', '40'))
+PDF_MAX_JPEG_QUALITY = 90
+# Reserved for page content, fonts and the (lossless) signature
+PDF_BUDGET_OVERHEAD = 256 * 1024
+
+class PdfImageBudget:
+    """Split PDF_TARGET_BYTES across a PDF's images as they are drawn.
+
+    Each image gets an equal share of what is left, so bytes an earlier
+    image did not need carry over to the ones after it.
+    """
+
+    def __init__(self, target, images):
+        self.remaining = max(target - PDF_BUDGET_OVERHEAD, 0)
+        self.images = images
+
+    def allot(self):
+        return self.remaining // max(self.images, 1)
+
+    def spend(self, size):
+        self.remaining = max(self.remaining - size, 0)
+        self.images = max(self.images - 1, 0)
+
+def flatten_for_jpeg(Image, image):
+    """Return an RGB or greyscale copy of image that JPEG can encode"""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    if image.mode not in ('RGB', 'L'):
+        return image.convert('RGB')
+    return image
+
+def encode_jpeg(image, quality):
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=quality, optimize=True)
+    output.seek(0)
+    return output
+
+def fit_image_to_budget(Image, image, source_bytes, draw_width, draw_height, budget, min_dpi):
+    """Encode image for a draw_width x draw_height point box within budget bytes.
+
+    Returns (jpeg file object, dpi, quality); quality is None when the
+    original JPEG bytes are embedded unchanged. Starts at PDF_MAX_DPI (or
+    the image's own resolution if lower) and binary searches JPEG quality;
+    when even PDF_MIN_JPEG_QUALITY is too big the resolution steps down by a
+    quarter at a time until min_dpi. If nothing fits, the min_dpi encoding
+    at the lowest quality is used.
+    """
+    native_dpi = min(image.size[0] * 72 / draw_width, image.size[1] * 72 / draw_height)
+    if (image.format == 'JPEG' and source_bytes is not None
+            and len(source_bytes) <= budget and native_dpi <= PDF_MAX_DPI):
+        return io.BytesIO(source_bytes), int(native_dpi), None
+
+    start_dpi = min(native_dpi, PDF_MAX_DPI)
+    floor_dpi = min(min_dpi, start_dpi)
+    dpis = [start_dpi]
+    while dpis[-1] * 0.75 > floor_dpi:
+        dpis.append(dpis[-1] * 0.75)
+    if dpis[-1] > floor_dpi:
+        dpis.append(floor_dpi)
+
+    def size_at(dpi):
+        return (max(1, round(draw_width * dpi / 72)), max(1, round(draw_height * dpi / 72)))
+
+    # JPEG sources decode at a reduced scale when the largest target allows it
+    image.draft(None, size_at(start_dpi))
+    image = flatten_for_jpeg(Image, image)
+
+    smallest = None
+    for dpi in dpis:
+        size = size_at(dpi)
+        scaled = image if size == image.size else image.resize(size, Image.Resampling.LANCZOS)
+        best = encode_jpeg(scaled, PDF_MAX_JPEG_QUALITY)
+        if best.getbuffer().nbytes <= budget:
+            return best, int(dpi), PDF_MAX_JPEG_QUALITY
+        smallest = encode_jpeg(scaled, PDF_MIN_JPEG_QUALITY)
+        if smallest.getbuffer().nbytes > budget:
+            continue
+        best, best_quality = smallest, PDF_MIN_JPEG_QUALITY
+        low, high = PDF_MIN_JPEG_QUALITY + 1, PDF_MAX_JPEG_QUALITY - 1
+        while low <= high:
+            quality = (low + high) // 2
+            candidate = encode_jpeg(scaled, quality)
+            if candidate.getbuffer().nbytes <= budget:
+                best, best_quality = candidate, quality
+                low = quality + 1
+            else:
+                high = quality - 1
+        return best, int(dpi), best_quality
+    print(f"PDF image over budget at the {int(floor_dpi)} DPI floor: "
+          f"{smallest.getbuffer().nbytes} > {budget} bytes")
+    return smallest, int(floor_dpi), PDF_MIN_JPEG_QUALITY
+
+# Resumable attachment uploads: the form uploads each photo, ID proof and
+# signature in chunks as soon as it is captured, the server validates and
+# prepares it in the background, and the submission references it as
+# "upload:<id>" instead of carrying a data URL
+UPLOAD_DIR = os.getenv('UPLOAD_DIR', 'uploads')
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', str(256 * 1024)))
+UPLOAD_TTL = float(os.getenv('UPLOAD_TTL', str(24 * 3600)))
+UPLOAD_READY_TIMEOUT = float(os.getenv('UPLOAD_READY_TIMEOUT', '15'))
+UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', '2'))
+UPLOAD_REF_PREFIX = 'upload:'
+UPLOAD_KINDS = ('photo', 'id_proof', 'signature')
+UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+PREPARED_JPEG_QUALITY = 92
+
+def prepare_attachment(raw, kind):
+    """Decode an attachment once and cut it down to what the PDF can use.
+
+    Nothing is drawn taller than an A4 page, so images are capped at that
+    many pixels at PDF_MAX_DPI. JPEGs already within the cap and signatures
+    (small, lossless line art) are kept byte for byte.
+    """
+    if kind == 'signature':
+        return raw
+    Image = load_image_module()
+    image = Image.open(io.BytesIO(raw))
+    max_edge = int(842 / 72 * PDF_MAX_DPI)
+    if image.format == 'JPEG' and max(image.size) <= max_edge:
+        return raw
+    image.draft(None, (max_edge, max_edge))
+    image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+    return encode_jpeg(flatten_for_jpeg(Image, image), PREPARED_JPEG_QUALITY).getvalue()
+
+class UploadStore:
+    """Chunked uploads on disk: <id>.part collects bytes, <id>.json holds state.
+
+    The size of the .part file is the resume offset, so any worker can take
+    the next chunk. A completed upload is validated and prepared on a
+    background thread into <id>.img; states go receiving -> processing ->
+    ready (or failed). Uploads older than UPLOAD_TTL are pruned.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._workers = threading.BoundedSemaphore(max(UPLOAD_WORKERS, 1))
+
+    def _path(self, upload_id, ext):
+        return os.path.join(self.directory, f"{upload_id}.{ext}")
+
+    def _read_meta(self, upload_id):
+        if not UPLOAD_ID_PATTERN.match(upload_id or ''):
+            return None
+        try:
+            with open(self._path(upload_id, 'json'), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, meta):
+        path = self._path(meta['id'], 'json')
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, path)
+
+    def create(self, kind, mime, size):
+        """Register a new upload; returns (status, error)"""
+        mime = str(mime or '').lower()
+        if kind not in UPLOAD_KINDS:
+            return None, 'Unknown attachment kind'
+        if mime not in ATTACHMENT_FORMATS:
+            return None, f"Unsupported file type {mime}; use a JPEG, PNG or WebP image"
+        if not isinstance(size, int) or size <= 0:
+            return None, 'Upload size is required'
+        if size > MAX_ATTACHMENT_BYTES:
+            return None, f"File is too large ({size / 1048576:.1f} MB, limit {MAX_ATTACHMENT_BYTES / 1048576:.0f} MB)"
+        os.makedirs(self.directory, exist_ok=True)
+        self.prune()
+        meta = {'id': uuid.uuid4().hex, 'kind': kind, 'mime': mime, 'size': size,
+                'state': 'receiving', 'error': None, 'created': time.time()}
+        open(self._path(meta['id'], 'part'), 'wb').close()
+        self._write_meta(meta)
+        return self._status(meta), None
+
+    def _status(self, meta):
+        if meta['state'] == 'receiving':
+            try:
+                offset = os.path.getsize(self._path(meta['id'], 'part'))
+            except OSError:
+                offset = 0
+        else:
+            offset = meta['size']
+        return {'upload_id': meta['id'], 'kind': meta['kind'], 'size': meta['size'], 'offset': offset,
+                'state': meta['state'], 'error': meta['error'], 'chunk_size': UPLOAD_CHUNK_SIZE}
+
+    def status(self, upload_id):
+        meta = self._read_meta(upload_id)
+        return self._status(meta) if meta else None
+
+    def append(self, upload_id, offset, data):
+        """Write one chunk at offset; returns (status, error, http status).
+
+        A chunk for the wrong offset is refused with 409 and the current
+        offset, which is where the client resumes from.
+        """
+        meta = self._read_meta(upload_id)
+        if meta is None:
+            return None, 'Upload not found or expired', 404
+        if meta['state'] != 'receiving':
+            return self._status(meta), None, 200
+        with self._lock, open(self._path(upload_id, 'part'), 'ab') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0, os.SEEK_END)
+            current = f.tell()
+            if offset != current:
+                return self._status(meta), f"Expected offset {current}", 409
+            if current + len(data) > meta['size']:
+                return self._status(meta), 'Chunk runs past the declared size', 400
+            f.write(data)
+            complete = current + len(data) == meta['size']
+            if complete:
+                meta['state'] = 'processing'
+                self._write_meta(meta)
+        if complete:
+            threading.Thread(target=self._prepare, args=(meta,), name='upload-prepare', daemon=True).start()
+        return self._status(meta), None, 200
+
+    def _prepare(self, meta):
+        part_path = self._path(meta['id'], 'part')
+        try:
+            with self._workers:
+                with open(part_path, 'rb') as f:
+                    raw = f.read()
+                error = inspect_image_bytes(raw)
+                if error:
+                    raise ValueError(error)
+                prepared = prepare_attachment(raw, meta['kind'])
+            image_path = self._path(meta['id'], 'img')
+            with open(f"{image_path}.tmp", 'wb') as f:
+                f.write(prepared)
+            os.replace(f"{image_path}.tmp", image_path)
+            os.remove(part_path)
+            meta.update(state='ready', prepared_size=len(prepared), fingerprint=image_fingerprint(raw))
+        except Exception as e:
+            meta.update(state='failed', error=str(e))
+            print(f"Upload {meta['id']} failed: {e}")
+        self._write_meta(meta)
+
+    def reference_error(self, upload_id):
+        """Why an "upload:<id>" reference cannot be used yet, or None once it is ready.
+
+        A reference that is still being prepared is waited for, up to
+        UPLOAD_READY_TIMEOUT seconds (less if the request's deadline is nearer).
+        """
+        deadline = time.monotonic() + current_deadline().timeout(UPLOAD_READY_TIMEOUT)
+        while True:
+            meta = self._read_meta(upload_id)
+            if meta is None:
+                return 'Upload not found or expired'
+            if meta['state'] == 'ready':
+                return None
+            if meta['state'] == 'failed':
+                return meta['error'] or 'Upload could not be processed'
+            if meta['state'] == 'receiving':
+                return 'Upload is incomplete'
+            if time.monotonic() >= deadline:
+                return 'Upload is still being processed'
+            time.sleep(0.05)
+
+    def fingerprint(self, upload_id):
+        """image_fingerprint() of the file as uploaded (None for an unknown upload)"""
+        meta = self._read_meta(upload_id)
+        fingerprint = meta.get('fingerprint') if meta else None
+        return tuple(fingerprint) if fingerprint else None
+
+    def prepared_size(self, upload_id):
+        meta = self._read_meta(upload_id)
+        return meta.get('prepared_size', 0) if meta else 0
+
+    def read_prepared(self, upload_id):
+        if not UPLOAD_ID_PATTERN.match(upload_id):
+            raise ValueError('Invalid upload reference')
+        with open(self._path(upload_id, 'img'), 'rb') as f:
+            return f.read()
+
+    def prune(self):
+        """Delete uploads older than UPLOAD_TTL"""
+        cutoff = time.time() - UPLOAD_TTL
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+upload_store = UploadStore(UPLOAD_DIR)
+
+# Thumbnail configuration
+THUMBNAIL_DIR = os.getenv('THUMBNAIL_DIR', 'thumbnails')
+THUMBNAIL_SIZE = int(os.getenv('THUMBNAIL_SIZE', '320'))
+THUMBNAIL_QUALITY = int(os.getenv('THUMBNAIL_QUALITY', '70'))
+THUMBNAIL_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+_PAGE_KEY_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+def thumbnail_directory(page_id):
+    """Directory holding an application's thumbnails, or None for a malformed ID"""
+    key = normalize_page_id(page_id)
+    if not _PAGE_KEY_PATTERN.fullmatch(key):
+        return None
+    return os.path.join(THUMBNAIL_DIR, key)
 
-def generate_pdf(form_data):
-    """Generate PDF from form data"""
-    buffer = io.BytesIO()
+def make_thumbnail(Image, image_bytes):
+    """Downscale one attachment to a small RGB WebP (or JPEG) thumbnail"""
+    image = Image.open(io.BytesIO(image_bytes))
+    # Let the JPEG decoder skip most of the pixels when it can
+    image.draft('RGB', (THUMBNAIL_SIZE * 2, THUMBNAIL_SIZE * 2))
+    image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.Resampling.LANCZOS, reducing_gap=2.0)
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        # Signatures are transparent PNGs; flatten onto white
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    from PIL import features
+    output = io.BytesIO()
+    if features.check('webp'):
+        image.save(output, format='WEBP', quality=THUMBNAIL_QUALITY, method=4)
+        return output.getvalue(), 'webp', image.size
+    image.save(output, format='JPEG', quality=THUMBNAIL_QUALITY, optimize=True)
+    return output.getvalue(), 'jpeg', image.size
+
+def generate_thumbnails(page_id, attachments, directory=None):
+    """Write thumbnails and a manifest for every attachment of one application"""
+    directory = directory or thumbnail_directory(page_id)
+    if directory is None or not attachments:
+        return []
+    Image = load_image_module()
+    os.makedirs(directory, exist_ok=True)
+    manifest = []
+    for n, (kind, data_url) in enumerate(attachments):
+        try:
+            data, image_format, (width, height) = make_thumbnail(Image, decode_data_url(data_url))
+        except Exception as e:
+            print(f"Error creating {kind} thumbnail: {e}")
+            continue
+        path = os.path.join(directory, f"{n}.{image_format}")
+        with open(f"{path}.tmp", 'wb') as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+        manifest.append({
+            'n': n,
+            'kind': kind,
+            'format': image_format,
+            'width': width,
+            'height': height,
+            'bytes': len(data),
+            'etag': hashlib.sha256(data).hexdigest()[:32]
+        })
+    with open(os.path.join(directory, 'manifest.json.tmp'), 'w') as f:
+        json.dump(manifest, f)
+    os.replace(os.path.join(directory, 'manifest.json.tmp'), os.path.join(directory, 'manifest.json'))
+    return manifest
+
+def generate_thumbnails_async(page_id, form_data, journal_entry=None):
+    """Create thumbnails off the request path once the Notion page exists.
+
+    A submission still queued in the journal has no page yet; its
+    thumbnails are staged under its journal entry and moved to the page
+    once the replayer creates it.
+    """
+    attachments = collect_attachments(form_data)
+    if not attachments:
+        return
+    def run():
+        try:
+            if journal_entry is None:
+                generate_thumbnails(page_id, attachments)
+            else:
+                generate_thumbnails(None, attachments, journal_thumbnail_directory(journal_entry))
+                adopt_journal_thumbnails(journal_entry)
+        except Exception as e:
+            print(f"Error generating thumbnails: {e}")
+    threading.Thread(target=run, name='thumbnails', daemon=True).start()
+
+def journal_thumbnail_directory(entry_id):
+    """Staging directory for the thumbnails of a journaled submission"""
+    return os.path.join(THUMBNAIL_DIR, 'journal', str(int(entry_id)))
+
+def adopt_journal_thumbnails(entry_id, page_id=None):
+    """Move a journaled submission's staged thumbnails to its Notion page, once both exist.
+
+    Called by the replayer after creating the page and by the thumbnail
+    thread after staging, so whichever finishes second does the move.
+    """
+    if page_id is None:
+        state = submission_journal.state_of(entry_id)
+        if state is None or state[0] != 'done':
+            return
+        page_id = state[1]
+    staging = journal_thumbnail_directory(entry_id)
+    directory = thumbnail_directory(page_id or '')
+    if directory is None or not os.path.exists(os.path.join(staging, 'manifest.json')):
+        return
+    try:
+        os.replace(staging, directory)
+    except OSError:
+        # Already moved (by another thread or worker), or the page has thumbnails
+        pass
+
+def sweep_journal_thumbnails():
+    """Adopt staged thumbnails whose entry has been replayed; drop those whose entry is gone"""
+    root = os.path.join(THUMBNAIL_DIR, 'journal')
+    try:
+        names = os.listdir(root)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if not name.isdigit():
+            continue
+        state = submission_journal.state_of(int(name))
+        if state is None:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+        elif state[0] == 'done':
+            adopt_journal_thumbnails(int(name), state[1])
+
+def read_thumbnail_manifest(page_id):
+    directory = thumbnail_directory(page_id)
+    if directory is None:
+        return None
+    try:
+        with open(os.path.join(directory, 'manifest.json'), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def remove_thumbnails(page_id):
+    """Delete an application's thumbnails (photo and ID proofs) from THUMBNAIL_DIR"""
+    directory = thumbnail_directory(page_id)
+    if directory is not None:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def brand_color():
+    """PDF_BRAND_COLOR ('#rrggbb') as ReportLab RGB floats"""
+    value = PDF_BRAND_COLOR.lstrip('#')
+    return tuple(int(value[i:i + 2], 16) / 255 for i in (0, 2, 4))
+
+def generate_pdf(form_data, output=None):
+    """Generate PDF from form data.
+
+    With an ``output`` file object the PDF is written there and the file is
+    returned; otherwise the PDF bytes are returned. Attachments are decoded,
+    drawn and released one at a time so only one decoded image is alive.
+    """
+    A4, canvas, ImageReader, Image = load_pdf_modules()
+    buffer = output if output is not None else io.BytesIO()
     
     # Create PDF
-    pdf = canvas.Canvas(buffer, pagesize=A4)
+    budget = None
+    if PDF_TARGET_BYTES > 0:
+        budget = PdfImageBudget(PDF_TARGET_BYTES, sum(1 for kind, _ in collect_attachments(form_data)
+                                                      if kind != 'signature'))
+        pdf = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+    else:
+        pdf = canvas.Canvas(buffer, pagesize=A4)
     width, height = A4
     
+    brand = brand_color()
+    
     # Draw header background
-    pdf.setFillColorRGB(0.2, 0.3, 0.6)  # Dark blue
+    pdf.setFillColorRGB(*brand)
     pdf.rect(0, height - 70, width, 70, fill=1)
     
     # Add header text
     pdf.setFillColorRGB(1, 1, 1)  # White text
     pdf.setFont("Helvetica-Bold", 22)
-    pdf.drawString(50, height - 30, "NAVADAYA GIRLS HOSTAL")
+    pdf.drawString(50, height - 30, HOSTEL_NAME.upper())
     pdf.setFont("Helvetica-Bold", 14)
     pdf.drawString(50, height - 50, "Student Admission Form")
     
@@ -470,8 +3350,8 @@ def generate_pdf(form_data):
     
     pdf.setFont("Helvetica-Oblique", 8)
     pdf.drawString(350, footer_y - 20, f"Generated: {datetime.now().strftime('%d/%m/%Y at %H:%M')}")
-    pdf.drawString(350, footer_y - 35, "Navadaya Girls Hostal Management System")
-    pdf.drawString(350, footer_y - 50, "Contact: admission@university.edu")
+    pdf.drawString(350, footer_y - 35, f"{HOSTEL_NAME} Management System")
+    pdf.drawString(350, footer_y - 50, f"Contact: {HOSTEL_CONTACT}")
     pdf.drawString(350, footer_y - 65, f"App ID: {app_id}")
     
     # PAGE 2: Student Photo (Full Page)
@@ -480,15 +3360,14 @@ def generate_pdf(form_data):
             pdf.showPage()  # Start new page
             
             # Page header
-            pdf.setFillColorRGB(0.2, 0.3, 0.6)
+            pdf.setFillColorRGB(*brand)
             pdf.rect(0, height - 60, width, 60, fill=1)
             pdf.setFillColorRGB(1, 1, 1)
             pdf.setFont("Helvetica-Bold", 20)
             pdf.drawString(50, height - 35, "STUDENT PHOTO")
             
             # Add photo
-            photo_data = form_data['studentPhoto'].split(',')[1]
-            photo_bytes = base64.b64decode(photo_data)
+            photo_bytes = decode_data_url(form_data['studentPhoto'])
             photo_img = Image.open(io.BytesIO(photo_bytes))
             
             # Calculate dimensions to fit page while maintaining aspect ratio
@@ -503,16 +3382,23 @@ def generate_pdf(form_data):
             new_width = int(img_width * scale)
             new_height = int(img_height * scale)
             
-            photo_img = photo_img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            photo_buffer = io.BytesIO()
-            photo_img.save(photo_buffer, format='PNG')
-            photo_buffer.seek(0)
+            if budget is not None:
+                photo_source, _, _ = fit_image_to_budget(Image, photo_img, photo_bytes, new_width, new_height,
+                                                         budget.allot(), PDF_MIN_PHOTO_DPI)
+                budget.spend(photo_source.getbuffer().nbytes)
+            else:
+                # JPEG sources decode at a reduced scale instead of full resolution
+                photo_img.draft(None, (new_width, new_height))
+                # Drawn straight from the resized image (lossless, like the PNG round-trip it replaces)
+                photo_source = photo_img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+            del photo_bytes
             
             # Center the image
             x_pos = (width - new_width) / 2
             y_pos = (height - new_height) / 2 - 30
             
-            pdf.drawImage(ImageReader(photo_buffer), x_pos, y_pos, width=new_width, height=new_height)
+            pdf.drawImage(ImageReader(photo_source), x_pos, y_pos, width=new_width, height=new_height)
+            del photo_source, photo_img
             
             # Add caption
             pdf.setFillColorRGB(0, 0, 0)
@@ -533,7 +3419,7 @@ def generate_pdf(form_data):
                 pdf.showPage()  # Start new page for each ID proof
                 
                 # Enhanced page header with gradient effect
-                pdf.setFillColorRGB(0.1, 0.2, 0.5)
+                pdf.setFillColorRGB(*(max(channel - 0.1, 0) for channel in brand))
                 pdf.rect(0, height - 80, width, 80, fill=1)
                 
                 # Header border
@@ -554,9 +3440,8 @@ def generate_pdf(form_data):
                 subtitle_width = pdf.stringWidth(subtitle_text, "Helvetica", 12)
                 pdf.drawString((width - subtitle_width) / 2, height - 55, subtitle_text)
                 
-                # Process current ID proof
-                id_data = id_proof_data.split(',')[1]
-                id_bytes = base64.b64decode(id_data)
+                # Process current ID proof (header only until pixels are needed)
+                id_bytes = decode_data_url(id_proof_data)
                 id_img = Image.open(io.BytesIO(id_bytes))
                 
                 # Get original format and preserve it
@@ -569,13 +3454,27 @@ def generate_pdf(form_data):
                 max_height = height - margin_y - 120
                 
                 img_width, img_height = id_img.size
+                quality_label = "High Resolution"
                 
+                if budget is not None:
+                    # Same on-page size as below, but pixel density set by the byte budget
+                    scale = min(max_width / img_width, max_height / img_height, 1)
+                    new_width = int(img_width * scale)
+                    new_height = int(img_height * scale)
+                    id_source, dpi, quality = fit_image_to_budget(Image, id_img, id_bytes, new_width, new_height,
+                                                                  budget.allot(), PDF_MIN_ID_DPI)
+                    budget.spend(id_source.getbuffer().nbytes)
+                    quality_label = f"{dpi} DPI" + (f", JPEG q{quality}" if quality else ", original")
                 # Check if image fits without resizing
-                if img_width <= max_width and img_height <= max_height:
+                elif img_width <= max_width and img_height <= max_height:
                     # Use original image without any resizing
                     new_width = img_width
                     new_height = img_height
-                    final_img = id_img  # No processing needed
+                    if original_format.upper() in ['JPEG', 'JPG']:
+                        # Embed the original JPEG bytes as-is, no decode or re-encode
+                        id_source = io.BytesIO(id_bytes)
+                    else:
+                        id_source = id_img
                 else:
                     # Only resize if absolutely necessary
                     scale_x = max_width / img_width
@@ -586,18 +3485,20 @@ def generate_pdf(form_data):
                     new_height = int(img_height * scale)
                     
                     # Use highest quality resampling
+                    id_img.draft(None, (new_width, new_height))
                     final_img = id_img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                
-                # Save with MAXIMUM quality settings
-                id_buffer = io.BytesIO()
-                if original_format.upper() in ['JPEG', 'JPG']:
-                    # Highest JPEG quality possible
-                    final_img.save(id_buffer, format='JPEG', quality=100, optimize=False, 
-                                 subsampling=0, progressive=False)
-                else:
-                    # Highest PNG quality - no compression
-                    final_img.save(id_buffer, format='PNG', optimize=False, compress_level=0)
-                id_buffer.seek(0)
+                    
+                    if original_format.upper() in ['JPEG', 'JPG']:
+                        # Highest JPEG quality possible
+                        id_source = io.BytesIO()
+                        final_img.save(id_source, format='JPEG', quality=100, optimize=False, 
+                                     subsampling=0, progressive=False)
+                        id_source.seek(0)
+                        del final_img
+                    else:
+                        # Drawn losslessly from the resized pixels
+                        id_source = final_img
+                del id_bytes
                 
                 # Center the image with better positioning
                 x_pos = (width - new_width) / 2
@@ -610,8 +3511,9 @@ def generate_pdf(form_data):
                 pdf.rect(x_pos - border_width, y_pos - border_width, 
                         new_width + (2 * border_width), new_height + (2 * border_width))
                 
-                # Add the image
-                pdf.drawImage(ImageReader(id_buffer), x_pos, y_pos, width=new_width, height=new_height)
+                # Add the image, then release this proof before decoding the next one
+                pdf.drawImage(ImageReader(id_source), x_pos, y_pos, width=new_width, height=new_height)
+                del id_source, id_img
                 
                 # Enhanced information section with better layout
                 info_y = y_pos - 40
@@ -634,7 +3536,7 @@ def generate_pdf(form_data):
                 # Add timestamp and verification info
                 current_time = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
                 pdf.drawString(width - 250, info_y - 35, f"Verification Date: {current_time}")
-                pdf.drawString(width - 250, info_y - 50, f"Image Quality: High Resolution")
+                pdf.drawString(width - 250, info_y - 50, f"Image Quality: {quality_label}")
                 
                 # Footer with verification seal
                 pdf.setFont("Helvetica-Oblique", 10)
@@ -652,16 +3554,14 @@ def generate_pdf(form_data):
             pdf.showPage()  # Start new page
             
             # Page header
-            pdf.setFillColorRGB(0.2, 0.3, 0.6)
+            pdf.setFillColorRGB(*brand)
             pdf.rect(0, height - 60, width, 60, fill=1)
             pdf.setFillColorRGB(1, 1, 1)
             pdf.setFont("Helvetica-Bold", 20)
             pdf.drawString(50, height - 35, "DIGITAL SIGNATURE")
             
             # Add signature
-            sig_data = form_data['signature'].split(',')[1]
-            sig_bytes = base64.b64decode(sig_data)
-            sig_img = Image.open(io.BytesIO(sig_bytes))
+            sig_img = Image.open(io.BytesIO(decode_data_url(form_data['signature'])))
             
             # Calculate dimensions to fit page while maintaining aspect ratio
             max_width = width - 200
@@ -675,16 +3575,15 @@ def generate_pdf(form_data):
             new_width = int(img_width * scale)
             new_height = int(img_height * scale)
             
+            sig_img.draft(None, (new_width, new_height))
             sig_img = sig_img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            sig_buffer = io.BytesIO()
-            sig_img.save(sig_buffer, format='PNG')
-            sig_buffer.seek(0)
             
             # Center the image
             x_pos = (width - new_width) / 2
             y_pos = (height - new_height) / 2
             
-            pdf.drawImage(ImageReader(sig_buffer), x_pos, y_pos, width=new_width, height=new_height)
+            pdf.drawImage(ImageReader(sig_img), x_pos, y_pos, width=new_width, height=new_height)
+            del sig_img
             
             # Add signature info
             pdf.setFillColorRGB(0, 0, 0)
@@ -699,11 +3598,719 @@ def generate_pdf(form_data):
         except Exception as e:
             print(f"Error adding signature page: {e}")
     
+    # The whole document is held in memory until it is saved
+    memory_accountant.checkpoint()
     pdf.save()
     buffer.seek(0)
+    if output is not None:
+        return output
     return buffer.getvalue()
 
+# Client-rendered PDFs: the browser renders the form with js/pdf-generator.js
+# and sends it as "clientPdf". A cheap structural check decides whether it is
+# forwarded as is; anything that fails falls back to generate_pdf
+CLIENT_PDF = os.getenv('CLIENT_PDF', '0') == '1'
+CLIENT_PDF_MAX_BYTES = int(os.getenv('CLIENT_PDF_MAX_BYTES', str(8 * 1024 * 1024)))
+CLIENT_PDF_MAX_PAGES = int(os.getenv('CLIENT_PDF_MAX_PAGES', '12'))
+CLIENT_PDF_MAX_TEXT_BYTES = 1024 * 1024
+CLIENT_PDF_FIELDS = ('fullName', 'email', 'phone', 'address', 'guardianName', 'guardianPhone', 'roomNumber')
+_PDF_STREAM_START = re.compile(rb'>>\s*stream\r?\n')
+_PDF_DIRECT_LENGTH = re.compile(rb'/Length\s+(\d+)(?!\s+\d+\s+R)')
+_PDF_FILTERS = re.compile(rb'/Filter\s*\[?\s*((?:/\w+\s*)+)')
+_PDF_IMAGE_WIDTH = re.compile(rb'/Width\s+(\d+)')
+_PDF_IMAGE_HEIGHT = re.compile(rb'/Height\s+(\d+)')
+_PDF_PAGE = re.compile(rb'/Type\s*/Page(?![A-Za-z])')
+_PDF_ACTIVE_CONTENT = re.compile(rb'/(?:JavaScript|JS|Launch|EmbeddedFiles?|RichMedia|XFA)(?![A-Za-z])')
+_PDF_STRING = re.compile(rb'\(((?:\\.|[^\\)])*)\)|<([0-9A-Fa-f\s]*)>', re.S)
+_PDF_STRING_ESCAPE = re.compile(rb'\\([0-7]{1,3}|\r\n|.)', re.S)
+_PDF_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f',
+                b'\r\n': b'', b'\n': b'', b'\r': b''}
+
+def _unescape_pdf_string(match):
+    escape = match.group(1)
+    if escape[:1].isdigit():
+        return bytes([int(escape, 8) & 0xFF])
+    return _PDF_ESCAPES.get(escape, escape)
+
+def split_pdf_streams(raw):
+    """Split a PDF into its object skeleton and (dictionary, body) per stream"""
+    skeleton, streams, position = [], [], 0
+    while True:
+        match = _PDF_STREAM_START.search(raw, position)
+        if match is None:
+            skeleton.append(raw[position:])
+            return b''.join(skeleton), streams
+        dictionary_start = raw.rfind(b' obj', position, match.start())
+        dictionary = raw[max(dictionary_start, position):match.start() + 2]
+        start = match.end()
+        length = _PDF_DIRECT_LENGTH.search(dictionary)
+        end = start + int(length.group(1)) if length else -1
+        if end < 0 or raw[end:end + 12].strip()[:9] != b'endstream':
+            end = raw.find(b'endstream', start)
+            if end < 0:
+                raise ValueError('unterminated stream')
+        skeleton.append(raw[position:start])
+        streams.append((dictionary, raw[start:end]))
+        position = end
+
+def pdf_text_strings(streams):
+    """Text shown by the PDF's content streams, one entry per string operand"""
+    strings = []
+    for dictionary, body in streams:
+        if b'/Image' in dictionary:
+            continue
+        filters = _PDF_FILTERS.search(dictionary)
+        filters = filters.group(1).split() if filters else []
+        if filters == [b'/FlateDecode']:
+            inflater = zlib.decompressobj()
+            body = inflater.decompress(body, CLIENT_PDF_MAX_TEXT_BYTES)
+        elif filters:
+            continue
+        if b'Tj' not in body and b'TJ' not in body:
+            continue
+        for literal, hexadecimal in _PDF_STRING.findall(body):
+            if hexadecimal:
+                digits = re.sub(rb'\s', b'', hexadecimal)
+                value = bytes.fromhex((digits + b'0' * (len(digits) % 2)).decode('ascii'))
+            else:
+                value = _PDF_STRING_ESCAPE.sub(_unescape_pdf_string, literal)
+            strings.append(' '.join(value.decode('cp1252', errors='replace').split()))
+    return strings
+
+def pdf_images(streams):
+    """(width, height, SHA-256 of the data if it is an embedded JPEG) per image stream"""
+    images = []
+    for dictionary, body in streams:
+        if b'/Image' not in dictionary:
+            continue
+        width, height = _PDF_IMAGE_WIDTH.search(dictionary), _PDF_IMAGE_HEIGHT.search(dictionary)
+        if width is None or height is None:
+            continue
+        filters = _PDF_FILTERS.search(dictionary)
+        jpeg = filters is not None and filters.group(1).split() == [b'/DCTDecode']
+        digest = hashlib.sha256(body.rstrip(b'\r\n')).hexdigest() if jpeg else None
+        images.append((int(width.group(1)), int(height.group(1)), digest))
+    return images
+
+def image_fingerprint(raw):
+    """(width, height, SHA-256 if it is a JPEG) of an image, read from its header.
+
+    PDF writers embed a JPEG's bytes unchanged, so it can be matched exactly;
+    other formats are re-encoded and are matched on their dimensions.
+    """
+    image = load_image_module().open(io.BytesIO(raw))
+    digest = hashlib.sha256(raw).hexdigest() if image.format == 'JPEG' else None
+    return image.size[0], image.size[1], digest
+
+def attachment_fingerprint(value):
+    if value.startswith(UPLOAD_REF_PREFIX):
+        return upload_store.fingerprint(value[len(UPLOAD_REF_PREFIX):])
+    return image_fingerprint(decode_data_url(value))
+
+def unmatched_attachments(images, attachments):
+    """Kinds of the attachments with no embedded image of their own in the PDF"""
+    available = list(images)
+    fingerprints = [(kind, attachment_fingerprint(value)) for kind, value in attachments]
+    unmatched = []
+    # Exact (JPEG) matches first, so a dimensions-only match cannot take their image
+    for kind, fingerprint in sorted(fingerprints, key=lambda item: item[1] is None or item[1][2] is None):
+        match = None
+        if fingerprint is not None:
+            width, height, digest = fingerprint
+            match = next((image for image in available
+                          if image[:2] == (width, height) and (digest is None or image[2] == digest)), None)
+        if match is None:
+            unmatched.append(kind)
+        else:
+            available.remove(match)
+    return unmatched
+
+def check_client_pdf(data_url, form_data):
+    """Return (pdf_bytes, None) if the browser's PDF can be forwarded, else (None, reason).
+
+    Checks size, PDF framing, that there is no active content, one page per
+    ID proof plus the form, that each attachment is embedded (the same JPEG
+    bytes, or an image of the same dimensions), and that the hostel name and
+    each submitted text field appear verbatim in the page text.
+    """
+    if not isinstance(data_url, str) or not data_url.startswith('data:application/pdf;base64,'):
+        return None, 'not a PDF data URL'
+    encoded = data_url.split(',', 1)[1]
+    if len(encoded) * 3 // 4 > CLIENT_PDF_MAX_BYTES:
+        return None, f'larger than {CLIENT_PDF_MAX_BYTES} bytes'
+    try:
+        raw = base64.b64decode(encoded, validate=True)
+    except (binascii.Error, ValueError):
+        return None, 'not valid base64'
+    if not raw.startswith(b'%PDF-') or b'%%EOF' not in raw[-1024:]:
+        return None, 'not a complete PDF file'
+    
+    try:
+        skeleton, streams = split_pdf_streams(raw)
+        strings = pdf_text_strings(streams)
+    except (ValueError, zlib.error) as e:
+        return None, f'unreadable PDF structure ({e})'
+    if _PDF_ACTIVE_CONTENT.search(skeleton):
+        return None, 'contains scripts, actions or embedded files'
+    
+    attachments = collect_attachments(form_data)
+    id_proofs = sum(1 for kind, _ in attachments if kind == 'id_proof')
+    pages = len(_PDF_PAGE.findall(skeleton))
+    if not 1 + id_proofs <= pages <= CLIENT_PDF_MAX_PAGES:
+        return None, f'{pages} pages for {id_proofs} ID proofs'
+    try:
+        unmatched = unmatched_attachments(pdf_images(streams), attachments)
+    except Exception as e:
+        return None, f'attachments could not be compared ({e})'
+    if unmatched:
+        return None, f"images do not match the submitted {', '.join(unmatched)}"
+    
+    text = '\n'.join(strings)
+    expected = [HOSTEL_NAME.upper()] + [str(form_data.get(field) or '') for field in CLIENT_PDF_FIELDS]
+    for value in expected:
+        value = ' '.join(value.split())
+        if value and value not in text:
+            return None, f'text does not match the submitted data ({value[:40]!r} missing)'
+    return raw, None
+
+def render_submission_pdf(form_data, client_pdf=None):
+    """The PDF to forward and where it came from: 'client' if the browser's
+    render passes check_client_pdf, otherwise 'server' via generate_pdf"""
+    if client_pdf:
+        raw, problem = check_client_pdf(client_pdf, form_data)
+        if raw is not None:
+            return (io.BytesIO(raw) if PDF_STREAMING else raw), 'client'
+        print(f"Client PDF rejected, rendering on the server: {problem}")
+    # Spooled to disk past PDF_SPOOL_MAX_MEMORY in streaming mode
+    if PDF_STREAMING:
+        return generate_pdf(form_data, tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_MEMORY)), 'server'
+    return generate_pdf(form_data), 'server'
+
+# Request profiling: opt-in cProfile capture of whole requests, triggered by
+# an admin header carrying PROFILE_TOKEN or by sampling 1 in PROFILE_SAMPLE_RATE
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', '0') == '1'
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+PROFILE_HEADER = 'X-Profile-Token'
+PROFILE_SAMPLE_RATE = int(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '50'))
+PROFILE_ID_PATTERN = re.compile(r'^[0-9]{8}-[0-9]{12}-[0-9a-f]{4}$')
+
+# cProfile on Python 3.12+ hooks the interpreter globally, so only one request
+# is profiled at a time; a concurrent trigger is simply not profiled.
+_profile_lock = threading.Lock()
+_profile_counter = 0
+_profile_counter_lock = threading.Lock()
+
+def profile_trigger():
+    """Return why this request should be profiled, or None"""
+    global _profile_counter
+    if not PROFILING_ENABLED:
+        return None
+    if PROFILE_TOKEN and request.headers.get(PROFILE_HEADER) == PROFILE_TOKEN:
+        return 'header'
+    if PROFILE_SAMPLE_RATE > 0:
+        with _profile_counter_lock:
+            _profile_counter += 1
+            if _profile_counter % PROFILE_SAMPLE_RATE == 0:
+                return 'sample'
+    return None
+
+def save_profile(profiler, trigger, duration, status_code):
+    """Write a pstats dump plus a JSON summary, then rotate old profiles"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profile_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S%f')}-{uuid.uuid4().hex[:4]}"
+    profiler.dump_stats(os.path.join(PROFILE_DIR, f"{profile_id}.prof"))
+    
+    stats = pstats.Stats(profiler)
+    hot_spots = []
+    for (filename, line, function), (_, calls, total, cumulative, _) in stats.stats.items():
+        hot_spots.append({
+            'function': f"{os.path.basename(filename)}:{line}({function})",
+            'calls': calls,
+            'total_ms': round(total * 1000, 2),
+            'cumulative_ms': round(cumulative * 1000, 2)
+        })
+    hot_spots.sort(key=lambda item: item['total_ms'], reverse=True)
+    summary = {
+        'id': profile_id,
+        'method': request.method,
+        'path': request.path,
+        'status': status_code,
+        'trigger': trigger,
+        'duration_ms': round(duration * 1000, 2),
+        'created': datetime.now().isoformat(),
+        'hot_spots': hot_spots[:15]
+    }
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), 'w') as f:
+        json.dump(summary, f)
+    
+    for old_id in list_profile_ids()[PROFILE_KEEP:]:
+        for ext in ('.prof', '.json'):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, old_id + ext))
+            except OSError:
+                pass
+    print(f"Saved profile {profile_id} for {request.method} {request.path} ({summary['duration_ms']}ms)")
+
+def list_profile_ids():
+    """Stored profile IDs, newest first"""
+    try:
+        names = os.listdir(PROFILE_DIR)
+    except OSError:
+        return []
+    ids = {name[:-5] for name in names if name.endswith('.json')}
+    return sorted((i for i in ids if PROFILE_ID_PATTERN.match(i)), reverse=True)
+
+@app.before_request
+def start_request_profile():
+    trigger = profile_trigger()
+    if trigger and _profile_lock.acquire(blocking=False):
+        g.profile = (cProfile.Profile(), trigger, time.perf_counter())
+        g.profile[0].enable()
+
+@app.after_request
+def record_profile_status(response):
+    if 'profile' in g:
+        g.profile_status = response.status_code
+    return response
+
+@app.teardown_request
+def finish_request_profile(exc):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return
+    profiler, trigger, started = profile
+    profiler.disable()
+    _profile_lock.release()
+    try:
+        save_profile(profiler, trigger, time.perf_counter() - started, g.pop('profile_status', 500))
+    except Exception as e:
+        print(f"Error saving profile: {e}")
+
+def submission_filename(form_data):
+    student_name = form_data.get('fullName', 'Student').replace(' ', '_')
+    hostel = re.sub(r'\W+', '', HOSTEL_NAME.title())
+    return f"{hostel}_Application_{student_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+
+def submission_caption(form_data, app_id, duplicates=None):
+    """Telegram caption sent with the application PDF"""
+    warning = f"⚠️ <b>{duplicate_message(duplicates)}</b>\n\n" if duplicates else ''
+    return f"""{warning}🏠 <b>New Hostel Admission Application</b>
+        
+👤 <b>Student:</b> {form_data.get('fullName', 'N/A')}
+📧 <b>Email:</b> {form_data.get('email', 'N/A')}
+📱 <b>Phone:</b> {form_data.get('phone', 'N/A')}
+🏠 <b>Room:</b> {form_data.get('roomNumber', 'N/A')}
+📅 <b>Admission Date:</b> {form_data.get('admissionDate', 'N/A')}
+⏰ <b>Duration:</b> {form_data.get('stayDuration', 'N/A')}
+🆔 <b>Application ID:</b> {app_id}
+
+📋 Complete application form attached as PDF."""
+
+# Request deadlines: a submission gets SUBMIT_DEADLINE seconds end to end, or
+# less if the client says (X-Request-Timeout) it will give up sooner. Outbound
+# timeouts are cut to what is left, and stages that can wait are deferred
+SUBMIT_DEADLINE = float(os.getenv('SUBMIT_DEADLINE', '60'))
+DEADLINE_MIN_STAGE = float(os.getenv('DEADLINE_MIN_STAGE', '2'))
+DEADLINE_HEADER = 'X-Request-Timeout'
+TELEGRAM_DEFERRED_ATTEMPTS = 5
+
+class Deadline:
+    """Time budget for one request; ``Deadline(None)`` never runs out"""
+
+    def __init__(self, seconds):
+        self.expires = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self):
+        if self.expires is None:
+            return float('inf')
+        return max(0.0, self.expires - time.monotonic())
+
+    def allows(self, seconds=DEADLINE_MIN_STAGE):
+        """Whether a stage needing ``seconds`` is still worth starting"""
+        return self.remaining() >= seconds
+
+    def timeout(self, cap):
+        """An outbound timeout: ``cap``, cut to the remaining budget"""
+        return max(0.5, min(cap, self.remaining()))
+
+NO_DEADLINE = Deadline(None)
+_deadline_state = threading.local()
+
+def parse_deadline(header_value):
+    """Deadline from SUBMIT_DEADLINE and the client's timeout header (seconds)"""
+    seconds = SUBMIT_DEADLINE if SUBMIT_DEADLINE > 0 else None
+    try:
+        requested = float(header_value) if header_value else None
+    except ValueError:
+        requested = None
+    if requested is not None and requested > 0:
+        seconds = requested if seconds is None else min(seconds, requested)
+    return NO_DEADLINE if seconds is None else Deadline(seconds)
+
+def current_deadline():
+    """The deadline of the request running on this thread (NO_DEADLINE outside one)"""
+    return getattr(_deadline_state, 'deadline', NO_DEADLINE)
+
+def deadline_bound(view):
+    """Run a view under its request's deadline, visible to every stage on this thread"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        _deadline_state.deadline = parse_deadline(request.headers.get(DEADLINE_HEADER))
+        try:
+            return view(*args, **kwargs)
+        finally:
+            _deadline_state.deadline = NO_DEADLINE
+    return wrapper
+
+def client_disconnected():
+    """Whether the client has closed its connection (needs the server's socket in
+    the WSGI environ, as gunicorn and the development server provide)"""
+    connection = request.environ.get('gunicorn.socket') or request.environ.get('werkzeug.socket')
+    if connection is None:
+        return False
+    try:
+        # The body has been read, so a readable socket with nothing to peek is a closed one
+        readable, _, _ = select.select([connection], [], [], 0)
+        return bool(readable) and connection.recv(1, socket.MSG_PEEK) == b''
+    except ConnectionError:
+        return True
+    except (OSError, ValueError):
+        return False
+
+# One deferred render/send at a time, so they cannot crowd out live submissions
+_deferred_telegram_slot = threading.Semaphore(1)
+
+def defer_telegram_document(filename, caption, form_data, client_pdf=None, pdf_data=None):
+    """Send a submission's PDF from a background thread once its request has run out of time.
+
+    The PDF is rendered there if ``pdf_data`` is None. Failed sends are
+    retried with backoff, TELEGRAM_DEFERRED_ATTEMPTS times in all.
+    """
+    def run():
+        with _deferred_telegram_slot:
+            document = pdf_data
+            for attempt in range(1, TELEGRAM_DEFERRED_ATTEMPTS + 1):
+                try:
+                    if document is None:
+                        document, _ = render_submission_pdf(form_data, client_pdf)
+                    elif hasattr(document, 'seek'):
+                        document.seek(0)
+                    result = send_telegram_document(document, filename, caption)
+                    if result.get('ok'):
+                        print(f"Deferred Telegram send of {filename} delivered")
+                        break
+                    error = result.get('description', 'Unknown error')
+                except Exception as e:
+                    error = e
+                print(f"Deferred Telegram send of {filename} failed (attempt {attempt} of {TELEGRAM_DEFERRED_ATTEMPTS}): {error}")
+                if attempt < TELEGRAM_DEFERRED_ATTEMPTS:
+                    time.sleep(min(JOURNAL_MAX_BACKOFF, 2 ** attempt))
+            if PDF_STREAMING and document is not None:
+                document.close()
+    threading.Thread(target=run, name='telegram-deferred', daemon=True).start()
+
+# Admission control: the submit path renders PDFs and is CPU-bound, so it runs
+# behind a small concurrency limit with a bounded wait queue. Admin reads get
+# their own pool so a submission spike cannot starve the admin panel.
+SUBMIT_CONCURRENCY = int(os.getenv('SUBMIT_CONCURRENCY', '2'))
+SUBMIT_QUEUE_SIZE = int(os.getenv('SUBMIT_QUEUE_SIZE', '16'))
+SUBMIT_QUEUE_TIMEOUT = float(os.getenv('SUBMIT_QUEUE_TIMEOUT', '20'))
+ADMIN_CONCURRENCY = int(os.getenv('ADMIN_CONCURRENCY', '8'))
+ADMIN_QUEUE_SIZE = int(os.getenv('ADMIN_QUEUE_SIZE', '32'))
+ADMIN_QUEUE_TIMEOUT = float(os.getenv('ADMIN_QUEUE_TIMEOUT', '10'))
+
+class AdmissionGate:
+    """Concurrency limiter with a bounded wait queue.
+
+    Up to ``limit`` requests run at once and up to ``queue_size`` more wait
+    at most ``queue_timeout`` seconds for a slot; anything beyond that is
+    rejected immediately so the server sheds load instead of queueing work
+    the client will have given up on.
+    """
+
+    def __init__(self, name, limit, queue_size, queue_timeout):
+        self.name = name
+        self.limit = max(1, limit)
+        self.queue_size = max(0, queue_size)
+        self.queue_timeout = queue_timeout
+        self._condition = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._service_time = 1.0
+        self.admitted = 0
+        self.rejected = 0
+
+    def acquire(self, timeout=None):
+        """Take a slot, waiting at most ``queue_timeout`` (or ``timeout`` if shorter)"""
+        with self._condition:
+            if self._active < self.limit and not self._waiting:
+                self._active += 1
+                self.admitted += 1
+                return True
+            if self._waiting >= self.queue_size:
+                self.rejected += 1
+                return False
+            self._waiting += 1
+            deadline = time.monotonic() + min(self.queue_timeout, timeout if timeout is not None else self.queue_timeout)
+            try:
+                while self._active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        return False
+                    self._condition.wait(remaining)
+            finally:
+                self._waiting -= 1
+            self._active += 1
+            self.admitted += 1
+            return True
+
+    def release(self, elapsed):
+        with self._condition:
+            self._active -= 1
+            # Exponential moving average of service time, used for Retry-After
+            self._service_time = 0.8 * self._service_time + 0.2 * elapsed
+            self._condition.notify()
+
+    def retry_after(self):
+        """Seconds until a slot is likely to free up, rounded up."""
+        with self._condition:
+            backlog = self._active + self._waiting
+            estimate = self._service_time * backlog / self.limit
+        return max(1, int(estimate + 0.999))
+
+    def stats(self):
+        with self._condition:
+            return {
+                'limit': self.limit,
+                'queue_size': self.queue_size,
+                'active': self._active,
+                'waiting': self._waiting,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'avg_service_seconds': round(self._service_time, 3)
+            }
+
+submit_gate = AdmissionGate('submit', SUBMIT_CONCURRENCY, SUBMIT_QUEUE_SIZE, SUBMIT_QUEUE_TIMEOUT)
+admin_gate = AdmissionGate('admin', ADMIN_CONCURRENCY, ADMIN_QUEUE_SIZE, ADMIN_QUEUE_TIMEOUT)
+
+def admission_controlled(gate):
+    """Run a view inside ``gate``; reply 503 with Retry-After when it is full."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Waiting past the request's deadline only queues work the client has given up on
+            if not gate.acquire(current_deadline().remaining()):
+                retry_after = gate.retry_after()
+                print(f"Shedding {gate.name} request: {request.path} (retry after {retry_after}s)")
+                response = jsonify({
+                    'success': False,
+                    'error': 'Server is busy, please retry shortly',
+                    'retry_after': retry_after
+                })
+                response.status_code = 503
+                response.headers['Retry-After'] = str(retry_after)
+                return response
+            started = time.perf_counter()
+            try:
+                return view(*args, **kwargs)
+            finally:
+                gate.release(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+# Per-submission memory accounting: RSS before and after every submission,
+# plus the tracemalloc peak (and top allocation sites) for one at a time
+MEMORY_ACCOUNTING = os.getenv('MEMORY_ACCOUNTING', '1') == '1'
+MEMORY_TRACEMALLOC = os.getenv('MEMORY_TRACEMALLOC', '0') == '1'
+MEMORY_TOP_N = int(os.getenv('MEMORY_TOP_N', '10'))
+MEMORY_WORST_KEEP = 5
+MEMORY_RECENT_KEEP = 100
+MEMORY_BUCKET_BYTES = 2 * 1024 * 1024
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+def current_rss():
+    """Resident set size of this process in bytes (None where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+def rss_high_water():
+    """Peak RSS of this process in bytes"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+def payload_shape(form_data):
+    """(attachment count, total decoded attachment bytes) of a submission"""
+    if not isinstance(form_data, dict):
+        return 0, 0
+    attachments = [data_url for _, data_url in collect_attachments(form_data) if isinstance(data_url, str)]
+    decoded = sum(
+        upload_store.prepared_size(data_url[len(UPLOAD_REF_PREFIX):]) if data_url.startswith(UPLOAD_REF_PREFIX)
+        else (len(data_url) - data_url.find(',') - 1) * 3 // 4
+        for data_url in attachments
+    )
+    return len(attachments), decoded
+
+class MemoryAccountant:
+    """Memory used by submissions, aggregated by payload shape.
+
+    tracemalloc is process-wide, so it runs for one submission at a time and
+    its peak includes whatever else the process allocated meanwhile; the
+    ``concurrent`` field of each record says how much company there was.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._trace_lock = threading.Lock()
+        self._local = threading.local()
+        self.in_flight = 0
+        self.recent = deque(maxlen=MEMORY_RECENT_KEEP)
+        self.shapes = {}
+        self.worst = []
+
+    def begin(self):
+        traced = MEMORY_TRACEMALLOC and self._trace_lock.acquire(blocking=False)
+        if traced:
+            tracemalloc.start()
+        with self._lock:
+            self.in_flight += 1
+            concurrent = self.in_flight
+        token = {
+            'started': time.perf_counter(),
+            'rss_before': current_rss(),
+            'traced': traced,
+            'concurrent': concurrent,
+            'snapshot': None,
+            'snapshot_bytes': 0
+        }
+        self._local.token = token
+        return token
+
+    def checkpoint(self):
+        """Keep an allocation snapshot if this is the request's traced high point so far"""
+        token = getattr(self._local, 'token', None)
+        if token is None or not token['traced'] or MEMORY_TOP_N <= 0:
+            return
+        current, _ = tracemalloc.get_traced_memory()
+        if current > token['snapshot_bytes']:
+            token['snapshot'] = tracemalloc.take_snapshot()
+            token['snapshot_bytes'] = current
+
+    def end(self, token, form_data, status):
+        self._local.token = None
+        traced_peak = None
+        snapshot = token['snapshot']
+        if token['traced']:
+            _, traced_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self._trace_lock.release()
+        rss_before, rss_after = token['rss_before'], current_rss()
+        attachments, decoded = payload_shape(form_data)
+        record = {
+            'at': datetime.now().isoformat(timespec='seconds'),
+            'status': status,
+            'duration_ms': round((time.perf_counter() - token['started']) * 1000, 2),
+            'attachments': attachments,
+            'decoded_bytes': decoded,
+            'traced_peak_bytes': traced_peak,
+            'rss_before': rss_before,
+            'rss_after': rss_after,
+            'rss_delta': rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+            'rss_high_water': rss_high_water(),
+            'concurrent': token['concurrent']
+        }
+        print(json.dumps(dict(record, event='submission_memory')))
+
+        if snapshot is not None and traced_peak is not None and self._is_worst(traced_peak):
+            record = dict(record, top_allocations=top_allocation_sites(snapshot, MEMORY_TOP_N),
+                          snapshot_bytes=token['snapshot_bytes'])
+        with self._lock:
+            self.in_flight -= 1
+            self.recent.append(record)
+            shape = self.shapes.setdefault((attachments, decoded // MEMORY_BUCKET_BYTES), {
+                'count': 0, 'traced': 0, 'traced_peak_sum': 0, 'traced_peak_max': 0, 'rss_delta_max': 0
+            })
+            shape['count'] += 1
+            if record['rss_delta'] is not None:
+                shape['rss_delta_max'] = max(shape['rss_delta_max'], record['rss_delta'])
+            if traced_peak is not None:
+                shape['traced'] += 1
+                shape['traced_peak_sum'] += traced_peak
+                shape['traced_peak_max'] = max(shape['traced_peak_max'], traced_peak)
+                if 'top_allocations' in record:
+                    self.worst.append(record)
+                    self.worst.sort(key=lambda item: item['traced_peak_bytes'], reverse=True)
+                    del self.worst[MEMORY_WORST_KEEP:]
+
+    def _is_worst(self, traced_peak):
+        with self._lock:
+            return len(self.worst) < MEMORY_WORST_KEEP or traced_peak > self.worst[-1]['traced_peak_bytes']
+
+    def report(self):
+        with self._lock:
+            shapes = [{
+                'attachments': attachments,
+                'decoded_mb_range': [bucket * MEMORY_BUCKET_BYTES // 1048576, (bucket + 1) * MEMORY_BUCKET_BYTES // 1048576],
+                'count': shape['count'],
+                'traced': shape['traced'],
+                'traced_peak_avg': shape['traced_peak_sum'] // shape['traced'] if shape['traced'] else None,
+                'traced_peak_max': shape['traced_peak_max'] if shape['traced'] else None,
+                'rss_delta_max': shape['rss_delta_max']
+            } for (attachments, bucket), shape in sorted(self.shapes.items())]
+            return {
+                'tracemalloc': MEMORY_TRACEMALLOC,
+                'in_flight': self.in_flight,
+                'rss': current_rss(),
+                'rss_high_water': rss_high_water(),
+                'shapes': shapes,
+                'worst': list(self.worst),
+                'recent': list(self.recent)[-20:]
+            }
+
+def top_allocation_sites(snapshot, limit):
+    """Largest allocation sites (file:line) in a tracemalloc snapshot"""
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    ))
+    return [{
+        'site': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+        'size_bytes': stat.size,
+        'count': stat.count
+    } for stat in snapshot.statistics('lineno')[:limit]]
+
+memory_accountant = MemoryAccountant()
+
+def memory_accounted(view):
+    """Record the memory a view used, tagged with the shape of its JSON payload"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not MEMORY_ACCOUNTING:
+            return view(*args, **kwargs)
+        token = memory_accountant.begin()
+        status = 500
+        try:
+            result = view(*args, **kwargs)
+            status = result[1] if isinstance(result, tuple) else getattr(result, 'status_code', 200)
+            return result
+        finally:
+            memory_accountant.end(token, request.get_json(silent=True), status)
+    return wrapper
+
 @app.route('/submit-application', methods=['POST'])
+@deadline_bound
+@validated_submission
+@admission_controlled(submit_gate)
+@memory_accounted
 def submit_application():
     try:
         form_data = request.get_json()
@@ -711,48 +4318,94 @@ def submit_application():
         if not form_data:
             return jsonify({'success': False, 'error': 'No data provided'}), 400
         
+        # Never journaled or stored; only considered for forwarding
+        client_pdf = form_data.pop('clientPdf', None) if isinstance(form_data, dict) else None
+        
         # Initialize response data
         response_data = {'success': True, 'message': 'Application submitted successfully!'}
         
-        # Save to Notion database first
+        # Flag room allocation conflicts up front (one indexed lookup in the occupancy table)
+        room_conflict = room_index.conflict(form_data.get('roomNumber'))
+        if room_conflict:
+            response_data['room_warning'] = room_conflict_message(room_conflict)
+        
+        # Same check for an applicant who has already applied (one indexed SQLite lookup)
+        refresh_application_indexes_async()
+        duplicates = duplicate_index.matches(form_data) if DUPLICATE_POLICY != 'off' else []
+        if duplicates:
+            if DUPLICATE_POLICY == 'link':
+                # Point the applicant at the earlier application; no new page, PDF or message
+                return jsonify({
+                    'success': True,
+                    'duplicate': True,
+                    'message': 'An application for this applicant already exists',
+                    'application_id': duplicates[0]['application_id'],
+                    'duplicate_of': duplicates
+                })
+            response_data['duplicate_warning'] = duplicate_message(duplicates)
+            response_data['duplicate_of'] = duplicates
+        
+        # Nothing is saved yet, so a client that has gone away costs nothing more
+        if client_disconnected():
+            print("Client disconnected before its submission was saved, abandoning it")
+            return jsonify({'success': False, 'error': 'Client disconnected'}), 499
+        
+        # Save to Notion database first (journaled for later if the budget is short)
         notion_result = save_to_notion_database(form_data)
         if notion_result['success']:
-            response_data['notion_page_id'] = notion_result['notion_page_id']
             response_data['application_id'] = notion_result['application_id']
+            if notion_result.get('queued'):
+                # Journaled; the replayer creates the Notion page once Notion is reachable
+                response_data['notion_queued'] = True
+                if notion_result.get('journal_entry') is not None:
+                    generate_thumbnails_async(None, form_data, notion_result.get('journal_entry'))
+            else:
+                response_data['notion_page_id'] = notion_result['notion_page_id']
+                # Small previews for the admin panel, produced once at ingest
+                generate_thumbnails_async(notion_result['notion_page_id'], form_data)
         else:
             response_data['notion_warning'] = f'Notion save failed: {notion_result["error"]}'
         
-        # Generate PDF
-        pdf_data = generate_pdf(form_data)
-        
-        # Create filename
-        student_name = form_data.get('fullName', 'Student').replace(' ', '_')
-        filename = f"NavadayaGirlsHostal_Application_{student_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-        
-        # Create caption for Telegram
+        filename = submission_filename(form_data)
         app_id = notion_result.get('application_id', f"HA-{datetime.now().strftime('%Y%m%d%H%M%S')}")
-        caption = f"""🏠 <b>New Hostel Admission Application</b>
-        
-👤 <b>Student:</b> {form_data.get('fullName', 'N/A')}
-📧 <b>Email:</b> {form_data.get('email', 'N/A')}
-📱 <b>Phone:</b> {form_data.get('phone', 'N/A')}
-🏠 <b>Room:</b> {form_data.get('roomNumber', 'N/A')}
-📅 <b>Admission Date:</b> {form_data.get('admissionDate', 'N/A')}
-⏰ <b>Duration:</b> {form_data.get('stayDuration', 'N/A')}
-🆔 <b>Application ID:</b> {app_id}
-
-📋 Complete application form attached as PDF."""
+        caption = submission_caption(form_data, app_id, duplicates)
         
-        # Send to Telegram
-        telegram_result = send_telegram_document(pdf_data, filename, caption)
+        # Render and send only while the deadline leaves time for them
+        deadline = current_deadline()
+        telegram_result = None
+        pdf_data = None
+        if deadline.allows():
+            # Forward the browser's PDF when it checks out, otherwise render one
+            pdf_data, response_data['pdf_source'] = render_submission_pdf(form_data, client_pdf if CLIENT_PDF else None)
+            memory_accountant.checkpoint()
+            
+            # Send to Telegram
+            if deadline.allows():
+                try:
+                    telegram_result = send_telegram_document(pdf_data, filename, caption)
+                except requests.RequestException as e:
+                    telegram_result = {'ok': False, 'description': str(e)}
+                except Exception as e:
+                    # e.g. Telegram not configured: Notion already has the submission,
+                    # so retry the send after the response rather than failing it
+                    print(f"Telegram send failed, deferring: {e}")
+                finally:
+                    if PDF_STREAMING:
+                        pdf_data.close()
+                        # The deferred send renders the PDF again
+                        pdf_data = None
         
-        if telegram_result.get('ok'):
+        if telegram_result is None:
+            # Out of time: the PDF (rendered there if need be) goes out after the response
+            defer_telegram_document(filename, caption, form_data, client_pdf if CLIENT_PDF else None, pdf_data)
+            response_data['telegram_queued'] = True
+        elif telegram_result.get('ok'):
             response_data['telegram_message_id'] = telegram_result.get('result', {}).get('message_id')
         else:
             response_data['telegram_warning'] = f'Telegram send failed: {telegram_result.get("description", "Unknown error")}'
         
         # If both Notion and Telegram failed, return error
-        if not notion_result['success'] and not telegram_result.get('ok'):
+        if not notion_result['success'] and telegram_result is not None and not telegram_result.get('ok'):
             return jsonify({
                 'success': False, 
                 'error': 'Failed to submit to both Notion and Telegram',
@@ -810,33 +4463,36 @@ def test_notion_connection():
 @app.route('/create-notion-database', methods=['POST'])
 def create_database_endpoint():
     """Endpoint to manually create the Notion database"""
-    global ACTUAL_DATABASE_ID
     if not notion_client or not NOTION_DATABASE_ID:
         return jsonify({'success': False, 'error': 'Notion not configured'})
     
-    # Check if we already have a working database
-    if ACTUAL_DATABASE_ID:
-        try:
-            database = notion_client.databases.retrieve(database_id=ACTUAL_DATABASE_ID)
-            return jsonify({
-                'success': True,
-                'database_id': ACTUAL_DATABASE_ID,
-                'message': 'Database already exists!',
-                'existing': True
-            })
-        except:
-            ACTUAL_DATABASE_ID = None
-    
-    result = create_notion_database()
-    if result['success']:
-        ACTUAL_DATABASE_ID = result['database_id']
-        save_database_id(ACTUAL_DATABASE_ID)
+    with database_bootstrap_lock():
+        # Check if we (or another worker) already have a working database
+        stored_id, _ = read_database_record()
+        existing_id = stored_id or ACTUAL_DATABASE_ID
+        if existing_id:
+            try:
+                notion_client.databases.retrieve(database_id=existing_id)
+                save_database_id(existing_id)
+                return jsonify({
+                    'success': True,
+                    'database_id': existing_id,
+                    'message': 'Database already exists!',
+                    'existing': True
+                })
+            except Exception as e:
+                if not is_not_found_error(e):
+                    return jsonify({'success': False, 'error': str(e)})
+                forget_database_id()
+        
+        result = create_notion_database()
+        if result['success']:
+            save_database_id(result['database_id'])
     return jsonify(result)
 
 @app.route('/get-database-info', methods=['GET'])
 def get_database_info():
     """Get current database information"""
-    global ACTUAL_DATABASE_ID
     if not notion_client:
         return jsonify({'success': False, 'error': 'Notion not configured'})
     
@@ -859,9 +4515,10 @@ def get_database_info():
 @app.route('/admin')
 def admin_panel():
     """Serve the admin panel"""
-    return send_file('admin.html')
+    return serve_asset('admin.html')
 
 @app.route('/api/admin/applications', methods=['GET'])
+@admission_controlled(admin_gate)
 def get_admin_applications():
     """Get all applications for admin panel"""
     if not notion_client:
@@ -875,41 +4532,13 @@ def get_admin_applications():
         database_id = db_result['database_id']
         
         # Query all pages from database
-        response = notion_client.databases.query(
-            database_id=database_id,
-            sorts=[
-                {
-                    "property": "Submission Date",
-                    "direction": "descending"
-                }
-            ]
-        )
+        pages = query_database_pages(database_id, sorts=NEWEST_FIRST)
         
         applications = []
-        for page in response['results']:
+        for page in pages:
             try:
-                props = page['properties']
-                
-                # Extract data safely
-                app_data = {
-                    'id': page['id'],
-                    'student_name': get_notion_text(props.get('Student Name', {})),
-                    'email': get_notion_email(props.get('Email', {})),
-                    'phone': get_notion_phone(props.get('Phone', {})),
-                    'date_of_birth': get_notion_date(props.get('Date of Birth', {})),
-                    'address': get_notion_text(props.get('Address', {})),
-                    'guardian_name': get_notion_text(props.get('Guardian Name', {})),
-                    'guardian_phone': get_notion_phone(props.get('Guardian Phone', {})),
-                    'relation': get_notion_select(props.get('Relation', {})),
-                    'room_number': get_notion_text(props.get('Room Number', {})),
-                    'admission_date': get_notion_date(props.get('Admission Date', {})),
-                    'stay_duration': get_notion_text(props.get('Stay Duration', {})),
-                    'emergency_contact': get_notion_phone(props.get('Emergency Contact', {})),
-                    'status': get_notion_select(props.get('Status', {})) or 'Pending Review',
-                    'submission_date': get_notion_date(props.get('Submission Date', {})),
-                    'application_id': get_notion_text(props.get('Application ID', {}))
-                }
-                applications.append(app_data)
+                # Decode through the cache so views right after a list load are warm
+                applications.append(publish_application(page))
             except Exception as e:
                 print(f"Error processing application: {e}")
                 continue
@@ -924,6 +4553,72 @@ def get_admin_applications():
         print(f"Error fetching applications: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/admin/search', methods=['GET'])
+@admission_controlled(admin_gate)
+def search_applications():
+    """Ranked, paginated search over name, email, phone, room and application ID"""
+    if not notion_client:
+        return jsonify({'success': False, 'error': 'Notion not configured'})
+    
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'error': 'Query parameter q is required'}), 400
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(max(int(request.args.get('per_page', 20)), 1), SEARCH_MAX_PER_PAGE)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'page and per_page must be integers'}), 400
+    
+    try:
+        build_result = ensure_application_indexes()
+        if not build_result['success']:
+            return jsonify(build_result)
+        # The index is per process: catch up with edits made elsewhere first
+        try:
+            sync_result = sync_search_index()
+            if not sync_result['success']:
+                print(f"Search sync skipped: {sync_result['error']}")
+        except Exception as e:
+            print(f"Search sync skipped: {e}")
+        
+        results, total = search_index.search(query, request.args.get('status') or None, page, per_page)
+        return jsonify({
+            'success': True,
+            'query': query,
+            'results': results,
+            'total': total,
+            'page': page,
+            'per_page': per_page
+        })
+        
+    except Exception as e:
+        print(f"Error searching applications: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/admin/rooms', methods=['GET'])
+@admission_controlled(admin_gate)
+def get_room_occupancy():
+    """Room occupancy: approved occupants, capacity and pending demand per room"""
+    if not notion_client:
+        return jsonify({'success': False, 'error': 'Notion not configured'})
+    
+    try:
+        build_result = ensure_application_indexes()
+        if not build_result['success']:
+            return jsonify(build_result)
+        
+        rooms = room_index.summary(request.args.get('room') or None)
+        return jsonify({
+            'success': True,
+            'rooms': rooms,
+            'total_rooms': len(rooms),
+            'default_capacity': ROOM_CAPACITY
+        })
+        
+    except Exception as e:
+        print(f"Error fetching room occupancy: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/admin/applications/<application_id>/status', methods=['PATCH'])
 def update_application_status(application_id):
     """Update application status"""
@@ -937,17 +4632,18 @@ def update_application_status(application_id):
         if not new_status:
             return jsonify({'success': False, 'error': 'Status is required'}), 400
         
-        # Update the page in Notion
-        notion_client.pages.update(
-            page_id=application_id,
-            properties={
-                "Status": {
-                    "select": {
-                        "name": new_status
-                    }
-                }
-            }
-        )
+        properties = {"Status": FIELD_ENCODERS["Status"](new_status)}
+        problem = page_update_problem(application_id, properties)
+        if problem:
+            return jsonify({'success': False, 'error': problem[0]}), problem[1]
+        
+        if new_status == OCCUPYING_STATUS and not data.get('force'):
+            conflict = reserve_room(application_id)
+            if conflict:
+                return jsonify({'success': False, 'error': room_conflict_message(conflict), 'conflict': conflict}), 409
+        
+        # Update the page in Notion (acknowledged now, flushed by the write-behind queue)
+        update_notion_page(application_id, properties)
         
         return jsonify({
             'success': True,
@@ -965,11 +4661,13 @@ def delete_application(application_id):
         return jsonify({'success': False, 'error': 'Notion not configured'})
     
     try:
+        problem = page_update_problem(application_id)
+        if problem:
+            return jsonify({'success': False, 'error': problem[0]}), problem[1]
+        
         # Archive the page in Notion (Notion doesn't allow true deletion)
-        notion_client.pages.update(
-            page_id=application_id,
-            archived=True
-        )
+        update_notion_page(application_id, archived=True)
+        remove_thumbnails(application_id)
         
         return jsonify({
             'success': True,
@@ -981,6 +4679,7 @@ def delete_application(application_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/admin/test-database', methods=['GET'])
+@admission_controlled(admin_gate)
 def test_admin_database():
     """Test database connection for admin"""
     if not notion_client:
@@ -1001,7 +4700,31 @@ def test_admin_database():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+def count_statuses(pages):
+    """Dashboard counts by status; anything not approved or rejected is pending"""
+    decode_status = FIELD_DECODERS['Status']
+    approved = 0
+    pending = 0
+    rejected = 0
+    
+    for page in pages:
+        status = decode_status(page['properties'].get('Status'))
+        if status == 'Approved':
+            approved += 1
+        elif status == 'Rejected':
+            rejected += 1
+        else:
+            pending += 1
+    
+    return {
+        'total': len(pages),
+        'approved': approved,
+        'pending': pending,
+        'rejected': rejected
+    }
+
 @app.route('/api/admin/stats', methods=['GET'])
+@admission_controlled(admin_gate)
 def get_admin_stats():
     """Get statistics for admin dashboard"""
     if not notion_client:
@@ -1015,66 +4738,68 @@ def get_admin_stats():
         database_id = db_result['database_id']
         
         # Get all applications
-        response = notion_client.databases.query(database_id=database_id)
-        
-        total = len(response['results'])
-        approved = 0
-        pending = 0
-        rejected = 0
-        
-        for page in response['results']:
-            status = get_notion_select(page['properties'].get('Status', {})) or 'Pending Review'
-            if status == 'Approved':
-                approved += 1
-            elif status == 'Rejected':
-                rejected += 1
-            else:
-                pending += 1
+        pages = query_database_pages(database_id)
         
         return jsonify({
             'success': True,
-            'stats': {
-                'total': total,
-                'approved': approved,
-                'pending': pending,
-                'rejected': rejected
-            }
+            'stats': count_statuses(pages)
         })
         
     except Exception as e:
         print(f"Error fetching stats: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/admin/stats/timeseries', methods=['GET'])
+@admission_controlled(admin_gate)
+def get_stats_timeseries():
+    """Bucketed submission and status-transition counts for dashboard charts"""
+    if not notion_client:
+        return jsonify({'success': False, 'error': 'Notion not configured'})
+    
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in ROLLUP_GRANULARITIES:
+        return jsonify({'success': False, 'error': f"granularity must be one of {', '.join(ROLLUP_GRANULARITIES)}"}), 400
+    end = parse_record_datetime(request.args.get('to')) or datetime.now()
+    if len(request.args.get('to', '')) == 10:
+        # A bare date means the whole of that day
+        end += timedelta(days=1) - timedelta(microseconds=1)
+    default_span = {'hour': timedelta(hours=48), 'day': timedelta(days=30), 'week': timedelta(weeks=12)}[granularity]
+    start = parse_record_datetime(request.args.get('from')) or end - default_span
+    metrics = request.args.get('metrics')
+    
+    try:
+        build_result = ensure_application_indexes()
+        if not build_result['success']:
+            return jsonify(build_result)
+        
+        series = stats_rollup.series(granularity, start, end, set(metrics.split(',')) if metrics else None)
+        return jsonify({
+            'success': True,
+            'granularity': granularity,
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'series': series
+        })
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error fetching stats timeseries: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/admin/applications/<application_id>', methods=['GET'])
+@admission_controlled(admin_gate)
 def get_single_application(application_id):
     """Get single application details for editing"""
     if not notion_client:
         return jsonify({'success': False, 'error': 'Notion not configured'})
     
     try:
-        # Get the specific page
-        page = notion_client.pages.retrieve(page_id=application_id)
-        props = page['properties']
-        
-        # Extract data safely
-        app_data = {
-            'id': page['id'],
-            'student_name': get_notion_text(props.get('Student Name', {})),
-            'email': get_notion_email(props.get('Email', {})),
-            'phone': get_notion_phone(props.get('Phone', {})),
-            'date_of_birth': get_notion_date(props.get('Date of Birth', {})),
-            'address': get_notion_text(props.get('Address', {})),
-            'guardian_name': get_notion_text(props.get('Guardian Name', {})),
-            'guardian_phone': get_notion_phone(props.get('Guardian Phone', {})),
-            'relation': get_notion_select(props.get('Relation', {})),
-            'room_number': get_notion_text(props.get('Room Number', {})),
-            'admission_date': get_notion_date(props.get('Admission Date', {})),
-            'stay_duration': get_notion_text(props.get('Stay Duration', {})),
-            'emergency_contact': get_notion_phone(props.get('Emergency Contact', {})),
-            'status': get_notion_select(props.get('Status', {})) or 'Pending Review',
-            'submission_date': get_notion_date(props.get('Submission Date', {})),
-            'application_id': get_notion_text(props.get('Application ID', {}))
-        }
+        # Always revalidate against Notion: the cache only skips re-decoding an unchanged page
+        page = retrieve_application_page(application_id)
+        app_data = publish_application(page) if page is not None else None
+        if app_data is None:
+            return jsonify({'success': False, 'error': 'Application not found'}), 404
         
         return jsonify({
             'success': True,
@@ -1085,6 +4810,35 @@ def get_single_application(application_id):
         print(f"Error fetching application: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/admin/applications/<application_id>/thumbs', methods=['GET'])
+@admission_controlled(admin_gate)
+def list_application_thumbnails(application_id):
+    """List the thumbnails generated for an application at submission time"""
+    manifest = read_thumbnail_manifest(application_id)
+    if manifest is None:
+        return jsonify({'success': True, 'thumbnails': []})
+    return jsonify({
+        'success': True,
+        'thumbnails': [
+            dict(entry, url=f"{request.script_root}/api/admin/applications/{application_id}/thumbs/{entry['n']}")
+            for entry in manifest
+        ]
+    })
+
+@app.route('/api/admin/applications/<application_id>/thumbs/<int:n>', methods=['GET'])
+@admission_controlled(admin_gate)
+def get_application_thumbnail(application_id, n):
+    """Serve one thumbnail; content never changes, so it is cached long-term"""
+    manifest = read_thumbnail_manifest(application_id) or []
+    entry = next((item for item in manifest if item['n'] == n), None)
+    if entry is None:
+        abort(404)
+    
+    path = os.path.join(thumbnail_directory(application_id), f"{n}.{entry['format']}")
+    response = send_file(os.path.abspath(path), mimetype=f"image/{entry['format']}", etag=entry['etag'], conditional=True)
+    response.headers['Cache-Control'] = THUMBNAIL_CACHE_CONTROL
+    return response
+
 @app.route('/api/admin/applications/<application_id>', methods=['PUT'])
 def update_application(application_id):
     """Update application data"""
@@ -1095,52 +4849,19 @@ def update_application(application_id):
         data = request.get_json()
         
         # Build properties object for update
-        properties = {}
-        
-        if data.get('student_name'):
-            properties['Student Name'] = {'title': [{'text': {'content': data['student_name']}}]}
-        
-        if data.get('email'):
-            properties['Email'] = {'email': data['email']}
-        
-        if data.get('phone'):
-            properties['Phone'] = {'phone_number': data['phone']}
-        
-        if data.get('date_of_birth'):
-            properties['Date of Birth'] = {'date': {'start': data['date_of_birth']}}
-        
-        if data.get('address'):
-            properties['Address'] = {'rich_text': [{'text': {'content': data['address']}}]}
-        
-        if data.get('guardian_name'):
-            properties['Guardian Name'] = {'rich_text': [{'text': {'content': data['guardian_name']}}]}
-        
-        if data.get('guardian_phone'):
-            properties['Guardian Phone'] = {'phone_number': data['guardian_phone']}
-        
-        if data.get('relation'):
-            properties['Relation'] = {'select': {'name': data['relation']}}
-        
-        if data.get('room_number'):
-            properties['Room Number'] = {'rich_text': [{'text': {'content': data['room_number']}}]}
-        
-        if data.get('admission_date'):
-            properties['Admission Date'] = {'date': {'start': data['admission_date']}}
-        
-        if data.get('stay_duration'):
-            properties['Stay Duration'] = {'rich_text': [{'text': {'content': data['stay_duration']}}]}
+        properties = encode_properties(data, COMPILED_SCHEMA['admin_encoders'])
+        problem = page_update_problem(application_id, properties)
+        if problem:
+            return jsonify({'success': False, 'error': problem[0]}), problem[1]
         
-        if data.get('emergency_contact'):
-            properties['Emergency Contact'] = {'phone_number': data['emergency_contact']}
-        
-        if data.get('status'):
-            properties['Status'] = {'select': {'name': data['status']}}
+        # Approved applications must fit in their (possibly new) room
+        if (data.get('status') or room_index.status_of(application_id)) == OCCUPYING_STATUS and not data.get('force'):
+            conflict = reserve_room(application_id, data.get('room_number'))
+            if conflict:
+                return jsonify({'success': False, 'error': room_conflict_message(conflict), 'conflict': conflict}), 409
         
         # Update the page in Notion
-        notion_client.pages.update(
-            page_id=application_id,
-            properties=properties
-        )
+        update_notion_page(application_id, properties)
         
         return jsonify({
             'success': True,
@@ -1151,16 +4872,201 @@ def update_application(application_id):
         print(f"Error updating application: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+NEWEST_FIRST = [
+    {
+        "property": "Submission Date",
+        "direction": "descending"
+    }
+]
+
+# Export filters pushed down into the Notion query: (request key, property, operator)
+EXPORT_FILTERS = (
+    ('status_filter', 'Status', 'equals'),
+    ('gender', 'Gender', 'equals'),
+    ('relation', 'Relation', 'equals'),
+    ('submission_from', 'Submission Date', 'on_or_after'),
+    ('submission_to', 'Submission Date', 'on_or_before'),
+    ('admission_from', 'Admission Date', 'on_or_after'),
+    ('admission_to', 'Admission Date', 'on_or_before'),
+)
+SCHEMA_FIELDS = {field['notion']: field for field in APPLICATION_SCHEMA}
+COLUMNAR_FORMATS = {
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.file', 'arrow')
+}
+EXPORT_DECODER_CACHE_SIZE = 32
+
+def build_export_filter(data):
+    """Notion filter for the export request; raises ValueError on a bad date"""
+    conditions = []
+    for key, name, operator in EXPORT_FILTERS:
+        value = data.get(key)
+        if not value:
+            continue
+        field = SCHEMA_FIELDS[name]
+        if field['type'] == 'date':
+            try:
+                datetime.strptime(value, '%Y-%m-%d')
+            except (TypeError, ValueError):
+                raise ValueError(f"{key} must be a YYYY-MM-DD date")
+        elif field.get('normalize'):
+            value = field['normalize'](value)
+        conditions.append({"property": name, field['type']: {operator: value}})
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"and": conditions}
+
+def parse_export_columns(data):
+    """Requested export columns (Notion property names), defaulting to all"""
+    columns = data.get('columns') or [field['notion'] for field in APPLICATION_SCHEMA]
+    if isinstance(columns, str):
+        columns = [column.strip() for column in columns.split(',')]
+    unknown = [column for column in columns if column not in SCHEMA_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown export columns: {', '.join(unknown)}")
+    return tuple(dict.fromkeys(columns))
+
+_export_decoders = {}
+
+def export_decoder(columns):
+    """Batch decoder for just the projected columns (compiled once per projection)"""
+    decoder = _export_decoders.get(columns)
+    if decoder is None:
+        if len(_export_decoders) >= EXPORT_DECODER_CACHE_SIZE:
+            _export_decoders.clear()
+        decoder = _compile_batch_decoder([SCHEMA_FIELDS[name] for name in columns], list(columns), include_id=False)
+        _export_decoders[columns] = decoder
+    return decoder
+
+_database_property_ids = {}
+
+def projected_property_ids(database_id, columns):
+    """Notion property IDs for a projection, so Notion only returns those columns.
+
+    Returns None (all properties) when every column is wanted or the IDs
+    cannot be looked up.
+    """
+    if len(columns) == len(APPLICATION_SCHEMA):
+        return None
+    property_ids = _database_property_ids.get(database_id)
+    if property_ids is None:
+        try:
+            database = notion_client.databases.retrieve(database_id=database_id)
+        except Exception as e:
+            print(f"Could not load property IDs, exporting all columns from Notion: {e}")
+            return None
+        property_ids = {name: prop.get('id') for name, prop in (database.get('properties') or {}).items()}
+        _database_property_ids[database_id] = property_ids
+    ids = [property_ids.get(name) for name in columns]
+    return ids if all(ids) else None
+
+_arrow_modules = None
+
+def load_arrow_modules():
+    """Import pyarrow on first columnar export; None if it is not installed"""
+    global _arrow_modules
+    if _arrow_modules is None:
+        started = time.perf_counter()
+        try:
+            import pyarrow
+            import pyarrow.ipc
+            import pyarrow.parquet
+        except ImportError:
+            return None
+        _arrow_modules = (pyarrow, pyarrow.parquet)
+        record_lazy_load('arrow_modules', started)
+    return _arrow_modules
+
+def _parse_export_date(value):
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if len(value) == 10:
+        return parsed.date()
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def export_columnar(applications, columns, export_format):
+    """Encode rows as Parquet or Arrow IPC with typed columns.
+
+    Date properties become date32 (or timestamp when Notion stored a time),
+    selects become dictionary-encoded strings. Returns (bytes, mimetype, filename).
+    """
+    pa, pq = load_arrow_modules()
+    arrays = []
+    for name in columns:
+        field = SCHEMA_FIELDS[name]
+        values = [row[name] for row in applications]
+        if field['type'] == 'date':
+            values = [_parse_export_date(value) for value in values]
+            has_time = any(isinstance(value, datetime) for value in values)
+            if has_time:
+                values = [datetime.combine(value, datetime.min.time()) if value is not None and not isinstance(value, datetime) else value
+                          for value in values]
+            arrays.append(pa.array(values, type=pa.timestamp('us') if has_time else pa.date32()))
+        elif field['type'] == 'select':
+            arrays.append(pa.array([value or None for value in values], type=pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array([value or None for value in values], type=pa.string()))
+    table = pa.Table.from_arrays(arrays, names=list(columns))
+    
+    sink = pa.BufferOutputStream()
+    if export_format == 'parquet':
+        pq.write_table(table, sink, compression='zstd')
+    else:
+        options = pa.ipc.IpcWriteOptions(compression='zstd')
+        with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+    mimetype, extension = COLUMNAR_FORMATS[export_format]
+    filename = f'applications_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+    return sink.getvalue().to_pybytes(), mimetype, filename
+
+def format_export(applications, export_format):
+    """Wrap exported rows as CSV text or a JSON list, with a download filename"""
+    if export_format == 'csv':
+        import csv
+        
+        output = io.StringIO()
+        if applications:
+            writer = csv.DictWriter(output, fieldnames=applications[0].keys())
+            writer.writeheader()
+            writer.writerows(applications)
+        
+        return {
+            'success': True,
+            'data': output.getvalue(),
+            'filename': f'applications_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv',
+            'content_type': 'text/csv'
+        }
+    # JSON format
+    return {
+        'success': True,
+        'data': applications,
+        'filename': f'applications_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json',
+        'content_type': 'application/json'
+    }
+
 @app.route('/api/admin/export', methods=['POST'])
+@admission_controlled(admin_gate)
 def export_applications():
-    """Export applications to CSV"""
+    """Export applications as CSV, JSON, Parquet or Arrow"""
     if not notion_client:
         return jsonify({'success': False, 'error': 'Notion not configured'})
     
     try:
-        data = request.get_json()
+        data = request.get_json() or {}
         export_format = data.get('format', 'csv')
-        filter_status = data.get('status_filter', '')
+        try:
+            columns = parse_export_columns(data)
+            query_filter = build_export_filter(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        if export_format in COLUMNAR_FORMATS and load_arrow_modules() is None:
+            return jsonify({'success': False, 'error': f'{export_format} export requires the pyarrow package'}), 400
         
         db_result = get_or_create_database()
         if not db_result['success']:
@@ -1168,79 +5074,19 @@ def export_applications():
         
         database_id = db_result['database_id']
         
-        # Query database with optional status filter
-        query_filter = None
-        if filter_status:
-            query_filter = {
-                "property": "Status",
-                "select": {
-                    "equals": filter_status
-                }
-            }
-        
-        response = notion_client.databases.query(
-            database_id=database_id,
+        # Filters and column projection are pushed into the Notion query
+        pages = query_database_pages(
+            database_id,
             filter=query_filter,
-            sorts=[
-                {
-                    "property": "Submission Date",
-                    "direction": "descending"
-                }
-            ]
+            sorts=NEWEST_FIRST,
+            filter_properties=projected_property_ids(database_id, columns)
         )
+        applications = export_decoder(columns)(pages)
         
-        applications = []
-        for page in response['results']:
-            try:
-                props = page['properties']
-                
-                app_data = {
-                    'Application ID': get_notion_text(props.get('Application ID', {})),
-                    'Student Name': get_notion_text(props.get('Student Name', {})),
-                    'Email': get_notion_email(props.get('Email', {})),
-                    'Phone': get_notion_phone(props.get('Phone', {})),
-                    'Date of Birth': get_notion_date(props.get('Date of Birth', {})),
-                    'Address': get_notion_text(props.get('Address', {})),
-                    'Guardian Name': get_notion_text(props.get('Guardian Name', {})),
-                    'Guardian Phone': get_notion_phone(props.get('Guardian Phone', {})),
-                    'Relation': get_notion_select(props.get('Relation', {})),
-                    'Room Number': get_notion_text(props.get('Room Number', {})),
-                    'Admission Date': get_notion_date(props.get('Admission Date', {})),
-                    'Stay Duration': get_notion_text(props.get('Stay Duration', {})),
-                    'Emergency Contact': get_notion_phone(props.get('Emergency Contact', {})),
-                    'Status': get_notion_select(props.get('Status', {})) or 'Pending Review',
-                    'Submission Date': get_notion_date(props.get('Submission Date', {}))
-                }
-                applications.append(app_data)
-            except Exception as e:
-                print(f"Error processing application for export: {e}")
-                continue
-        
-        if export_format == 'csv':
-            import csv
-            import io
-            
-            output = io.StringIO()
-            if applications:
-                writer = csv.DictWriter(output, fieldnames=applications[0].keys())
-                writer.writeheader()
-                writer.writerows(applications)
-            
-            response_data = {
-                'success': True,
-                'data': output.getvalue(),
-                'filename': f'applications_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv',
-                'content_type': 'text/csv'
-            }
-        else:  # JSON format
-            response_data = {
-                'success': True,
-                'data': applications,
-                'filename': f'applications_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json',
-                'content_type': 'application/json'
-            }
-        
-        return jsonify(response_data)
+        if export_format in COLUMNAR_FORMATS:
+            content, mimetype, filename = export_columnar(applications, columns, export_format)
+            return Response(content, mimetype=mimetype, headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+        return jsonify(format_export(applications, export_format))
         
     except Exception as e:
         print(f"Error exporting applications: {e}")
@@ -1260,21 +5106,29 @@ def bulk_update_applications():
         if not application_ids or not new_status:
             return jsonify({'success': False, 'error': 'Application IDs and status are required'}), 400
         
+        properties = {"Status": FIELD_ENCODERS["Status"](new_status)}
+        invalid = invalid_property("Status", properties["Status"])
+        if invalid:
+            return jsonify({'success': False, 'error': invalid}), 400
+        
         updated_count = 0
         errors = []
+        conflicts = []
         
         for app_id in application_ids:
             try:
-                notion_client.pages.update(
-                    page_id=app_id,
-                    properties={
-                        "Status": {
-                            "select": {
-                                "name": new_status
-                            }
-                        }
-                    }
-                )
+                problem = page_update_problem(app_id)
+                if problem:
+                    errors.append(f"Failed to update {app_id}: {problem[0]}")
+                    continue
+                # Each approval holds its bed at once, so later ones in the batch see it
+                if new_status == OCCUPYING_STATUS and not data.get('force'):
+                    conflict = reserve_room(app_id)
+                    if conflict:
+                        conflicts.append({'application_id': app_id, **conflict})
+                        errors.append(f"Failed to update {app_id}: {room_conflict_message(conflict)}")
+                        continue
+                update_notion_page(app_id, properties)
                 updated_count += 1
             except Exception as e:
                 errors.append(f"Failed to update {app_id}: {str(e)}")
@@ -1283,67 +5137,371 @@ def bulk_update_applications():
             'success': True,
             'updated_count': updated_count,
             'total_count': len(application_ids),
-            'errors': errors
+            'errors': errors,
+            'conflicts': conflicts
         })
         
     except Exception as e:
         print(f"Error in bulk update: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-def get_notion_text(prop):
-    """Extract text from Notion property"""
+@app.route('/api/admin/journal', methods=['GET'])
+def get_submission_journal():
+    """Submissions waiting to reach Notion, plus any Notion rejected"""
     try:
-        if prop.get('type') == 'title':
-            return prop.get('title', [{}])[0].get('text', {}).get('content', '')
-        elif prop.get('type') == 'rich_text':
-            return prop.get('rich_text', [{}])[0].get('text', {}).get('content', '')
-        return ''
-    except (IndexError, KeyError):
-        return ''
+        return jsonify({'success': True, **submission_journal.backlog(request.args.get('limit', 50, type=int))})
+    except Exception as e:
+        print(f"Error reading submission journal: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
 
-def get_notion_email(prop):
-    """Extract email from Notion property"""
-    try:
-        return prop.get('email', '')
-    except KeyError:
-        return ''
+@app.route('/api/admin/journal/<int:entry_id>/retry', methods=['POST'])
+def retry_journal_entry(entry_id):
+    """Requeue a failed journal entry"""
+    if not submission_journal.retry(entry_id):
+        return jsonify({'success': False, 'error': 'No failed journal entry with that ID'}), 404
+    return jsonify({'success': True, 'message': 'Entry requeued for replay'})
 
-def get_notion_phone(prop):
-    """Extract phone from Notion property"""
-    try:
-        return prop.get('phone_number', '')
-    except KeyError:
-        return ''
+@app.route('/api/admin/profiles', methods=['GET'])
+def list_profiles():
+    """Recent request profiles with their top hot spots"""
+    limit = request.args.get('limit', 20, type=int)
+    profiles = []
+    for profile_id in list_profile_ids()[:max(1, limit)]:
+        try:
+            with open(os.path.join(PROFILE_DIR, f"{profile_id}.json")) as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return jsonify({
+        'success': True,
+        'enabled': PROFILING_ENABLED,
+        'sample_rate': PROFILE_SAMPLE_RATE,
+        'profiles': profiles
+    })
 
-def get_notion_date(prop):
-    """Extract date from Notion property"""
-    try:
-        date_obj = prop.get('date', {})
-        if date_obj:
-            return date_obj.get('start', '')
-        return ''
-    except KeyError:
-        return ''
+@app.route('/api/admin/profiles/<profile_id>', methods=['GET'])
+def download_profile(profile_id):
+    """Download a raw pstats dump (open with `python -m pstats` or snakeviz)"""
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.prof")
+    if not PROFILE_ID_PATTERN.match(profile_id) or not os.path.exists(path):
+        abort(404)
+    return send_file(os.path.abspath(path), mimetype='application/octet-stream', as_attachment=True, download_name=f"{profile_id}.prof")
 
-def get_notion_select(prop):
-    """Extract select value from Notion property"""
-    try:
-        select_obj = prop.get('select', {})
-        if select_obj:
-            return select_obj.get('name', '')
-        return ''
-    except KeyError:
-        return ''
+@app.route('/api/uploads', methods=['POST'])
+def create_upload():
+    """Start a resumable attachment upload: {"kind", "mime", "size"}"""
+    data = request.get_json(silent=True) or {}
+    status, error = upload_store.create(data.get('kind'), data.get('mime'), data.get('size'))
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+    return jsonify({'success': True, **status}), 201
+
+@app.route('/api/uploads/<upload_id>', methods=['PATCH'])
+def append_upload(upload_id):
+    """Append the request body at the Upload-Offset header"""
+    offset = request.headers.get('Upload-Offset', type=int)
+    if offset is None:
+        return jsonify({'success': False, 'error': 'Upload-Offset header is required'}), 400
+    if request.content_length is not None and request.content_length > UPLOAD_CHUNK_SIZE * 4:
+        return jsonify({'success': False, 'error': 'Chunk is too large'}), 413
+    status, error, code = upload_store.append(upload_id, offset, request.get_data(cache=False))
+    if error:
+        return jsonify({'success': False, 'error': error, **(status or {})}), code
+    return jsonify({'success': True, **status})
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    """Upload progress, for resuming after a dropped connection"""
+    status = upload_store.status(upload_id)
+    if status is None:
+        return jsonify({'success': False, 'error': 'Upload not found or expired'}), 404
+    return jsonify({'success': True, **status})
+
+@app.route('/api/submission-config', methods=['GET'])
+def submission_config():
+    """What the form needs to render its own PDF for this hostel"""
+    return jsonify({
+        'success': True,
+        'client_pdf': CLIENT_PDF,
+        'client_pdf_max_bytes': CLIENT_PDF_MAX_BYTES,
+        'max_request_bytes': app.config['MAX_CONTENT_LENGTH'],
+        'hostel_name': HOSTEL_NAME,
+        'hostel_contact': HOSTEL_CONTACT
+    })
+
+@app.route('/api/admin/memory', methods=['GET'])
+def memory_report():
+    """Submission memory use by payload shape, plus the worst traced submissions"""
+    return jsonify({'success': True, 'enabled': MEMORY_ACCOUNTING, **memory_accountant.report()})
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'ok', 'message': 'Python backend is running'})
+    return jsonify({
+        'status': 'ok',
+        'message': 'Python backend is running',
+        'admission': {gate.name: gate.stats() for gate in (submit_gate, admin_gate)},
+        'write_queue': notion_write_queue.stats()
+    })
+
+# Static asset pipeline configuration
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSET_DIRECTORIES = ('css', 'js', 'assets')
+ASSET_PAGES = ('index.html', 'admin.html')
+ASSET_CACHE_DIR = os.getenv('ASSET_CACHE_DIR', os.path.join(BASE_DIR, '.asset-cache'))
+ASSET_CONTENT_TYPES = {
+    '.js': 'application/javascript',
+    '.css': 'text/css',
+    '.svg': 'image/svg+xml',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.ico': 'image/x-icon',
+    '.woff2': 'font/woff2',
+    '.html': 'text/html'
+}
+COMPRESSIBLE_TYPES = {'application/javascript', 'text/css', 'image/svg+xml', 'text/html'}
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+class AssetPipeline:
+    """Content-hashed, precompressed static assets.
+
+    Every file under ASSET_DIRECTORIES gets a fingerprinted URL
+    (``js/app.<hash>.js``) and the HTML pages are rewritten to reference
+    those URLs. gzip/brotli variants are built on first request (or ahead of
+    time with ``python app.py build-assets``) and persisted by content hash in
+    ASSET_CACHE_DIR, so restarts and sibling workers reuse them.
+    """
+
+    def __init__(self, root, directories, pages, cache_dir):
+        self.root = root
+        self.directories = directories
+        self.pages = pages
+        self.cache_dir = cache_dir
+        self.assets = {}
+        self._variants = {}
+        self._lock = threading.Lock()
+
+    def build_manifest(self):
+        """Hash every asset and rewrite the HTML pages to fingerprinted URLs"""
+        assets = {}
+        for directory in self.directories:
+            for dirpath, _, filenames in os.walk(os.path.join(self.root, directory)):
+                for filename in sorted(filenames):
+                    content_type = ASSET_CONTENT_TYPES.get(os.path.splitext(filename)[1].lower())
+                    if not content_type or content_type == 'text/html':
+                        continue
+                    full_path = os.path.join(dirpath, filename)
+                    logical = os.path.relpath(full_path, self.root).replace(os.sep, '/')
+                    with open(full_path, 'rb') as f:
+                        data = f.read()
+                    entry = self._make_entry(logical, data, content_type)
+                    base, ext = os.path.splitext(logical)
+                    entry['hashed_path'] = f"{base}.{entry['digest'][:12]}{ext}"
+                    assets[logical] = entry
+                    assets[entry['hashed_path']] = entry
+
+        references = {path: entry['hashed_path'] for path, entry in assets.items() if path != entry['hashed_path']}
+        pattern = re.compile(r'((?:src|href)=")(/?)(' + '|'.join(re.escape(path) for path in sorted(references, key=len, reverse=True)) + r')(")') if references else None
+        for page in self.pages:
+            with open(os.path.join(self.root, page), 'r', encoding='utf-8') as f:
+                html = f.read()
+            if pattern:
+                # Relative URLs, so the pages also work under a tenant path prefix
+                html = pattern.sub(lambda m: m.group(1) + references[m.group(3)] + m.group(4), html)
+            assets[page] = self._make_entry(page, html.encode('utf-8'), 'text/html')
+
+        with self._lock:
+            self.assets = assets
+            self._variants = {}
+        return assets
+
+    def _make_entry(self, path, data, content_type):
+        return {
+            'path': path,
+            'hashed_path': None,
+            'data': data,
+            'digest': hashlib.sha256(data).hexdigest(),
+            'content_type': content_type,
+            'compressible': content_type in COMPRESSIBLE_TYPES
+        }
+
+    def lookup(self, path):
+        """Return (entry, immutable) for a request path, or (None, False)"""
+        entry = self.assets.get(path)
+        if entry is None:
+            return None, False
+        return entry, entry['hashed_path'] == path
+
+    def variant(self, entry, encoding):
+        """Return the entry body in the given content encoding"""
+        if encoding == 'identity' or not entry['compressible']:
+            return entry['data']
+        key = (entry['digest'], encoding)
+        body = self._variants.get(key)
+        if body is not None:
+            return body
+        cache_path = os.path.join(self.cache_dir, f"{entry['digest']}.{'br' if encoding == 'br' else 'gz'}")
+        try:
+            with open(cache_path, 'rb') as f:
+                body = f.read()
+        except OSError:
+            if encoding == 'br':
+                body = brotli.compress(entry['data'], quality=11)
+            else:
+                body = gzip.compress(entry['data'], compresslevel=9, mtime=0)
+            self._persist(cache_path, body)
+        # Only keep variants that actually save bytes
+        if len(body) >= len(entry['data']):
+            body = entry['data']
+        with self._lock:
+            self._variants[key] = body
+        return body
+
+    def _persist(self, cache_path, body):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"Failed to persist compressed asset: {e}")
+
+    def build_variants(self):
+        """Precompute every compressed variant (build step)"""
+        encodings = ['gzip'] + (['br'] if brotli else [])
+        built = 0
+        for path, entry in self.assets.items():
+            if path == entry['hashed_path'] or not entry['compressible']:
+                continue
+            for encoding in encodings:
+                self.variant(entry, encoding)
+                built += 1
+        return built
+
+def negotiate_encoding(accept_encoding):
+    """Pick br, gzip or identity from an Accept-Encoding header"""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        token, _, params = part.strip().partition(';')
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token] = quality
+    wildcard = accepted.get('*', 0.0)
+    for encoding in (('br', 'gzip') if brotli else ('gzip',)):
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return 'identity'
+
+asset_pipeline = AssetPipeline(BASE_DIR, ASSET_DIRECTORIES, ASSET_PAGES, ASSET_CACHE_DIR)
+asset_pipeline.build_manifest()
+record_boot_phase('asset manifest')
+
+def serve_asset(path):
+    """Serve a manifest entry with negotiated encoding and cache headers"""
+    entry, immutable = asset_pipeline.lookup(path)
+    if entry is None:
+        abort(404)
+
+    etag = entry['digest'][:32]
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding')) if entry['compressible'] else 'identity'
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        body = asset_pipeline.variant(entry, encoding)
+        response = Response(body, mimetype=entry['content_type'])
+        if body is not entry['data']:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+    if entry['compressible']:
+        response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+@app.route('/<path:filename>', methods=['GET', 'HEAD'])
+def static_asset(filename):
+    """Serve fingerprinted assets; anything outside the manifest is a 404"""
+    return serve_asset(filename)
 
 @app.route('/')
 def index():
-    return send_file('index.html')
+    return serve_asset('index.html')
+
+# Background warmup: verify the Notion database and import the PDF stack
+# off the request path so the first submission does not pay for it
+STARTUP_WARMUP = os.getenv('STARTUP_WARMUP', '1') == '1'
+
+def warmup(resume_journal=True):
+    """Run deferred initialization ahead of the first request"""
+    started = time.perf_counter()
+    try:
+        load_pdf_modules()
+        if notion_client and NOTION_DATABASE_ID:
+            if resume_journal:
+                submission_journal.resume()
+                notion_write_queue.resume()
+            result = get_or_create_database()
+            if not result['success']:
+                print(f"Warmup could not resolve Notion database: {result['error']}")
+            else:
+                # The submit path only reads the derived indexes, so build them before traffic
+                ensure_application_indexes()
+    except Exception as e:
+        print(f"Warmup failed: {e}")
+    record_lazy_load('warmup', started)
+
+# Pre-fork servers (serve.py) import and warm the app once in the master, then
+# fork workers; connections and threads do not survive the fork
+BACKGROUND_THREAD_NAMES = ('thumbnails', 'upload-prepare', 'telegram-deferred')
+
+def reinitialize_worker():
+    """Give a freshly forked worker its own clients, pools, replayer and write-behind sender"""
+    global telegram_session
+    if notion_client:
+        notion_client.reset()
+    telegram_session = new_telegram_session()
+    if notion_client and NOTION_DATABASE_ID:
+        submission_journal.resume()
+        notion_write_queue.resume()
+
+def drain_background_work(timeout=10):
+    """Flush queued Notion writes and let thumbnails, upload preparation and deferred sends finish"""
+    deadline = time.monotonic() + timeout
+    notion_write_queue.drain(timeout)
+    for thread in threading.enumerate():
+        if thread.name in BACKGROUND_THREAD_NAMES:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+@app.route('/api/admin/startup-report', methods=['GET'])
+def startup_report():
+    """Report where boot time went and what was initialized lazily"""
+    return jsonify({
+        'success': True,
+        'boot': BOOT_TIMINGS,
+        'boot_total_ms': round(sum(phase['ms'] for phase in BOOT_TIMINGS), 2),
+        'lazy_loads': LAZY_LOAD_TIMINGS,
+        'warmup_enabled': STARTUP_WARMUP
+    })
+
+record_boot_phase('routes')
+print("Startup: " + ", ".join(f"{phase['phase']} {phase['ms']}ms" for phase in BOOT_TIMINGS))
+
+if STARTUP_WARMUP:
+    threading.Thread(target=warmup, name='startup-warmup', daemon=True).start()
 
 # Entry point for Vercel - app will be imported directly
 
 if __name__ == '__main__':
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == 'build-assets':
+        print(f"Built {asset_pipeline.build_variants()} compressed asset variants in {ASSET_CACHE_DIR}")
+        sys.exit(0)
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
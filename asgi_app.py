@@ -0,0 +1,131 @@
+"""Async (ASGI) mode of the hostel admission service.
+
+Run with any ASGI server, for example:
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+
+Every request is handled by the Flask app from app.py in a thread pool, so
+the event loop never blocks and there is one implementation of each route:
+the same admission gates, deadlines, caches, indexes and write-behind queue
+as under gunicorn. Request bodies are read with the Flask app's
+MAX_CONTENT_LENGTH enforced, so an oversized upload is refused (413) before
+it is buffered.
+"""
+import asyncio
+import io
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import app as service
+
+# Requests wait for their admission gate inside a worker thread, so the pool
+# must hold both gates and their queues (the same sizing as serve.py's threads)
+ASGI_BLOCKING_WORKERS = int(os.getenv('ASGI_BLOCKING_WORKERS', '0')) or (
+    sum(gate.limit + gate.queue_size for gate in (service.submit_gate, service.admin_gate)) + 4
+)
+ASGI_DRAIN_TIMEOUT = float(os.getenv('ASGI_DRAIN_TIMEOUT', '10'))
+
+blocking_executor = ThreadPoolExecutor(max_workers=ASGI_BLOCKING_WORKERS, thread_name_prefix='wsgi')
+
+async def run_blocking(func, *args):
+    """Run a synchronous callable off the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(blocking_executor, func, *args)
+
+def call_wsgi(scope, body):
+    """Run one request through the Flask WSGI app and collect the response"""
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': (scope.get('server') or ('localhost', 80))[0],
+        'SERVER_PORT': str((scope.get('server') or ('localhost', 80))[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        'CONTENT_LENGTH': str(len(body))
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = f'HTTP_{name}'
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = headers
+
+    result = service.app.wsgi_app(environ, start_response)
+    try:
+        content = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return response['status'], response['headers'], content
+
+async def read_body(scope, receive, limit):
+    """The request body, or None once it is known to exceed ``limit`` bytes"""
+    declared = next((value for name, value in scope['headers'] if name == b'content-length'), None)
+    if limit is not None and declared is not None and declared.isdigit() and int(declared) > limit:
+        return None
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return b''.join(chunks)
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if limit is not None and size > limit:
+            return None
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+async def send_response(send, status, headers, content):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+    })
+    await send({'type': 'http.response.body', 'body': content})
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            # As serve.py's worker_exit: flush queued Notion writes and background work
+            await run_blocking(service.drain_background_work, ASGI_DRAIN_TIMEOUT)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    """ASGI application entry point"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    body = await read_body(scope, receive, service.app.config.get('MAX_CONTENT_LENGTH'))
+    if body is None:
+        content = json.dumps({'success': False, 'error': 'Request body too large'}).encode('utf-8')
+        await send_response(send, 413, [('Content-Type', 'application/json'), ('Connection', 'close')], content)
+        return
+    status, headers, content = await run_blocking(call_wsgi, scope, body)
+    await send_response(send, status, headers, content)
@@ -13,6 +13,7 @@ class AdminPanel {
         this.sortDirection = 'desc';
         this.sortField = 'submission_date';
         this.searchDebounceTimer = null;
+        this.searchRequestId = 0;
         this.currentEditingApplication = null;
         
         this.init();
@@ -116,6 +117,11 @@ class AdminPanel {
             this.showExportModal();
         });
 
+        // Analytics date range
+        document.getElementById('applyDateRange').addEventListener('click', () => {
+            this.loadAnalytics();
+        });
+
         // Select all checkbox
         document.getElementById('selectAll').addEventListener('change', (e) => {
             this.toggleSelectAll(e.target.checked);
@@ -237,7 +243,7 @@ class AdminPanel {
         this.showLoadingState();
         
         try {
-            const response = await fetch('/api/admin/applications');
+            const response = await fetch('api/admin/applications');
             const data = await response.json();
             
             if (data.success) {
@@ -348,50 +354,26 @@ class AdminPanel {
         }
     }
 
-    searchApplications(query) {
+    async searchApplications(query) {
+        const requestId = ++this.searchRequestId;
+        
         if (!query.trim()) {
             this.filteredApplications = [...this.applications];
         } else {
-            const searchTerm = query.toLowerCase();
-            this.filteredApplications = this.applications.filter(app => {
-                // Search by student name
-                const studentName = (app.student_name || '').toLowerCase();
-                
-                // Search by room number
-                const roomNumber = (app.room_number || '').toLowerCase();
-                
-                // Search by phone numbers (student phone, guardian phone, emergency contact)
-                const studentPhone = (app.phone || '').replace(/\D/g, ''); // Remove non-digits
-                const guardianPhone = (app.guardian_phone || '').replace(/\D/g, '');
-                const emergencyContact = (app.emergency_contact || '').replace(/\D/g, '');
-                const searchPhone = query.replace(/\D/g, ''); // Remove non-digits from search
-                
-                // Search by email
-                const email = (app.email || '').toLowerCase();
-                
-                // Search by application ID
-                const applicationId = (app.application_id || '').toLowerCase();
-                
-                // Search by guardian name
-                const guardianName = (app.guardian_name || '').toLowerCase();
+            try {
+                // Ranked server-side search covers applications beyond the loaded list
+                const response = await fetch(`api/admin/search?q=${encodeURIComponent(query.trim())}&per_page=200`);
+                const data = await response.json();
                 
-                // Search by status
-                const status = (app.status || '').toLowerCase();
+                if (requestId !== this.searchRequestId) return;
+                if (!data.success) throw new Error(data.error);
                 
-                return (
-                    studentName.includes(searchTerm) ||
-                    roomNumber.includes(searchTerm) ||
-                    email.includes(searchTerm) ||
-                    applicationId.includes(searchTerm) ||
-                    guardianName.includes(searchTerm) ||
-                    status.includes(searchTerm) ||
-                    (searchPhone && (
-                        studentPhone.includes(searchPhone) ||
-                        guardianPhone.includes(searchPhone) ||
-                        emergencyContact.includes(searchPhone)
-                    ))
-                );
-            });
+                this.filteredApplications = data.results;
+            } catch (error) {
+                if (requestId !== this.searchRequestId) return;
+                console.error('Server search failed, filtering locally:', error);
+                this.filteredApplications = this.filterApplicationsLocally(query);
+            }
         }
         
         this.currentPage = 1;
@@ -399,6 +381,49 @@ class AdminPanel {
         this.showSearchResults(query);
     }
     
+    filterApplicationsLocally(query) {
+        const searchTerm = query.toLowerCase();
+        return this.applications.filter(app => {
+            // Search by student name
+            const studentName = (app.student_name || '').toLowerCase();
+            
+            // Search by room number
+            const roomNumber = (app.room_number || '').toLowerCase();
+            
+            // Search by phone numbers (student phone, guardian phone, emergency contact)
+            const studentPhone = (app.phone || '').replace(/\D/g, ''); // Remove non-digits
+            const guardianPhone = (app.guardian_phone || '').replace(/\D/g, '');
+            const emergencyContact = (app.emergency_contact || '').replace(/\D/g, '');
+            const searchPhone = query.replace(/\D/g, ''); // Remove non-digits from search
+            
+            // Search by email
+            const email = (app.email || '').toLowerCase();
+            
+            // Search by application ID
+            const applicationId = (app.application_id || '').toLowerCase();
+            
+            // Search by guardian name
+            const guardianName = (app.guardian_name || '').toLowerCase();
+            
+            // Search by status
+            const status = (app.status || '').toLowerCase();
+            
+            return (
+                studentName.includes(searchTerm) ||
+                roomNumber.includes(searchTerm) ||
+                email.includes(searchTerm) ||
+                applicationId.includes(searchTerm) ||
+                guardianName.includes(searchTerm) ||
+                status.includes(searchTerm) ||
+                (searchPhone && (
+                    studentPhone.includes(searchPhone) ||
+                    guardianPhone.includes(searchPhone) ||
+                    emergencyContact.includes(searchPhone)
+                ))
+            );
+        });
+    }
+    
     showSearchResults(query) {
         const searchResults = document.getElementById('searchResults');
         const searchResultsText = document.getElementById('searchResultsText');
@@ -662,7 +687,7 @@ class AdminPanel {
 
     async updateDashboard() {
         try {
-            const response = await fetch('/api/admin/stats');
+            const response = await fetch('api/admin/stats');
             const data = await response.json();
             
             if (data.success) {
@@ -749,7 +774,7 @@ class AdminPanel {
 
     async viewApplication(applicationId) {
         try {
-            const response = await fetch(`/api/admin/applications/${applicationId}`);
+            const response = await fetch(`api/admin/applications/${applicationId}`);
             const data = await response.json();
             
             if (data.success) {
@@ -765,7 +790,7 @@ class AdminPanel {
 
     async editApplication(applicationId) {
         try {
-            const response = await fetch(`/api/admin/applications/${applicationId}`);
+            const response = await fetch(`api/admin/applications/${applicationId}`);
             const data = await response.json();
             
             if (data.success) {
@@ -886,6 +911,15 @@ class AdminPanel {
                                     <input type="text" value="${this.formatDate(application.submission_date)}" readonly>
                                 </div>
                             </div>
+                            
+                            ${isEditing ? '' : `
+                            <div class="form-section">
+                                <h3>Documents</h3>
+                                <div id="applicationThumbnails" class="thumbnail-strip">
+                                    <span class="thumbnail-empty">Loading documents...</span>
+                                </div>
+                            </div>
+                            `}
                         </div>
                     </form>
                 </div>
@@ -907,6 +941,36 @@ class AdminPanel {
 
         modal.style.display = 'flex';
         document.body.style.overflow = 'hidden';
+        
+        if (!isEditing) {
+            this.loadThumbnails(application.id);
+        }
+    }
+
+    async loadThumbnails(applicationId) {
+        const container = document.getElementById('applicationThumbnails');
+        if (!container) return;
+        
+        const labels = { photo: 'Student Photo', id_proof: 'ID Proof', signature: 'Signature' };
+        try {
+            const response = await fetch(`api/admin/applications/${applicationId}/thumbs`);
+            const data = await response.json();
+            
+            if (!data.success || data.thumbnails.length === 0) {
+                container.innerHTML = '<span class="thumbnail-empty">No document previews available</span>';
+                return;
+            }
+            
+            container.innerHTML = data.thumbnails.map(thumb => `
+                <figure class="thumbnail-item">
+                    <img src="${thumb.url}" width="${thumb.width}" height="${thumb.height}" loading="lazy" alt="${labels[thumb.kind] || 'Document'}">
+                    <figcaption>${labels[thumb.kind] || 'Document'}</figcaption>
+                </figure>
+            `).join('');
+        } catch (error) {
+            console.error('Error loading thumbnails:', error);
+            container.innerHTML = '<span class="thumbnail-empty">Failed to load document previews</span>';
+        }
     }
 
     async saveApplication() {
@@ -917,7 +981,7 @@ class AdminPanel {
         const data = Object.fromEntries(formData);
 
         try {
-            const response = await fetch(`/api/admin/applications/${this.currentEditingApplication.id}`, {
+            const response = await fetch(`api/admin/applications/${this.currentEditingApplication.id}`, {
                 method: 'PUT',
                 headers: {
                     'Content-Type': 'application/json'
@@ -951,7 +1015,7 @@ class AdminPanel {
 
     async updateApplicationStatus(applicationId, newStatus) {
         try {
-            const response = await fetch(`/api/admin/applications/${applicationId}/status`, {
+            const response = await fetch(`api/admin/applications/${applicationId}/status`, {
                 method: 'PATCH',
                 headers: {
                     'Content-Type': 'application/json'
@@ -980,7 +1044,7 @@ class AdminPanel {
         }
 
         try {
-            const response = await fetch(`/api/admin/applications/${applicationId}`, {
+            const response = await fetch(`api/admin/applications/${applicationId}`, {
                 method: 'DELETE'
             });
 
@@ -1011,7 +1075,7 @@ class AdminPanel {
         }
 
         try {
-            const response = await fetch('/api/admin/bulk-update', {
+            const response = await fetch('api/admin/bulk-update', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
@@ -1028,6 +1092,9 @@ class AdminPanel {
                 this.showNotification(`${result.updated_count} application(s) updated successfully`, 'success');
                 if (result.errors.length > 0) {
                     console.warn('Some updates failed:', result.errors);
+                    if (result.conflicts && result.conflicts.length > 0) {
+                        this.showNotification(`${result.conflicts.length} application(s) skipped: room already full`, 'warning');
+                    }
                 }
                 this.selectedApplications.clear();
                 this.updateBulkActionBar();
@@ -1058,7 +1125,7 @@ class AdminPanel {
 
         for (const applicationId of this.selectedApplications) {
             try {
-                const response = await fetch(`/api/admin/applications/${applicationId}`, {
+                const response = await fetch(`api/admin/applications/${applicationId}`, {
                     method: 'DELETE'
                 });
 
@@ -1108,6 +1175,8 @@ class AdminPanel {
                             <select id="exportFormat">
                                 <option value="csv">CSV (Excel Compatible)</option>
                                 <option value="json">JSON</option>
+                                <option value="parquet">Parquet (columnar, for analysis)</option>
+                                <option value="arrow">Arrow IPC (columnar)</option>
                             </select>
                         </div>
                         <div class="form-group">
@@ -1119,6 +1188,11 @@ class AdminPanel {
                                 <option value="Rejected">Rejected Only</option>
                             </select>
                         </div>
+                        <div class="form-group">
+                            <label>Submitted Between</label>
+                            <input type="date" id="exportSubmissionFrom">
+                            <input type="date" id="exportSubmissionTo">
+                        </div>
                         <div class="export-info">
                             <p>Export will include all application details including student information, guardian details, and submission data.</p>
                         </div>
@@ -1140,19 +1214,34 @@ class AdminPanel {
     async performExport() {
         const format = document.getElementById('exportFormat').value;
         const statusFilter = document.getElementById('exportStatusFilter').value;
+        const submissionFrom = document.getElementById('exportSubmissionFrom').value;
+        const submissionTo = document.getElementById('exportSubmissionTo').value;
+        const columnar = format === 'parquet' || format === 'arrow';
 
         try {
-            const response = await fetch('/api/admin/export', {
+            const response = await fetch('api/admin/export', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
                 },
                 body: JSON.stringify({
                     format: format,
-                    status_filter: statusFilter
+                    status_filter: statusFilter,
+                    submission_from: submissionFrom,
+                    submission_to: submissionTo
                 })
             });
 
+            // Columnar formats come back as a binary file rather than JSON
+            if (columnar && response.ok) {
+                const disposition = response.headers.get('Content-Disposition') || '';
+                const match = disposition.match(/filename="([^"]+)"/);
+                this.downloadBlob(await response.blob(), match ? match[1] : `applications_export.${format}`);
+                this.showNotification('Export completed successfully', 'success');
+                this.closeModal();
+                return;
+            }
+
             const result = await response.json();
             
             if (result.success) {
@@ -1163,14 +1252,7 @@ class AdminPanel {
                     type: result.content_type
                 });
 
-                const url = URL.createObjectURL(blob);
-                const a = document.createElement('a');
-                a.href = url;
-                a.download = result.filename;
-                document.body.appendChild(a);
-                a.click();
-                document.body.removeChild(a);
-                URL.revokeObjectURL(url);
+                this.downloadBlob(blob, result.filename);
 
                 this.showNotification('Export completed successfully', 'success');
                 this.closeModal();
@@ -1183,9 +1265,20 @@ class AdminPanel {
         }
     }
 
+    downloadBlob(blob, filename) {
+        const url = URL.createObjectURL(blob);
+        const a = document.createElement('a');
+        a.href = url;
+        a.download = filename;
+        document.body.appendChild(a);
+        a.click();
+        document.body.removeChild(a);
+        URL.revokeObjectURL(url);
+    }
+
     async testDatabaseConnection() {
         try {
-            const response = await fetch('/api/admin/test-database');
+            const response = await fetch('api/admin/test-database');
             const result = await response.json();
             
             if (result.success) {
@@ -1217,9 +1310,78 @@ class AdminPanel {
         document.getElementById(tab).classList.add('active');
     }
 
-    loadAnalytics() {
-        // Placeholder for analytics loading
-        console.log('Loading analytics...');
+    async loadAnalytics() {
+        // Charts come from server-side rollups, so cost does not grow with history
+        const params = new URLSearchParams({ granularity: 'day' });
+        const startDate = document.getElementById('startDate').value;
+        const endDate = document.getElementById('endDate').value;
+        if (startDate) params.set('from', startDate);
+        if (endDate) params.set('to', endDate);
+
+        try {
+            const response = await fetch(`api/admin/stats/timeseries?${params}`);
+            const data = await response.json();
+
+            if (!data.success) {
+                this.showNotification('Failed to load analytics: ' + data.error, 'error');
+                return;
+            }
+            this.renderAnalytics(data.series);
+        } catch (error) {
+            console.error('Error loading analytics:', error);
+        }
+    }
+
+    renderAnalytics(series) {
+        if (typeof Chart === 'undefined') return;
+
+        const labels = series.map(bucket => bucket.bucket);
+        const metric = name => series.map(bucket => bucket.metrics[name] || 0);
+        const trends = {
+            labels: labels,
+            datasets: [
+                { label: 'Submissions', data: metric('submissions'), borderColor: '#2563eb', fill: false },
+                { label: 'Approved', data: metric('entered:Approved'), borderColor: '#059669', fill: false },
+                { label: 'Rejected', data: metric('entered:Rejected'), borderColor: '#dc2626', fill: false }
+            ]
+        };
+
+        // Sum the gender breakdown over the selected range
+        const genders = {};
+        series.forEach(bucket => {
+            Object.entries(bucket.metrics).forEach(([name, count]) => {
+                if (name.startsWith('gender:')) {
+                    const gender = name.slice('gender:'.length);
+                    genders[gender] = (genders[gender] || 0) + count;
+                }
+            });
+        });
+        const distribution = {
+            labels: Object.keys(genders),
+            datasets: [{
+                data: Object.values(genders),
+                backgroundColor: ['#2563eb', '#db2777', '#6b7280', '#d97706']
+            }]
+        };
+
+        this.updateChart('trendsChart', 'line', trends);
+        this.updateChart('distributionChart', 'doughnut', distribution);
+    }
+
+    updateChart(canvasId, type, data) {
+        if (this.charts[canvasId]) {
+            this.charts[canvasId].data = data;
+            this.charts[canvasId].update();
+            return;
+        }
+        const ctx = document.getElementById(canvasId);
+        if (ctx) {
+            this.charts[canvasId] = new Chart(ctx, {
+                type: type,
+                data: data,
+                options: { responsive: true, maintainAspectRatio: false }
+            });
+        }
     }
 
     loadStudents() {
@@ -370,6 +370,9 @@ class HostelAdmissionApp {
         const countElement = document.getElementById('idProofCount');
         const countNumber = document.getElementById('countNumber');
         
+        // Pre-upload new ID proofs in the background (already started ones are skipped)
+        (this.formData.idProofs || []).forEach(proof => window.attachmentUploader?.start(proof, 'id_proof'));
+        
         if (!this.formData.idProofs || this.formData.idProofs.length === 0) {
             container.innerHTML = '';
             countElement.style.display = 'none';
@@ -465,7 +468,7 @@ class HostelAdmissionApp {
             console.log('Starting form submission process...');
             console.log('Form data:', this.formData);
             
-            // Submit to Telegram via Python backend (PDF will be generated server-side)
+            // Submit to Telegram via Python backend (PDF rendered here when the server allows it, otherwise server-side)
             await window.telegramHandler.submitApplication(this.formData);
             console.log('Application submission completed successfully');
             
@@ -6,6 +6,8 @@ class PDFGenerator {
         this.pageHeight = 297; // A4 height in mm
         this.margin = 20;
         this.currentY = 0;
+        this.hostelName = 'Navadaya Girls Hostal';
+        this.hostelContact = 'Phone: +91 98765 43210 | Email: admission@navadayagirlshostal.com';
         this.colors = {
             primary: [59, 130, 246],
             secondary: [100, 116, 139],
@@ -18,17 +20,22 @@ class PDFGenerator {
         };
     }
     
-    async generatePDF(formData) {
+    // options.hostelName / options.hostelContact brand the document for the serving hostel
+    async generatePDF(formData, options = {}) {
         try {
             console.log('Starting PDF generation...');
             
-            // Check if jsPDF is available
-            if (typeof jsPDF === 'undefined') {
+            // Check if jsPDF is available (the UMD build exposes it as window.jspdf.jsPDF)
+            const JsPDF = window.jspdf ? window.jspdf.jsPDF : window.jsPDF;
+            if (typeof JsPDF === 'undefined') {
                 throw new Error('jsPDF library not loaded');
             }
             
+            this.hostelName = options.hostelName || this.hostelName;
+            this.hostelContact = options.hostelContact || this.hostelContact;
+            
             // Initialize jsPDF
-            this.doc = new jsPDF('p', 'mm', 'a4');
+            this.doc = new JsPDF({ orientation: 'p', unit: 'mm', format: 'a4', compress: true });
             this.currentY = this.margin;
             
             // Generate PDF content
@@ -38,6 +45,7 @@ class PDFGenerator {
             await this.addHostelSection(formData);
             await this.addPhotoAndSignature(formData);
             await this.addFooter();
+            await this.addIdProofPages(formData);
             
             // Generate blob
             const pdfBlob = this.doc.output('blob');
@@ -68,7 +76,7 @@ class PDFGenerator {
         this.doc.setTextColor(0, 0, 0);
         this.doc.setFontSize(24);
         this.doc.setFont('helvetica', 'bold');
-        this.doc.text('NAVADAYA GIRLS HOSTAL', this.margin + logoSize + 10, this.currentY + 10);
+        this.doc.text(this.hostelName.toUpperCase(), this.margin + logoSize + 10, this.currentY + 10);
         
         this.doc.setFontSize(18);
         this.doc.setFont('helvetica', 'normal');
@@ -76,8 +84,7 @@ class PDFGenerator {
         
         this.doc.setFontSize(10);
         this.doc.setTextColor(...this.colors.secondary);
-        this.doc.text('123 University Road, Education City', this.margin + logoSize + 10, this.currentY + 28);
-        this.doc.text('Phone: +91 98765 43210 | Email: admission@navadayagirlshostal.com', this.margin + logoSize + 10, this.currentY + 34);
+        this.doc.text(this.hostelContact, this.margin + logoSize + 10, this.currentY + 28);
         
         // Add border line
         this.doc.setDrawColor(...this.colors.primary);
@@ -149,7 +156,7 @@ class PDFGenerator {
             try {
                 this.doc.addImage(
                     formData.photo,
-                    'JPEG',
+                    this.imageFormat(formData.photo),
                     this.pageWidth - this.margin - photoWidth,
                     this.currentY,
                     photoWidth,
@@ -222,7 +229,7 @@ class PDFGenerator {
         this.doc.setTextColor(...this.colors.secondary);
         this.doc.setFontSize(9);
         this.doc.text(`Generated on: ${currentDate}`, this.margin, footerY);
-        this.doc.text('Navadaya Girls Hostal Management System', this.pageWidth - this.margin, footerY, { align: 'right' });
+        this.doc.text(`${this.hostelName} Management System`, this.pageWidth - this.margin, footerY, { align: 'right' });
         
         // Add QR code placeholder
         try {
@@ -246,6 +253,39 @@ class PDFGenerator {
         this.doc.text(`Page ${this.doc.internal.getNumberOfPages()}`, this.pageWidth/2, this.pageHeight - 10, { align: 'center' });
     }
     
+    // One page per ID proof, scaled to fit below its heading
+    async addIdProofPages(formData) {
+        const proofs = formData.idProofs || [];
+        
+        for (let index = 0; index < proofs.length; index++) {
+            this.doc.addPage();
+            this.currentY = this.margin;
+            await this.addSectionHeader(`ID Proof ${index + 1} of ${proofs.length}`, [255, 255, 255]);
+            
+            try {
+                const properties = this.doc.getImageProperties(proofs[index]);
+                const maxWidth = this.pageWidth - 2 * this.margin;
+                const maxHeight = this.pageHeight - this.currentY - this.margin;
+                const scale = Math.min(maxWidth / properties.width, maxHeight / properties.height);
+                const width = properties.width * scale;
+                const height = properties.height * scale;
+                
+                this.doc.addImage(
+                    proofs[index],
+                    this.imageFormat(proofs[index]),
+                    this.margin + (maxWidth - width) / 2,
+                    this.currentY,
+                    width,
+                    height
+                );
+            } catch (error) {
+                console.error('Error adding ID proof to PDF:', error);
+                this.doc.setTextColor(...this.colors.error);
+                this.doc.text('ID proof not available', this.margin, this.currentY + 10);
+            }
+        }
+    }
+    
     async addSectionHeader(title, backgroundColor) {
         const headerHeight = 12;
         
@@ -323,6 +363,12 @@ class PDFGenerator {
         });
     }
     
+    imageFormat(dataURL) {
+        const match = /^data:image\/(\w+)/.exec(dataURL || '');
+        const format = match ? match[1].toUpperCase() : 'JPEG';
+        return format === 'JPG' ? 'JPEG' : format;
+    }
+    
     capitalize(str) {
         if (!str) return '';
         return str.charAt(0).toUpperCase() + str.slice(1);
@@ -7,6 +7,7 @@ class TelegramHandler {
         this.maxFileSize = 50 * 1024 * 1024; // 50MB limit
         this.retryAttempts = 3;
         this.retryDelay = 2000; // 2 seconds
+        this.submitTimeout = 60000; // How long we wait for a submission; the server budgets its work to fit
         
         // Validate configuration
         if (!this.botToken || !this.chatId) {
@@ -59,6 +60,17 @@ class TelegramHandler {
             
             console.log('Starting application submission via Python backend...');
             
+            // Pre-uploaded attachments are sent as references, anything else inline
+            const uploader = window.attachmentUploader;
+            const attach = (dataURL, kind) => uploader && dataURL ? uploader.reference(dataURL, kind) : dataURL;
+            const photo = formData.photo || formData.studentPhoto;
+            const [studentPhoto, signature, idProofs, clientPdf] = await Promise.all([
+                attach(photo, 'photo'),
+                attach(formData.signature, 'signature'),
+                Promise.all((formData.idProofs || []).map(proof => attach(proof, 'id_proof'))),
+                this.renderClientPDF(formData, pdfBlob)
+            ]);
+            
             // Prepare form data for Python backend
             const submissionData = {
                 fullName: formData.fullName,
@@ -74,19 +86,34 @@ class TelegramHandler {
                 roomNumber: formData.roomNumber,
                 admissionDate: formData.admissionDate,
                 stayDuration: formData.stayDuration,
-                studentPhoto: formData.photo || formData.studentPhoto,
-                signature: formData.signature,
-                idProofs: formData.idProofs
+                studentPhoto,
+                signature,
+                idProofs
             };
             
-            // Send to Python backend
-            const response = await fetch('/submit-application', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify(submissionData)
-            });
+            // The server checks our PDF and forwards it instead of rendering its own
+            if (clientPdf && await this.fitsRequest(submissionData, clientPdf)) {
+                submissionData.clientPdf = clientPdf;
+            }
+            
+            let response = await this.postSubmission(submissionData);
+            
+            // A pre-upload may have expired server-side: send the attachments inline instead
+            const usedReferences = [studentPhoto, signature, ...idProofs].some(
+                value => typeof value === 'string' && value.startsWith('upload:')
+            );
+            const rejected = response.status === 422 && usedReferences
+                ? await response.clone().json().catch(() => ({}))
+                : null;
+            if (rejected && (rejected.errors || []).some(error => /^(studentPhoto|signature|idProofs)/.test(error.field))) {
+                console.log('Pre-uploaded attachments were rejected, resending them inline...');
+                response = await this.postSubmission({
+                    ...submissionData,
+                    studentPhoto: photo,
+                    signature: formData.signature,
+                    idProofs: formData.idProofs
+                });
+            }
             
             if (!response.ok) {
                 const errorData = await response.json().catch(() => ({}));
@@ -108,6 +135,90 @@ class TelegramHandler {
         }
     }
     
+    // Server-side submission settings, fetched once
+    getSubmissionConfig() {
+        if (!this.submissionConfig) {
+            this.submissionConfig = fetch('api/submission-config')
+                .then(response => response.ok ? response.json() : {})
+                .catch(() => ({}));
+        }
+        return this.submissionConfig;
+    }
+    
+    // Render the PDF in the browser when the server accepts client PDFs; null otherwise
+    async renderClientPDF(formData, pdfBlob = null) {
+        const config = await this.getSubmissionConfig();
+        if (!config.client_pdf || (!pdfBlob && !window.pdfGenerator)) {
+            return null;
+        }
+        
+        try {
+            const blob = pdfBlob || await window.pdfGenerator.generatePDF(formData, {
+                hostelName: config.hostel_name,
+                hostelContact: config.hostel_contact
+            });
+            if (blob.size > config.client_pdf_max_bytes) {
+                console.log('Client PDF is too large, the server will render it');
+                return null;
+            }
+            return await this.blobToDataURL(blob);
+        } catch (error) {
+            console.warn('Client PDF rendering failed, the server will render it:', error);
+            return null;
+        }
+    }
+    
+    // Leave the PDF out rather than push the request past the server's size limit
+    async fitsRequest(submissionData, clientPdf) {
+        const config = await this.getSubmissionConfig();
+        return JSON.stringify(submissionData).length + clientPdf.length < (config.max_request_bytes || 0);
+    }
+    
+    blobToDataURL(blob) {
+        return new Promise((resolve, reject) => {
+            const reader = new FileReader();
+            reader.onload = () => resolve(reader.result);
+            reader.onerror = () => reject(reader.error);
+            reader.readAsDataURL(blob);
+        });
+    }
+    
+    // POST the submission, waiting out 503s as the server asks
+    async postSubmission(submissionData) {
+        let response;
+        for (let attempt = 1; ; attempt++) {
+            // Tell the server when we give up, and give up a little after that
+            const controller = new AbortController();
+            const timer = setTimeout(() => controller.abort(), this.submitTimeout + 5000);
+            try {
+                response = await fetch('submit-application', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                        'X-Request-Timeout': String(this.submitTimeout / 1000)
+                    },
+                    body: JSON.stringify(submissionData),
+                    signal: controller.signal
+                });
+            } catch (error) {
+                if (error.name === 'AbortError') {
+                    throw new Error('The server took too long to respond, please try again');
+                }
+                throw error;
+            } finally {
+                clearTimeout(timer);
+            }
+            
+            if (response.status !== 503 || attempt >= this.retryAttempts) {
+                return response;
+            }
+            
+            const delay = this.getRetryDelay(response);
+            console.log(`Server busy, retrying submission in ${delay}ms...`);
+            await this.sleep(delay);
+        }
+    }
+    
     createSubmissionMessage(formData) {
         const currentDate = new Date().toLocaleString();
         
@@ -199,7 +310,9 @@ Please review the attached documents and process this application.`;
             
             if (!response.ok) {
                 const errorData = await response.json().catch(() => ({}));
-                throw new Error(`HTTP ${response.status}: ${errorData.description || response.statusText}`);
+                const error = new Error(`HTTP ${response.status}: ${errorData.description || response.statusText}`);
+                error.retryDelay = this.getRetryDelay(response);
+                throw error;
             }
             
             const data = await response.json();
@@ -215,8 +328,9 @@ Please review the attached documents and process this application.`;
             
             // Retry logic
             if (attempt < this.retryAttempts && this.shouldRetry(error)) {
-                console.log(`Retrying in ${this.retryDelay}ms...`);
-                await this.sleep(this.retryDelay);
+                const delay = error.retryDelay || this.retryDelay;
+                console.log(`Retrying in ${delay}ms...`);
+                await this.sleep(delay);
                 return await this.makeRequest(url, options, attempt + 1);
             }
             
@@ -224,6 +338,22 @@ Please review the attached documents and process this application.`;
         }
     }
     
+    getRetryDelay(response) {
+        // Honor Retry-After (seconds or HTTP date), falling back to the default delay
+        const header = response.headers.get('Retry-After');
+        if (!header) {
+            return this.retryDelay;
+        }
+        
+        const seconds = Number(header);
+        if (!Number.isNaN(seconds)) {
+            return Math.max(0, seconds * 1000);
+        }
+        
+        const date = Date.parse(header);
+        return Number.isNaN(date) ? this.retryDelay : Math.max(0, date - Date.now());
+    }
+    
     shouldRetry(error) {
         // Retry on network errors or temporary server errors
         return error.message.includes('fetch') || 
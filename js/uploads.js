@@ -0,0 +1,117 @@
+// Resumable chunked pre-upload of attachments while the form is being filled in
+class AttachmentUploader {
+    constructor() {
+        this.uploads = new Map(); // data URL -> Promise of upload ID
+        this.maxRetries = 5;
+    }
+
+    // Start uploading an attachment in the background (once per data URL)
+    start(dataURL, kind) {
+        if (typeof dataURL !== 'string' || !dataURL.startsWith('data:')) {
+            return null;
+        }
+
+        if (!this.uploads.has(dataURL)) {
+            const upload = this.upload(dataURL, kind);
+            upload.catch(error => {
+                console.warn(`Pre-upload of ${kind} failed, it will be sent with the form:`, error);
+            });
+            this.uploads.set(dataURL, upload);
+        }
+
+        return this.uploads.get(dataURL);
+    }
+
+    // "upload:<id>" once the pre-upload has finished, otherwise the data URL itself
+    async reference(dataURL, kind) {
+        try {
+            const uploadId = await this.start(dataURL, kind);
+            return uploadId ? `upload:${uploadId}` : dataURL;
+        } catch (error) {
+            return dataURL;
+        }
+    }
+
+    async upload(dataURL, kind) {
+        const blob = this.dataURLToBlob(dataURL);
+        const response = await fetch('api/uploads', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ kind, mime: blob.type, size: blob.size })
+        });
+        const created = await response.json().catch(() => ({}));
+        if (!response.ok) {
+            throw new Error(created.error || `Upload could not be started (HTTP ${response.status})`);
+        }
+
+        const uploadId = created.upload_id;
+        const chunkSize = created.chunk_size;
+        let offset = created.offset || 0;
+        let failures = 0;
+
+        while (offset < blob.size) {
+            let result;
+            try {
+                const chunkResponse = await fetch(`api/uploads/${uploadId}`, {
+                    method: 'PATCH',
+                    headers: {
+                        'Content-Type': 'application/octet-stream',
+                        'Upload-Offset': String(offset)
+                    },
+                    body: blob.slice(offset, offset + chunkSize)
+                });
+                result = await chunkResponse.json().catch(() => ({}));
+
+                // 409 means the server has a different offset: resume from there
+                if (chunkResponse.ok || chunkResponse.status === 409) {
+                    offset = result.offset;
+                    failures = 0;
+                    continue;
+                }
+                if (chunkResponse.status < 500) {
+                    throw Object.assign(new Error(result.error || `Upload failed (HTTP ${chunkResponse.status})`), { permanent: true });
+                }
+                throw new Error(result.error || `Upload failed (HTTP ${chunkResponse.status})`);
+            } catch (error) {
+                if (error.permanent || ++failures > this.maxRetries) {
+                    throw error;
+                }
+                await this.sleep(Math.min(1000 * Math.pow(2, failures), 15000));
+                offset = await this.serverOffset(uploadId, offset);
+            }
+        }
+
+        return uploadId;
+    }
+
+    // Ask the server how much it has received after a dropped connection
+    async serverOffset(uploadId, fallback) {
+        try {
+            const response = await fetch(`api/uploads/${uploadId}`);
+            if (response.ok) {
+                const status = await response.json();
+                return status.offset;
+            }
+        } catch (error) {
+            // Still offline; retry from where we were
+        }
+        return fallback;
+    }
+
+    dataURLToBlob(dataURL) {
+        const [header, data] = dataURL.split(',');
+        const mime = header.match(/:(.*?);/)[1];
+        const binary = atob(data);
+        const bytes = new Uint8Array(binary.length);
+        for (let i = 0; i < binary.length; i++) {
+            bytes[i] = binary.charCodeAt(i);
+        }
+        return new Blob([bytes], { type: mime });
+    }
+
+    sleep(ms) {
+        return new Promise(resolve => setTimeout(resolve, ms));
+    }
+}
+
+window.attachmentUploader = new AttachmentUploader();
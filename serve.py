@@ -0,0 +1,135 @@
+"""Production launcher: gunicorn with the app preloaded and tuned from the environment.
+
+The app is imported and warmed once in the master process (PDF stack
+imported, Notion database resolved, derived indexes built) and then
+forked, so workers start hot and share that memory copy-on-write. Each
+worker then builds its own Notion client, Telegram connection pool and
+journal replayer, since connections and threads do not survive a fork.
+
+Defaults are derived from the app's own settings:
+
+- one worker process per available core
+- enough threads per worker to hold both admission gates and their queues
+- a worker timeout that covers the longest submission (its deadline, or
+  the queue wait, Notion call and Telegram upload, plus time to render)
+- the same timeout as the grace period on shutdown, so in-flight
+  submissions finish and queued Notion writes are flushed
+
+Workers share everything that must agree across requests: submissions and
+queued Notion writes (with their rate limit) in SUBMISSION_JOURNAL, and room
+assignments, duplicate checks and dashboard rollups in ANALYTICS_DB. The
+search index and record cache stay per worker; searches first catch up with
+Notion and the shared stores, and single reads revalidate with Notion. Set
+SERVER_WORKERS=1 when those files cannot be shared (e.g. no common disk).
+
+Run with ``python serve.py`` (``SERVER_APP=tenants`` serves several hostels).
+"""
+import math
+import os
+import sys
+
+SERVER_APP = os.getenv('SERVER_APP', 'app')
+SERVER_BIND = os.getenv('SERVER_BIND') or f"0.0.0.0:{os.getenv('PORT', '5000')}"
+SERVER_WORKER_CLASS = os.getenv('SERVER_WORKER_CLASS', 'gthread')
+SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', '0'))
+SERVER_THREADS = int(os.getenv('SERVER_THREADS', '0'))
+SERVER_WORKER_CONNECTIONS = int(os.getenv('SERVER_WORKER_CONNECTIONS', '1000'))
+SERVER_TIMEOUT = int(os.getenv('SERVER_TIMEOUT', '0'))
+SERVER_GRACEFUL_TIMEOUT = int(os.getenv('SERVER_GRACEFUL_TIMEOUT', '0'))
+SERVER_KEEPALIVE = int(os.getenv('SERVER_KEEPALIVE', '65'))
+SERVER_MAX_REQUESTS = int(os.getenv('SERVER_MAX_REQUESTS', '0'))
+SERVER_DRAIN_TIMEOUT = float(os.getenv('SERVER_DRAIN_TIMEOUT', '10'))
+WORKER_CLASSES = ('sync', 'gthread', 'gevent')
+RENDER_HEADROOM = 30
+
+def available_cores():
+    """Cores this process may run on (respects container CPU affinity)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def load_wsgi_app():
+    """Import the WSGI app and the app.py instances behind it, without warming up"""
+    # Warmup runs once in the master after import instead of on a thread that fork would cut off
+    warm = os.environ.get('STARTUP_WARMUP', '1') == '1'
+    os.environ['STARTUP_WARMUP'] = '0'
+    if SERVER_APP == 'tenants':
+        import tenants
+        wsgi, services = tenants.app, [tenant.module for tenant in tenants.app.tenants]
+    elif SERVER_APP == 'app':
+        import app as service
+        wsgi, services = service.app, [service]
+    else:
+        raise ValueError(f"SERVER_APP must be 'app' or 'tenants', not {SERVER_APP!r}")
+    for module in services:
+        module.STARTUP_WARMUP = warm
+    return wsgi, services
+
+def longest_submission(service):
+    """Seconds a submission can run: its deadline, or else queue wait + Notion + Telegram timeouts"""
+    worst = service.SUBMIT_QUEUE_TIMEOUT + service.NOTION_TIMEOUT + service.TELEGRAM_TIMEOUT
+    if service.SUBMIT_DEADLINE > 0:
+        worst = min(worst, service.SUBMIT_DEADLINE)
+    return math.ceil(worst)
+
+def server_settings(services):
+    """gunicorn settings, with unset values derived from the app's own limits"""
+    if SERVER_WORKER_CLASS not in WORKER_CLASSES:
+        raise ValueError(f"SERVER_WORKER_CLASS must be one of {', '.join(WORKER_CLASSES)}")
+    threads = SERVER_THREADS or max(
+        sum(gate.limit + gate.queue_size for gate in (service.submit_gate, service.admin_gate)) + 4
+        for service in services
+    )
+    timeout = SERVER_TIMEOUT or max(longest_submission(service) + RENDER_HEADROOM for service in services)
+    settings = {
+        'bind': SERVER_BIND,
+        'worker_class': SERVER_WORKER_CLASS,
+        'workers': SERVER_WORKERS or available_cores(),
+        'timeout': timeout,
+        'graceful_timeout': SERVER_GRACEFUL_TIMEOUT or timeout,
+        'keepalive': SERVER_KEEPALIVE,
+        'preload_app': True,
+    }
+    if SERVER_WORKER_CLASS == 'gthread':
+        settings['threads'] = threads
+    elif SERVER_WORKER_CLASS == 'gevent':
+        settings['worker_connections'] = SERVER_WORKER_CONNECTIONS
+    if SERVER_MAX_REQUESTS:
+        # Recycle workers to bound memory growth; jitter keeps them from restarting together
+        settings['max_requests'] = SERVER_MAX_REQUESTS
+        settings['max_requests_jitter'] = max(1, SERVER_MAX_REQUESTS // 10)
+    return settings
+
+def main():
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        sys.exit("serve.py needs gunicorn: pip install gunicorn (and gevent for SERVER_WORKER_CLASS=gevent)")
+
+    wsgi, services = load_wsgi_app()
+    settings = server_settings(services)
+    for service in services:
+        if service.STARTUP_WARMUP:
+            service.warmup(resume_journal=False)
+
+    def post_fork(server, worker):
+        for service in services:
+            service.reinitialize_worker()
+
+    def worker_exit(server, worker):
+        for service in services:
+            service.drain_background_work(SERVER_DRAIN_TIMEOUT)
+
+    class ProductionServer(BaseApplication):
+        def load_config(self):
+            for key, value in {**settings, 'post_fork': post_fork, 'worker_exit': worker_exit}.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return wsgi
+
+    print("Serving " + ", ".join(f"{key}={value}" for key, value in settings.items()))
+    ProductionServer().run()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Multi-hostel deployment: one process serving several hostels.
+
+Each tenant gets its own instance of app.py, loaded with the tenant's
+environment laid over the process environment. Configuration, the Notion
+client and its write budget, the Telegram connection pool, admission gates,
+caches, indexes, the submission journal and PDF branding are therefore all
+per tenant, and one hostel's spike queues behind its own limits only.
+
+Requests are routed by Host header first, then by path prefix, then to the
+default tenant. Tenants are described in TENANTS_FILE:
+
+    {"tenants": [
+        {"name": "navadaya", "hosts": ["apply.navadaya.org"], "default": true,
+         "env": {"NOTION_DATABASE_ID": "...", "TELEGRAM_CHAT_ID": "..."}},
+        {"name": "sunrise", "prefix": "/sunrise",
+         "env": {"NOTION_DATABASE_ID": "...", "TELEGRAM_CHAT_ID": "...",
+                 "HOSTEL_NAME": "Sunrise Hostel", "PDF_BRAND_COLOR": "#7a2e2e"}}
+    ]}
+
+Run with ``SERVER_APP=tenants python serve.py`` (or ``gunicorn tenants:app``).
+"""
+import importlib.util
+import json
+import os
+import re
+import sys
+import threading
+
+TENANTS_FILE = os.getenv('TENANTS_FILE', 'tenants.json')
+TENANT_DATA_DIR = os.getenv('TENANT_DATA_DIR', 'tenants')
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+TENANT_NAME_PATTERN = re.compile(r'^[a-z0-9][a-z0-9_-]*$')
+
+# Local state files, kept in TENANT_DATA_DIR/<name>/ unless a tenant overrides them
+TENANT_FILE_SETTINGS = {
+    'DATABASE_ID_FILE': 'notion_database_id.txt',
+    'SUBMISSION_JOURNAL': 'submissions.db',
+    'ANALYTICS_DB': 'analytics.db',
+    'THUMBNAIL_DIR': 'thumbnails',
+    'PROFILE_DIR': 'profiles',
+    'UPLOAD_DIR': 'uploads',
+}
+
+# app.py reads its configuration from os.environ at import time
+_environ_lock = threading.Lock()
+
+class Tenant:
+    def __init__(self, name, module, hosts=(), prefix='', default=False):
+        self.name = name
+        self.module = module
+        self.app = module.app
+        self.hosts = tuple(host.lower() for host in hosts)
+        self.prefix = prefix.rstrip('/')
+        self.default = default
+
+def load_tenant(spec):
+    """Import a private copy of app.py configured for one tenant"""
+    name = spec['name']
+    if not TENANT_NAME_PATTERN.match(name):
+        raise ValueError(f"Invalid tenant name: {name!r}")
+    data_dir = os.path.join(TENANT_DATA_DIR, name)
+    os.makedirs(data_dir, exist_ok=True)
+    env = {key: os.path.join(data_dir, filename) for key, filename in TENANT_FILE_SETTINGS.items()}
+    env.update({key: str(value) for key, value in spec.get('env', {}).items()})
+
+    module_name = f"app_tenant_{name.replace('-', '_')}"
+    with _environ_lock:
+        saved = {key: os.environ.get(key) for key in env}
+        os.environ.update(env)
+        try:
+            module_spec = importlib.util.spec_from_file_location(module_name, APP_PATH)
+            module = importlib.util.module_from_spec(module_spec)
+            sys.modules[module_name] = module
+            module_spec.loader.exec_module(module)
+        finally:
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+    print(f"Loaded tenant {name}")
+    return Tenant(name, module, spec.get('hosts', ()), spec.get('prefix', ''), spec.get('default', False))
+
+def load_tenants(path=TENANTS_FILE):
+    with open(path, 'r') as f:
+        specs = json.load(f)['tenants']
+    return [load_tenant(spec) for spec in specs]
+
+def _json_error(start_response, status, message):
+    body = json.dumps({'success': False, 'error': message}).encode('utf-8')
+    start_response(status, [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))])
+    return [body]
+
+class TenantRouter:
+    """WSGI dispatcher: Host header, then path prefix, then the default tenant"""
+
+    def __init__(self, tenants):
+        self.tenants = tenants
+        self.by_host = {host: tenant for tenant in tenants for host in tenant.hosts}
+        self.prefixed = sorted((tenant for tenant in tenants if tenant.prefix),
+                               key=lambda tenant: len(tenant.prefix), reverse=True)
+        self.default = next((tenant for tenant in tenants if tenant.default), None)
+
+    def __call__(self, environ, start_response):
+        host = (environ.get('HTTP_HOST') or environ.get('SERVER_NAME') or '').split(':')[0].lower()
+        tenant = self.by_host.get(host)
+        if tenant is None:
+            path = environ.get('PATH_INFO') or '/'
+            for candidate in self.prefixed:
+                if path == candidate.prefix:
+                    # Pages use relative URLs, which need the trailing slash
+                    query = environ.get('QUERY_STRING')
+                    location = environ.get('SCRIPT_NAME', '') + candidate.prefix + '/' + (f"?{query}" if query else '')
+                    start_response('308 Permanent Redirect', [('Location', location), ('Content-Length', '0')])
+                    return [b'']
+                if path.startswith(candidate.prefix + '/'):
+                    environ['SCRIPT_NAME'] = environ.get('SCRIPT_NAME', '') + candidate.prefix
+                    environ['PATH_INFO'] = path[len(candidate.prefix):]
+                    tenant = candidate
+                    break
+        if tenant is None:
+            tenant = self.default
+        if tenant is None:
+            return _json_error(start_response, '404 Not Found', 'Unknown hostel')
+        return tenant.app(environ, start_response)
+
+app = TenantRouter(load_tenants())